@@ -0,0 +1,163 @@
+"""Benchmarks the Python side orchestration of cad_to_h5m against the size of the
+model using the mock cubit module, so no Cubit license is needed. Synthetic STEP
+files are created for models with an increasing number of files_with_tags
+entries and an increasing number of volumes per file. The time taken and the
+number of Cubit commands sent are reported for each model size.
+
+The benchmark imports cad_to_h5m, so run it as a module from the root of the
+repository or install the package first with pip install -e .
+
+Save a baseline with:
+    python -m benchmarks.benchmark_orchestration --save-baseline
+
+Check for regressions against the saved baseline with:
+    python -m benchmarks.benchmark_orchestration
+
+The command counts must not exceed the baseline and the times must not exceed
+the baseline by more than the --time-factor.
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from cad_to_h5m import cad_to_h5m
+from cad_to_h5m.mock_cubit import use_mock_cubit
+
+DEFAULT_BASELINE = str(Path(__file__).parent / "baseline.json")
+
+# (number of files_with_tags entries, number of volumes in each file)
+SCENARIOS = [
+    (10, 1),
+    (100, 1),
+    (1000, 1),
+    (10000, 1),
+    (1, 10),
+    (1, 100),
+    (1, 1000),
+    (1, 10000),
+    (100, 100),
+]
+
+
+def write_synthetic_step_file(filename: Path, number_of_volumes: int):
+    """Writes a file that the mock cubit module imports as number_of_volumes
+    volumes"""
+    with open(filename, "w") as outfile:
+        for index in range(number_of_volumes):
+            outfile.write(f"#{index + 1}=MANIFOLD_SOLID_BREP('',#0);\n")
+
+
+def run_scenario(number_of_files: int, volumes_per_file: int, tmp_dir: Path) -> dict:
+    cad_filename = tmp_dir / f"synthetic_{volumes_per_file}.stp"
+    write_synthetic_step_file(cad_filename, volumes_per_file)
+    files_with_tags = [
+        {
+            "cad_filename": str(cad_filename),
+            "material_tag": f"mat{index % 10}",
+            "tet_mesh": "size 0.5",
+        }
+        for index in range(number_of_files)
+    ]
+
+    with use_mock_cubit() as cubit:
+        start_time = time.perf_counter()
+        cad_to_h5m(
+            files_with_tags=files_with_tags,
+            h5m_filename=str(tmp_dir / "dagmc.h5m"),
+            verbose=False,
+        )
+        wall_time = time.perf_counter() - start_time
+        command_count = len(cubit.commands)
+
+    return {
+        "number_of_files": number_of_files,
+        "volumes_per_file": volumes_per_file,
+        "number_of_volumes": number_of_files * volumes_per_file,
+        "wall_time": wall_time,
+        "command_count": command_count,
+    }
+
+
+def find_regressions(results: list, baseline: list, time_factor: float) -> list:
+    baseline_by_size = {
+        (entry["number_of_files"], entry["volumes_per_file"]): entry
+        for entry in baseline
+    }
+    regressions = []
+    for result in results:
+        key = (result["number_of_files"], result["volumes_per_file"])
+        if key not in baseline_by_size:
+            continue
+        expected = baseline_by_size[key]
+        if result["command_count"] > expected["command_count"]:
+            regressions.append(
+                f"{key} sent {result['command_count']} commands, the baseline "
+                f"is {expected['command_count']}"
+            )
+        if result["wall_time"] > expected["wall_time"] * time_factor:
+            regressions.append(
+                f"{key} took {result['wall_time']:.3f}s, the baseline is "
+                f"{expected['wall_time']:.3f}s"
+            )
+    return regressions
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="save the results as the new baseline instead of comparing",
+    )
+    parser.add_argument(
+        "--time-factor",
+        type=float,
+        default=2.0,
+        help="the allowed slow down compared to the baseline times",
+    )
+    parser.add_argument(
+        "--max-volumes",
+        type=int,
+        default=10000,
+        help="skip scenarios with more volumes than this",
+    )
+    options = parser.parse_args(args)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for number_of_files, volumes_per_file in SCENARIOS:
+            if number_of_files * volumes_per_file > options.max_volumes:
+                continue
+            result = run_scenario(number_of_files, volumes_per_file, Path(tmp_dir))
+            results.append(result)
+            print(
+                f"files {number_of_files:>6} volumes {result['number_of_volumes']:>6} "
+                f"time {result['wall_time']:>8.3f}s "
+                f"commands {result['command_count']:>6}"
+            )
+
+    if options.save_baseline:
+        with open(options.baseline, "w") as outfile:
+            json.dump(results, outfile, indent=4)
+        print(f"baseline saved to {options.baseline}")
+        return 0
+
+    if not Path(options.baseline).is_file():
+        print(f"no baseline found at {options.baseline}")
+        return 0
+
+    with open(options.baseline) as infile:
+        baseline = json.load(infile)
+    regressions = find_regressions(results, baseline, options.time_factor)
+    for regression in regressions:
+        print("regression:", regression)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1 +1,7 @@
-from .core import cad_to_h5m
+from .core import cad_to_h5m, Converter
+from .batch import cad_to_h5m_batch, BatchResult
+from .async_api import cad_to_h5m_async
+from .profiling import ConversionReport, StageRecord
+from .index import GeometryIndex
+from .plan import plan
+from .stl import stl_to_h5m
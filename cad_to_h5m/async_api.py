@@ -0,0 +1,100 @@
+import asyncio
+import base64
+import inspect
+import json
+import os
+import pickle
+import sys
+from contextlib import nullcontext
+from typing import Callable, List, Optional
+
+from .profiling import StageRecord
+
+
+async def cad_to_h5m_async(
+    files_with_tags: List[dict],
+    timeout: Optional[float] = None,
+    semaphore: Optional[asyncio.Semaphore] = None,
+    stage_callback: Optional[Callable[[StageRecord], None]] = None,
+    **kwargs,
+) -> str:
+    """Runs cad_to_h5m in a new worker process without blocking the event
+    loop. Each conversion has its own process and so its own Cubit session,
+    which means many conversions can be awaited at once. The worker process is
+    killed if the conversion times out or the task awaiting it is cancelled.
+
+    Args:
+        files_with_tags: the entries passed to cad_to_h5m.
+        timeout: the number of seconds the conversion may take before the
+            worker process is killed and asyncio.TimeoutError is raised.
+            Defaults to no limit.
+        semaphore: an optional semaphore shared between conversions to limit
+            the number of worker processes running at once. The timeout starts
+            once the semaphore has been acquired.
+        stage_callback: an optional function, or coroutine function, that is
+            called with the StageRecord of each stage as soon as the stage
+            finishes in the worker process.
+        kwargs: the other arguments of cad_to_h5m, which must be picklable.
+
+    Returns:
+        The filename of the h5m file
+    """
+    if "dry_run" in kwargs:
+        msg = "dry_run is not supported by cad_to_h5m_async, use plan instead"
+        raise ValueError(msg)
+
+    job = pickle.dumps(dict(files_with_tags=files_with_tags, **kwargs))
+
+    async with semaphore if semaphore is not None else nullcontext():
+        process = await asyncio.create_subprocess_exec(
+            sys.executable,
+            "-m",
+            "cad_to_h5m.worker",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            # the worker imports this package from the same folders
+            env=dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, sys.path))),
+        )
+        try:
+            return await asyncio.wait_for(
+                _follow_worker(process, job, stage_callback), timeout
+            )
+        finally:
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+
+
+async def _follow_worker(
+    process: asyncio.subprocess.Process,
+    job: bytes,
+    stage_callback: Optional[Callable[[StageRecord], None]],
+) -> str:
+    """Sends the job to the worker process and reads its progress lines until
+    the result or error of the conversion arrives"""
+    process.stdin.write(job)
+    await process.stdin.drain()
+    process.stdin.close()
+
+    while True:
+        line = await process.stdout.readline()
+        if not line:
+            await process.wait()
+            msg = (
+                "The cad_to_h5m worker process exited with code "
+                f"{process.returncode} before the conversion finished"
+            )
+            raise RuntimeError(msg)
+
+        event = json.loads(line)
+        if "stage" in event:
+            if stage_callback is not None:
+                called = stage_callback(StageRecord(**event["stage"]))
+                if inspect.isawaitable(called):
+                    await called
+        elif "error" in event:
+            await process.wait()
+            raise pickle.loads(base64.b64decode(event["error"]))
+        else:
+            await process.wait()
+            return event["result"]
@@ -0,0 +1,114 @@
+import multiprocessing
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+from .core import cad_to_h5m
+
+
+@dataclass
+class BatchResult:
+    """The outcome of a single job converted by cad_to_h5m_batch
+
+    Args:
+        index: the position of the job in the list of jobs.
+        job: the keyword arguments passed to cad_to_h5m for the job.
+        h5m_filename: the filename returned by cad_to_h5m or None if the job
+            failed.
+        error: the exception raised by the job or None if the job succeeded.
+    """
+
+    index: int
+    job: dict
+    h5m_filename: Optional[str] = None
+    error: Optional[BaseException] = None
+
+    @property
+    def succeeded(self) -> bool:
+        return self.error is None
+
+
+def _run_job(job: dict, started_filename: Optional[str] = None) -> str:
+    """Runs a single conversion in a worker process. cad_to_h5m resets the
+    Cubit workspace even when a job fails so no geometry leaks into the next
+    job run by the same worker. The started_filename is created first so the
+    jobs that were running when a worker crashed can be found."""
+    if started_filename is not None:
+        Path(started_filename).touch()
+    return cad_to_h5m(**job)
+
+
+def _new_pool(max_workers: Optional[int]) -> ProcessPoolExecutor:
+    # each worker imports and initialises its own copy of cubit so a fresh
+    # interpreter is spawned instead of forking the current process
+    context = multiprocessing.get_context("spawn")
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=context)
+
+
+def cad_to_h5m_batch(
+    jobs: List[dict], max_workers: Optional[int] = None
+) -> Iterator[BatchResult]:
+    """Converts many sets of CAD files in parallel worker processes. Each
+    worker process owns its own Cubit session. Results are yielded as the jobs
+    complete, which is not necessarily the order of the jobs. A job that fails
+    is yielded with its error and does not stop the other jobs.
+
+    Args:
+        jobs: a list of dictionaries of keyword arguments to pass to
+            cad_to_h5m. For example [{"files_with_tags": [{"cad_filename":
+            "part1.stp", "material_tag": "mat1"}], "h5m_filename":
+            "dagmc_1.h5m"}].
+        max_workers: the maximum number of worker processes. Defaults to the
+            number of processors on the machine.
+
+    Returns:
+        An iterator of BatchResult, one for each job
+    """
+    # jobs that were running when a worker process crashed (for example a
+    # segmentation fault within Cubit) can't be told apart from the job that
+    # caused the crash so they are rerun one at a time in their own process.
+    # The jobs that had not started are resubmitted to a new pool.
+    crashed_jobs = []
+    pending_jobs = list(range(len(jobs)))
+
+    while pending_jobs:
+        unfinished_jobs = []
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            started_filenames = {
+                index: str(Path(tmp_dir) / f"{index}.started") for index in pending_jobs
+            }
+            with _new_pool(max_workers) as pool:
+                futures = {
+                    pool.submit(_run_job, jobs[index], started_filenames[index]): index
+                    for index in pending_jobs
+                }
+                for future in as_completed(futures):
+                    index = futures[future]
+                    try:
+                        yield BatchResult(
+                            index, jobs[index], h5m_filename=future.result()
+                        )
+                    except BrokenProcessPool:
+                        unfinished_jobs.append(index)
+                    except Exception as error:
+                        yield BatchResult(index, jobs[index], error=error)
+            started_jobs = [
+                index
+                for index in unfinished_jobs
+                if Path(started_filenames[index]).is_file()
+            ]
+        # if the pool broke before any job started every job is isolated so
+        # that the loop always ends
+        crashed_jobs.extend(sorted(started_jobs or unfinished_jobs))
+        pending_jobs = sorted(set(unfinished_jobs) - set(crashed_jobs))
+
+    for index in crashed_jobs:
+        with _new_pool(1) as pool:
+            future = pool.submit(_run_job, jobs[index])
+            try:
+                yield BatchResult(index, jobs[index], h5m_filename=future.result())
+            except Exception as error:
+                yield BatchResult(index, jobs[index], error=error)
@@ -0,0 +1,194 @@
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# the keys a conversion adds to the entries of files_with_tags
+CONVERSION_DETAILS = ["volumes", "triangles", "tets", "tet_volume"]
+
+
+def hash_file(filename: str, chunk_size: int = 2**20) -> str:
+    """Returns the sha256 hex digest of the contents of a file. The file is
+    read in chunks so that large CAD files are never fully loaded into memory.
+
+    Args:
+        filename: the path of the file to hash.
+        chunk_size: the number of bytes to read at a time.
+    """
+    if not Path(filename).is_file():
+        msg = f"File with filename {filename} could not be found"
+        raise FileNotFoundError(msg)
+    sha = hashlib.sha256()
+    with open(filename, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def conversion_key(files_with_tags: List[dict], **parameters) -> str:
+    """Returns a key that identifies a conversion. The key combines the
+    contents of each CAD file, the files_with_tags entries and the pipeline
+    parameters so that any change to the inputs produces a different key.
+
+    Args:
+        files_with_tags: the entries passed to cad_to_h5m.
+        parameters: the pipeline parameters (tolerances, flags and tags) that
+            change the output files.
+    """
+    entries = []
+    for entry in files_with_tags:
+        # keys added to the entries during a conversion are skipped to allow
+        # the same files_with_tags to be passed in again
+        fields = {
+            key: value for key, value in entry.items() if key not in CONVERSION_DETAILS
+        }
+        # the value is replaced by the surfaces found in the conversion, which
+        # follow from the CAD file, so only the presence of the key is used
+        if "surface_reflectivity" in fields:
+            fields["surface_reflectivity"] = True
+        fields["cad_file_hash"] = hash_file(entry["cad_filename"])
+        entries.append(fields)
+
+    description = json.dumps(
+        {"files_with_tags": entries, "parameters": parameters},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(description.encode()).hexdigest()
+
+
+class ConversionCache:
+    """An on disk cache of conversion outputs. Each conversion key maps to a
+    folder containing the output files (h5m, cub, exo and geometry details)
+    and a manifest. The least recently used entries are evicted once the
+    cache grows beyond max_size.
+
+    Args:
+        cache_dir: the folder to store cached outputs in.
+        max_size: the maximum total size of the cache in bytes. None for an
+            unbounded cache.
+        use_hardlinks: flag to control if cached outputs are hard-linked
+            instead of copied into place. Hard-links are faster but changes
+            made to the output files in place also change the cached copy.
+    """
+
+    manifest_filename = "manifest.json"
+
+    def __init__(
+        self,
+        cache_dir: str,
+        max_size: Optional[int] = None,
+        use_hardlinks: bool = False,
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.max_size = max_size
+        self.use_hardlinks = use_hardlinks
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def _entry_dir(self, key: str) -> Path:
+        return self.cache_dir / key
+
+    def _read_manifest(self, key: str) -> Optional[dict]:
+        manifest_path = self._entry_dir(key) / self.manifest_filename
+        if not manifest_path.is_file():
+            return None
+        with open(manifest_path) as infile:
+            return json.load(infile)
+
+    def fetch(self, key: str, outputs: Dict[str, Optional[str]]) -> bool:
+        """Places the cached outputs for key at the requested output filenames.
+        Returns True on a cache hit and False if any of the requested outputs
+        is not in the cache, in which case no files are written.
+
+        Args:
+            key: the conversion key from conversion_key.
+            outputs: output kinds ("h5m", "cub", "exo", "json" or "index") mapped to
+                the filename to write the output to or None when the output
+                was not requested.
+        """
+        manifest = self._read_manifest(key)
+        if manifest is None:
+            return False
+
+        requested = {kind: filename for kind, filename in outputs.items() if filename}
+        for kind in requested:
+            if kind not in manifest["outputs"]:
+                return False
+            if not (self._entry_dir(key) / manifest["outputs"][kind]).is_file():
+                return False
+
+        for kind, filename in requested.items():
+            self._place(self._entry_dir(key) / manifest["outputs"][kind], filename)
+
+        # the manifest modification time records when the entry was last used
+        os.utime(self._entry_dir(key) / self.manifest_filename)
+        return True
+
+    def store(self, key: str, outputs: Dict[str, Optional[str]]):
+        """Copies the output files of a conversion into the cache and evicts
+        the least recently used entries if the cache is larger than max_size.
+
+        Args:
+            key: the conversion key from conversion_key.
+            outputs: output kinds mapped to the filenames written by the
+                conversion. Outputs that are None are not stored.
+        """
+        entry_dir = self._entry_dir(key)
+        manifest = self._read_manifest(key) or {"outputs": {}}
+        entry_dir.mkdir(parents=True, exist_ok=True)
+
+        for kind, filename in outputs.items():
+            if filename is None or not Path(filename).is_file():
+                continue
+            cached_name = kind + Path(filename).suffix
+            shutil.copy2(filename, entry_dir / cached_name)
+            manifest["outputs"][kind] = cached_name
+
+        with open(entry_dir / self.manifest_filename, "w") as outfile:
+            json.dump(manifest, outfile, indent=4)
+
+        self.evict()
+
+    def _place(self, cached_filename: Path, filename: str):
+        Path(filename).parents[0].mkdir(parents=True, exist_ok=True)
+        if self.use_hardlinks:
+            if Path(filename).exists():
+                os.remove(filename)
+            try:
+                os.link(cached_filename, filename)
+                return
+            except OSError:
+                # hard-links are not possible across file systems
+                pass
+        shutil.copyfile(cached_filename, filename)
+
+    def size(self) -> int:
+        """Returns the total size of the cached files in bytes"""
+        return sum(
+            path.stat().st_size for path in self.cache_dir.rglob("*") if path.is_file()
+        )
+
+    def evict(self):
+        """Removes the least recently used entries until the cache is no larger
+        than max_size"""
+        if self.max_size is None:
+            return
+
+        entries = []
+        for entry_dir in self.cache_dir.iterdir():
+            manifest_path = entry_dir / self.manifest_filename
+            if not manifest_path.is_file():
+                continue
+            entry_size = sum(
+                path.stat().st_size for path in entry_dir.rglob("*") if path.is_file()
+            )
+            entries.append((manifest_path.stat().st_mtime, entry_size, entry_dir))
+
+        total_size = sum(entry[1] for entry in entries)
+        for _, entry_size, entry_dir in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            shutil.rmtree(entry_dir)
+            total_size -= entry_size
@@ -0,0 +1,116 @@
+import json
+import shutil
+from pathlib import Path
+from typing import List, Optional
+
+MANIFEST_FILENAME = "checkpoint.json"
+SESSION_FILENAME = "checkpoint.cub"
+H5M_FILENAME = "checkpoint.h5m"
+
+# the stages after which the session is saved, in the order they are run
+STAGES = ["import", "merge", "export"]
+
+
+class Checkpoint:
+    """Saves the Cubit session, the entries and the outputs of a conversion to
+    a folder after each expensive stage so that a conversion that fails can be
+    resumed after the last stage that finished. The checkpoint is only used
+    by a conversion with the same key, see conversion_key.
+
+    Args:
+        checkpoint_dir: the folder to save the checkpoint in.
+        key: the key of the conversion.
+    """
+
+    def __init__(self, checkpoint_dir: str, key: str):
+        self.checkpoint_dir = Path(checkpoint_dir)
+        self.key = key
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.checkpoint_dir / MANIFEST_FILENAME
+
+    @property
+    def session_path(self) -> Path:
+        return self.checkpoint_dir / SESSION_FILENAME
+
+    @property
+    def h5m_path(self) -> Path:
+        return self.checkpoint_dir / H5M_FILENAME
+
+    def load(self) -> Optional[dict]:
+        """Returns the manifest of the checkpoint or None if there is no
+        checkpoint for this conversion"""
+        if not self.manifest_path.is_file() or not self.session_path.is_file():
+            return None
+        with open(self.manifest_path) as infile:
+            manifest = json.load(infile)
+        if manifest["key"] != self.key:
+            return None
+        if manifest["stage"] == "export" and not self.h5m_path.is_file():
+            return None
+        return manifest
+
+    def completed(self, stage: str) -> bool:
+        """Returns True if the checkpoint was saved at or after the stage"""
+        manifest = self.load()
+        if manifest is None:
+            return False
+        return STAGES.index(manifest["stage"]) >= STAGES.index(stage)
+
+    def save(
+        self,
+        stage: str,
+        geometry_details: List[dict],
+        cubit,
+        cluster_report: Optional[dict] = None,
+        h5m_filename: Optional[str] = None,
+    ):
+        """Saves the session and the entries with their volume ids after the
+        stage. The h5m file is kept after the export stage.
+
+        Args:
+            stage: the stage that has finished, one of STAGES.
+            geometry_details: the entries with their volume ids.
+            cubit: the cubit module.
+            cluster_report: the clusters of touching volumes as a dictionary.
+            h5m_filename: the exported h5m file.
+        """
+        self.checkpoint_dir.mkdir(parents=True, exist_ok=True)
+        # the old manifest is removed first so it can never describe a newer
+        # session file if saving is interrupted
+        self.manifest_path.unlink(missing_ok=True)
+
+        cubit.cmd(f'save as "{self.session_path}" overwrite')
+        if h5m_filename is not None:
+            shutil.copyfile(h5m_filename, self.h5m_path)
+        manifest = {
+            "key": self.key,
+            "stage": stage,
+            "geometry_details": geometry_details,
+            "cluster_report": cluster_report,
+        }
+        with open(self.manifest_path, "w") as outfile:
+            json.dump(manifest, outfile, indent=4)
+
+    def restore(self, files_with_tags: List[dict], cubit) -> dict:
+        """Opens the saved session and copies the volume ids and other details
+        found during the conversion back into the entries
+
+        Args:
+            files_with_tags: the entries passed to cad_to_h5m.
+            cubit: the cubit module.
+
+        Returns:
+            The manifest of the checkpoint
+        """
+        manifest = self.load()
+        cubit.cmd(f'open "{self.session_path}"')
+        for entry, saved in zip(files_with_tags, manifest["geometry_details"]):
+            entry.update(saved)
+        return manifest
+
+    def restore_h5m(self, h5m_filename: str):
+        """Copies the h5m file saved after the export stage to h5m_filename"""
+        Path(h5m_filename).parents[0].mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(self.h5m_path, h5m_filename)
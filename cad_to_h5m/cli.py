@@ -0,0 +1,263 @@
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .cache import hash_file
+from .core import cad_to_h5m
+from .journal import replay_journal
+
+
+def load_manifest(manifest_filename: str) -> dict:
+    """Reads a JSON or YAML manifest with the files_with_tags entries and any
+    other arguments of cad_to_h5m. Relative CAD, output and folder paths are
+    relative to the folder of the manifest.
+
+    Args:
+        manifest_filename: the .json, .yaml or .yml manifest filename.
+    """
+    suffix = Path(manifest_filename).suffix
+    with open(manifest_filename) as infile:
+        if suffix == ".json":
+            manifest = json.load(infile)
+        elif suffix in [".yaml", ".yml"]:
+            try:
+                import yaml
+            except ImportError as error:
+                msg = "PyYAML is needed to read YAML manifests, pip install pyyaml"
+                raise ImportError(msg) from error
+            manifest = yaml.safe_load(infile)
+        else:
+            msg = (
+                "The manifest should end with .json, .yaml or .yml. The "
+                f'provided manifest "{manifest_filename}" does not'
+            )
+            raise ValueError(msg)
+
+    if not isinstance(manifest, dict) or "files_with_tags" not in manifest:
+        msg = f"The manifest {manifest_filename} has no files_with_tags entries"
+        raise ValueError(msg)
+
+    folder = Path(manifest_filename).parent
+    for entry in manifest["files_with_tags"]:
+        if "cad_filename" in entry:
+            entry["cad_filename"] = str(folder / entry["cad_filename"])
+    for key, value in manifest.items():
+        if isinstance(value, str) and key.endswith(("_filename", "_dir")):
+            manifest[key] = str(folder / value)
+    return manifest
+
+
+def watched_files(manifest_filename: str) -> List[str]:
+    """Returns the manifest and the CAD files it lists, the files that
+    trigger a rebuild when they change"""
+    try:
+        manifest = load_manifest(manifest_filename)
+    except (OSError, ValueError):
+        return [manifest_filename]
+    cad_filenames = [
+        entry["cad_filename"]
+        for entry in manifest["files_with_tags"]
+        if "cad_filename" in entry
+    ]
+    return [manifest_filename] + sorted(set(cad_filenames))
+
+
+def _stat_signature(filename: str) -> Optional[tuple]:
+    try:
+        stat = Path(filename).stat()
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def file_hashes(filenames: List[str]) -> Dict[str, Optional[str]]:
+    """Returns the hash of the contents of each file, None for missing files"""
+    return {
+        filename: hash_file(filename) if Path(filename).is_file() else None
+        for filename in filenames
+    }
+
+
+def wait_for_changes(
+    manifest_filename: str,
+    hashes: Dict[str, Optional[str]],
+    interval: float = 0.5,
+    debounce: float = 1.0,
+) -> Dict[str, Optional[str]]:
+    """Polls the manifest and CAD files until the contents of one of them
+    changes. A burst of saves is waited out until the files have been
+    unchanged for the debounce time and then the files are hashed, so saving
+    a file without changing it does not trigger a rebuild.
+
+    Args:
+        manifest_filename: the manifest filename.
+        hashes: the hashes of the files used by the last build.
+        interval: the number of seconds between checks of the files.
+        debounce: the number of seconds the files must be unchanged for.
+
+    Returns:
+        The hashes of the files that have changed
+    """
+    filenames = watched_files(manifest_filename)
+    signatures = {filename: _stat_signature(filename) for filename in filenames}
+    last_change = None
+    while True:
+        time.sleep(interval)
+        current = {filename: _stat_signature(filename) for filename in filenames}
+        if current != signatures:
+            signatures = current
+            last_change = time.monotonic()
+            continue
+        if last_change is None or time.monotonic() - last_change < debounce:
+            continue
+
+        last_change = None
+        new_hashes = file_hashes(watched_files(manifest_filename))
+        if new_hashes != hashes:
+            return new_hashes
+        # the manifest may list different CAD files after it was saved
+        filenames = list(new_hashes)
+        signatures = {filename: _stat_signature(filename) for filename in filenames}
+
+
+def build(manifest_filename: str, overrides: Optional[dict] = None):
+    """Converts the CAD files of a manifest with cad_to_h5m
+
+    Args:
+        manifest_filename: the manifest filename.
+        overrides: arguments of cad_to_h5m that replace those in the manifest.
+
+    Returns:
+        The h5m filename, or the planned Cubit commands for a dry run
+    """
+    arguments = load_manifest(manifest_filename)
+    arguments.update(overrides or {})
+    return cad_to_h5m(**arguments)
+
+
+def watch(
+    manifest_filename: str,
+    overrides: Optional[dict] = None,
+    interval: float = 0.5,
+    debounce: float = 1.0,
+    max_builds: Optional[int] = None,
+):
+    """Builds the manifest and then rebuilds it each time the contents of the
+    manifest or one of its CAD files change. A failed build is reported and
+    the files are watched for the next change.
+
+    Args:
+        manifest_filename: the manifest filename.
+        overrides: arguments of cad_to_h5m that replace those in the manifest.
+        interval: the number of seconds between checks of the files.
+        debounce: the number of seconds the files must be unchanged for
+            before rebuilding.
+        max_builds: the number of builds to stop after, defaults to watching
+            until interrupted.
+    """
+    builds = 0
+    hashes = file_hashes(watched_files(manifest_filename))
+    while True:
+        start_time = time.perf_counter()
+        try:
+            h5m_filename = build(manifest_filename, overrides)
+        except Exception as error:
+            print(f"build failed: {error!r}", file=sys.stderr)
+        else:
+            print(f"built {h5m_filename} in {time.perf_counter() - start_time:.1f}s")
+        builds += 1
+        if max_builds is not None and builds >= max_builds:
+            return
+        print(f"watching {manifest_filename} and its CAD files for changes")
+        hashes = wait_for_changes(manifest_filename, hashes, interval, debounce)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="cad-to-h5m",
+        description=(
+            "Converts the CAD files of a JSON or YAML manifest into a DAGMC h5m "
+            "file. The manifest contains the files_with_tags entries and any "
+            "other arguments of the cad_to_h5m function. A journal recorded "
+            "with the journal_filename argument is replayed instead."
+        ),
+    )
+    parser.add_argument(
+        "manifest",
+        help=(
+            "the .json, .yaml or .yml manifest, or a .jou journal recorded by "
+            "cad_to_h5m to replay"
+        ),
+    )
+    parser.add_argument("-o", "--h5m-filename", help="the output h5m filename")
+    parser.add_argument(
+        "-c", "--cubit-path", help="the path to the Cubit directory to import from"
+    )
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        action="store_true",
+        default=None,
+        help="print the Cubit output",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="print the Cubit commands of the conversion without running Cubit",
+    )
+    parser.add_argument(
+        "-w",
+        "--watch",
+        action="store_true",
+        help="rebuild whenever the manifest or one of its CAD files changes",
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=0.5,
+        help="the seconds between checks of the watched files",
+    )
+    parser.add_argument(
+        "--debounce",
+        type=float,
+        default=1.0,
+        help="the seconds the watched files must be unchanged for to rebuild",
+    )
+    args = parser.parse_args(argv)
+
+    overrides = {}
+    if args.verbose is not None:
+        overrides["verbose"] = args.verbose
+    if args.h5m_filename is not None:
+        overrides["h5m_filename"] = args.h5m_filename
+    if args.cubit_path is not None:
+        overrides["cubit_path"] = args.cubit_path
+
+    if Path(args.manifest).suffix == ".jou":
+        cubit_path = {"cubit_path": args.cubit_path} if args.cubit_path else {}
+        for filename in replay_journal(args.manifest, **cubit_path).values():
+            print(filename)
+        return 0
+
+    if args.dry_run:
+        overrides["dry_run"] = True
+        for command in build(args.manifest, overrides):
+            print(command)
+        return 0
+
+    if args.watch:
+        try:
+            watch(args.manifest, overrides, args.interval, args.debounce)
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    print(build(args.manifest, overrides))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
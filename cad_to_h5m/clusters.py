@@ -0,0 +1,127 @@
+from dataclasses import asdict, dataclass, field
+from typing import Iterable, List
+
+import numpy as np
+
+
+@dataclass
+class ClusterReport:
+    """The clusters of touching volumes found by find_volume_clusters
+
+    Args:
+        clusters: the ids of the volumes in each cluster of two or more
+            touching volumes.
+        isolated_volumes: the number of volumes that touch no other volume.
+        candidate_pairs: the number of pairs of volumes that imprinting or
+            merging all volumes would consider.
+        touching_pairs: the number of pairs of volumes whose bounding boxes,
+            expanded by the tolerance, overlap.
+        pruned_pairs: the number of candidate pairs that are not in the same
+            cluster and so are not imprinted or merged together.
+    """
+
+    clusters: List[List[int]] = field(default_factory=list)
+    isolated_volumes: int = 0
+    candidate_pairs: int = 0
+    touching_pairs: int = 0
+    pruned_pairs: int = 0
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def volume_bounding_boxes(volume_ids: Iterable[int], cubit) -> np.ndarray:
+    """Returns the [xmin, ymin, zmin, xmax, ymax, zmax] of each volume
+
+    Args:
+        volume_ids: the ids of the volumes.
+        cubit: the cubit module.
+    """
+    boxes = []
+    for volume_id in volume_ids:
+        # cubit returns [xmin, xmax, xrange, ymin, ymax, yrange, zmin, zmax,
+        # zrange, diagonal]
+        box = cubit.get_bounding_box("volume", int(volume_id))
+        boxes.append([box[0], box[3], box[6], box[1], box[4], box[7]])
+    return np.array(boxes, dtype=float).reshape(-1, 6)
+
+
+def find_touching_pairs(boxes: np.ndarray, tolerance: float = 0.0) -> np.ndarray:
+    """Returns the index pairs of the boxes that overlap once each box is
+    expanded by the tolerance. The boxes are sorted by their lower x value and
+    swept so that only boxes that overlap in x are compared, rather than every
+    pair of boxes.
+
+    Args:
+        boxes: the [xmin, ymin, zmin, xmax, ymax, zmax] of each box.
+        tolerance: the distance to expand each box by in every direction.
+    """
+    boxes = np.asarray(boxes, dtype=float).reshape(-1, 6)
+    order = np.argsort(boxes[:, 0], kind="stable")
+    lower = boxes[order, :3] - tolerance
+    upper = boxes[order, 3:] + tolerance
+
+    # the boxes after each box in the sweep that start before it ends in x
+    sweep_ends = np.searchsorted(lower[:, 0], upper[:, 0], side="right")
+    pairs = []
+    for index in range(len(boxes)):
+        others = np.arange(index + 1, sweep_ends[index])
+        if len(others) == 0:
+            continue
+        overlaps = np.all(
+            (lower[others, 1:] <= upper[index, 1:])
+            & (upper[others, 1:] >= lower[index, 1:]),
+            axis=1,
+        )
+        others = others[overlaps]
+        pairs.append(np.stack([np.full(len(others), index), others], axis=1))
+    if not pairs:
+        return np.zeros((0, 2), dtype=int)
+    return order[np.concatenate(pairs)]
+
+
+def find_volume_clusters(
+    volume_ids: Iterable[int], cubit, tolerance: float = 0.0
+) -> ClusterReport:
+    """Groups the volumes into clusters of volumes that touch, directly or
+    through other volumes in the cluster, judged by their bounding boxes
+    expanded by the tolerance. Volumes in different clusters can't share
+    surfaces so they don't need to be imprinted or merged together.
+
+    Args:
+        volume_ids: the ids of the volumes.
+        cubit: the cubit module.
+        tolerance: the distance to expand each bounding box by, such as the
+            merge tolerance.
+    """
+    volume_ids = [int(volume_id) for volume_id in volume_ids]
+    pairs = find_touching_pairs(volume_bounding_boxes(volume_ids, cubit), tolerance)
+
+    parents = list(range(len(volume_ids)))
+
+    def find_root(index):
+        while parents[index] != index:
+            parents[index] = parents[parents[index]]
+            index = parents[index]
+        return index
+
+    for first, second in pairs.tolist():
+        parents[find_root(first)] = find_root(second)
+
+    members = {}
+    for index, volume_id in enumerate(volume_ids):
+        members.setdefault(find_root(index), []).append(volume_id)
+    clusters = sorted(
+        (sorted(cluster) for cluster in members.values() if len(cluster) > 1),
+        key=lambda cluster: cluster[0],
+    )
+
+    candidate_pairs = len(volume_ids) * (len(volume_ids) - 1) // 2
+    clustered_pairs = sum(len(c) * (len(c) - 1) // 2 for c in clusters)
+    return ClusterReport(
+        clusters=clusters,
+        isolated_volumes=len(volume_ids) - sum(len(c) for c in clusters),
+        candidate_pairs=candidate_pairs,
+        touching_pairs=len(pairs),
+        pruned_pairs=candidate_pairs - clustered_pairs,
+    )
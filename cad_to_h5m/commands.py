@@ -0,0 +1,95 @@
+from typing import Iterable, List
+
+
+def format_ids(ids: Iterable) -> str:
+    """Returns a Cubit id list with runs of consecutive ids written as ranges,
+    for example [1, 2, 3, 4, 7] becomes "1 to 4 7"
+
+    Args:
+        ids: the entity ids as integers or strings.
+    """
+    sorted_ids = sorted(set(int(entity_id) for entity_id in ids))
+    ranges = []
+    for entity_id in sorted_ids:
+        if ranges and entity_id == ranges[-1][1] + 1:
+            ranges[-1][1] = entity_id
+        else:
+            ranges.append([entity_id, entity_id])
+    return " ".join(
+        str(start) if start == end else f"{start} to {end}" for start, end in ranges
+    )
+
+
+class CountingCubit:
+    """Wraps the cubit module and counts the commands sent with cmd. All other
+    attributes are passed through to the cubit module.
+
+    Args:
+        cubit: the cubit module to wrap.
+        record: flag to control if the commands are also stored in the
+            commands attribute.
+    """
+
+    def __init__(self, cubit, record: bool = False):
+        self._cubit = cubit
+        self.record = record
+        self.command_count = 0
+        self.commands: List[str] = []
+
+    def cmd(self, command: str):
+        self.command_count += 1
+        if self.record:
+            self.commands.append(command)
+        return self._cubit.cmd(command)
+
+    def __getattr__(self, name):
+        return getattr(self._cubit, name)
+
+
+class CommandBuffer:
+    """Collects Cubit commands and sends them in bulk. Commands added with add
+    contain an "{ids}" placeholder and commands with the same template are
+    coalesced into a single command acting on all of their ids. This keeps the
+    number of commands constant as the number of volumes and surfaces grows.
+    Commands are sent in the order their template was first added when flush
+    is called or when the buffer is used as a context manager and exits.
+
+    Args:
+        cubit: the cubit module to send the commands to.
+    """
+
+    def __init__(self, cubit):
+        self.cubit = cubit
+        self._queue = []
+        self._ids = {}
+
+    def add(self, template: str, ids: Iterable):
+        """Adds a command that acts on a list of entity ids, for example
+        add('group "mat:steel" add volume {ids}', [1, 2])"""
+        if template not in self._ids:
+            self._ids[template] = []
+            self._queue.append(template)
+        self._ids[template].extend(ids)
+
+    def cmd(self, command: str):
+        """Adds a command that is sent as it is"""
+        self._queue.append(command)
+
+    def flush(self):
+        """Sends the collected commands to Cubit and empties the buffer"""
+        for command in self._queue:
+            if command in self._ids:
+                ids = self._ids[command]
+                if ids:
+                    self.cubit.cmd(command.replace("{ids}", format_ids(ids)))
+            else:
+                self.cubit.cmd(command)
+        self._queue = []
+        self._ids = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.flush()
@@ -1,15 +1,38 @@
-import sys
 import os
 import json
-from typing import Dict, List, TypedDict, Optional
+import tempfile
+from contextlib import nullcontext
+from inspect import signature
+from typing import Callable, Dict, List, TypedDict, Optional, Union
 from pathlib import Path
 
+from .cache import ConversionCache, conversion_key, hash_file
+from .checkpoint import Checkpoint
+from .clusters import ClusterReport, find_volume_clusters
+from .commands import CommandBuffer, CountingCubit, format_ids
+from .dedupe import DeduplicationReport, heal_unique_volumes
+from .faceting import faceting_filename, search_faceting_tolerance
+from .incremental import restore_session, save_session
+from .index import build_geometry_index
+from .inspect import count_volume_triangles
+from .journal import write_journal
+from .mesh_export import MaterialMeshStats, export_tet_mesh
+from .meshing import create_tet_mesh, mesh_in_parallel
+from .preprocess import preprocess_files, preprocessed_file_key
+from .plan import record_commands
+from .profiling import ConversionReport, StageRecord
+from .stitch import find_make_watertight, seal, stitch_surfaces
+from .stl import stl_to_h5m
+from .surfaces import classify_surfaces
+from .utils import find_import_type, import_cubit
+
 
 class FilesWithTags(TypedDict, total=False):
     filename: str
     material_tag: str
-    tet_mesh: str
+    tet_mesh: Union[str, dict]
     scale: float
+    faceting_tolerance: float
 
 
 def cad_to_h5m(
@@ -27,6 +50,27 @@ def cad_to_h5m(
     implicit_complement_material_tag: Optional[str] = None,
     verbose: bool = True,
     autoheal: bool = False,
+    cache_dir: Optional[str] = None,
+    cache_max_size: Optional[int] = 10 * 1024**3,
+    preprocessed_cache_dir: Optional[str] = None,
+    max_workers: Optional[int] = None,
+    profile: bool = False,
+    stage_callback: Optional[Callable[[StageRecord], None]] = None,
+    incremental_dir: Optional[str] = None,
+    mesh_workers: int = 1,
+    triangle_budget: Optional[int] = None,
+    max_chord_deviation: Optional[float] = None,
+    faceting_workers: int = 1,
+    faceting_tolerances: Optional[Dict[str, float]] = None,
+    cluster_imprint_merge: bool = False,
+    geometry_index_filename: Optional[str] = None,
+    dry_run: bool = False,
+    checkpoint_dir: Optional[str] = None,
+    journal_filename: Optional[str] = None,
+    deduplicate: bool = False,
+    cubit_free: bool = False,
+    mesh_h5m_filename: Optional[str] = None,
+    mesh_vtu_filename: Optional[str] = None,
 ):
     """Converts a CAD files in STP or SAT format into a h5m file for use in
     DAGMC simulations. The h5m file contains material tags associated with the
@@ -39,10 +83,19 @@ def cad_to_h5m(
         "mat2", "cad_filename": "part2.stp"}]. There is also an option to create
         a tet mesh of entries by including a "tet_mesh" key in the dictionary.
         The value is passed to the Cubit mesh command. An example entry would be
-        "tet_mesh": "size 0.5". The scale key can also be included to scale up
+        "tet_mesh": "size 0.5". The value can instead be a target number of
+        tets, "tet_mesh": {"tets": 100000}, or a memory budget in bytes,
+        "tet_mesh": {"memory": 2e9}, with an optional relative "tolerance"
+        that defaults to 0.1, and the size is then fitted to the target, see
+        fit_tet_mesh_sizes. The scale key can also be included to scale up
         or down the geometry so that it is in cm units as required by most
         particle transport codes. And example entry would be "scale": 10 which
-        would make the geometry 10 times bigger.
+        would make the geometry 10 times bigger. The faceting_tolerance key
+        sets the faceting tolerance of the volumes of an entry, for example
+        "faceting_tolerance": 1e-4 for a part that needs finer facets. The
+        number of triangles on the surfaces of the volumes of each entry is
+        added to the entry, and the geometry details, in a "triangles" key when
+        h5py is installed.
     h5m_filename: the file name of the output h5m file which is suitable for
         use in DAGMC enabled particle transport codes.
     cubit_filename: the file name of the output cubit file. Should end with .cub
@@ -54,7 +107,8 @@ def cad_to_h5m(
     merge_tolerance: The merge tolerance to apply when merging surfaces into
         one.
     faceting_tolerance: The faceting tolerance to apply when faceting edges. Use
-        a faceting_tolerance 1.0e-4
+        a faceting_tolerance 1.0e-4. This is used for entries without their own
+        faceting_tolerance or a material tag in faceting_tolerances.
     make_watertight: flag to control if the geometry is made watertight prior to
         exporting the h5m file
     imprint: flag to control if the geometry is imprinted prior to exporting
@@ -68,6 +122,105 @@ def cad_to_h5m(
         in OpenMC and MCNP.
     implicit_complement_material_tag: Material tag to be assigned to the
         implicit complement. Defaults to vacuum.
+    cache_dir: The folder used to cache the output files. When set, the output
+        files of previous conversions with identical CAD file contents,
+        files_with_tags entries and parameters are copied from the cache
+        instead of running Cubit. Defaults to None which disables the cache.
+    cache_max_size: The maximum size of the cache folder in bytes. The least
+        recently used conversions are removed once this size is exceeded.
+    preprocessed_cache_dir: The folder used to cache each STEP and SAT file
+        after it has been imported, united, validated, scaled and optionally
+        autohealed. Cached files are saved in the ACIS sat format and are
+        imported directly on later conversions. Defaults to None which
+        disables the cache.
+    max_workers: The maximum number of worker processes used to preprocess
+        files that are not in the preprocessed_cache_dir. Defaults to the
+        number of processors on the machine.
+    profile: flag to control if the wall time, peak memory, number of Cubit
+        commands and entity counts of each stage are recorded and saved to a
+        JSON file. The file is saved next to the geometry_details_filename, or
+        next to the h5m_filename if no geometry_details_filename is provided,
+        with "_profile.json" appended to the stem of the filename.
+    stage_callback: An optional function that is called with a StageRecord
+        containing the measurements of each stage as soon as it finishes.
+    incremental_dir: The folder used to save the Cubit session after the CAD
+        files have been imported and scaled. When set, later conversions reopen
+        the saved session and only import the files_with_tags entries whose CAD
+        file contents or scale have changed. Defaults to None which imports
+        every file.
+    mesh_workers: The number of worker processes used to tet mesh the entries
+        with a tet_mesh key. When more than one, volumes that do not share
+        merged surfaces are meshed in parallel from a saved copy of the session
+        and the meshes are combined into the exo_filename and cubit_filename.
+        Defaults to 1 which meshes all volumes in the current session.
+    triangle_budget: The maximum number of triangles in the h5m file. When set,
+        the faceting_tolerance is ignored and the smallest faceting tolerance
+        that fits within the budget is searched for by exporting the merged
+        geometry at several tolerances, unless a max_chord_deviation is also
+        set. The tolerances tried and their number of triangles are saved next
+        to the h5m_filename with "_faceting.json" appended to the stem of the
+        filename.
+    max_chord_deviation: The maximum distance between the facets and the
+        surfaces of the geometry. When set, the faceting_tolerance is ignored
+        and the largest faceting tolerance that meets it, the
+        max_chord_deviation itself, is used. An error is raised if it gives
+        more triangles than any triangle_budget.
+    faceting_workers: The number of worker processes used to export the
+        geometry at different faceting tolerances when searching for a
+        faceting tolerance that meets the triangle_budget. Defaults to 1 which
+        exports each tolerance in turn in the current session.
+    faceting_tolerances: The faceting tolerance of the volumes of each material
+        tag, for example {"first_wall": 1e-4, "bioshield": 1e-1}. A
+        faceting_tolerance key in an entry takes precedence. When volumes have
+        different faceting tolerances the geometry is exported at each
+        tolerance and the surfaces are combined into one h5m file, with each
+        surface faceted at the finest tolerance of the volumes it bounds.
+    cluster_imprint_merge: flag to control if the volumes are grouped into
+        clusters of touching volumes before imprinting and merging. The
+        bounding boxes of the volumes, expanded by the merge_tolerance, are
+        compared and each cluster is imprinted and merged separately so that
+        volumes that can't touch are never compared. The number of pairs of
+        volumes pruned is printed when verbose and saved in the profile.
+    geometry_index_filename: The filename of a NumPy .npz file to save the
+        bounding box, volume, surface ids, reflecting surfaces and number of
+        triangles of each volume to, along with its material tag and CAD file.
+        The file can be loaded with GeometryIndex.load to look up volumes by
+        material, CAD file or point without Cubit.
+    dry_run: flag to control if the conversion is only planned. The entries
+        and arguments are validated without importing Cubit and the list of
+        Cubit commands that the conversion would run is returned instead of
+        the h5m_filename, see plan.
+    checkpoint_dir: The folder used to save the Cubit session, the entries and
+        the h5m file after the import, merge and export stages. A conversion
+        with the same inputs resumes after the last of these stages saved in
+        the folder, so a conversion that fails while exporting or meshing
+        does not import and merge the geometry again.
+    journal_filename: The filename of a Cubit journal (.jou) to record the
+        commands of the conversion in, with the volume ids found during the
+        conversion, see replay_journal. A manifest of the CAD file hashes and
+        outputs is saved next to it with _manifest.json appended to the name.
+        Options that run commands in other processes or sessions, or that
+        combine h5m files in Python, can't be recorded.
+    deduplicate: flag to control if identical parts are imported and healed
+        once. Entries with the same CAD file contents as an earlier entry copy
+        its volumes instead of importing the file and, when autoheal is set,
+        volumes that are moved or rotated (about the z axis) copies of each
+        other are replaced by copies of one healed volume.
+    cubit_free: flag to control if a model made only of STL files is written
+        to the h5m file with NumPy and h5py instead of Cubit, see stl_to_h5m.
+        Each STL file becomes a volume, vertices within the merge_tolerance
+        are welded and facets found in two volumes are shared between them.
+        Options that need a Cubit session, such as tet meshes and cub files,
+        can't be used.
+    mesh_h5m_filename: The filename of a MOAB h5m file to write the tet mesh
+        of the entries with a tet_mesh key to, for use in unstructured mesh
+        tallies, see export_tet_mesh. The tets are read from Cubit and written
+        in chunks without an Exodus file. The number of tets and the sum of
+        their volumes are added to each entry as "tets" and "tet_volume" keys
+        and the totals of each material are printed when verbose and saved in
+        the profile.
+    mesh_vtu_filename: The filename of a VTK .vtu file to write the tet mesh
+        to, with the volume id and material of each tet.
     """
 
     if h5m_filename is None or Path(h5m_filename).suffix == ".h5m":
@@ -98,102 +251,791 @@ def cad_to_h5m(
         )
         raise ValueError(msg)
 
-    sys.path.append(cubit_path)
+    if mesh_h5m_filename is None or Path(mesh_h5m_filename).suffix == ".h5m":
+        pass
+    else:
+        msg = (
+            'The mesh_h5m_filename argument should end with ".h5m". The provided '
+            f'mesh_h5m_filename "{mesh_h5m_filename}" does not end with .h5m'
+        )
+        raise ValueError(msg)
 
-    try:
-        import cubit
-    except ImportError:
+    if mesh_vtu_filename is None or Path(mesh_vtu_filename).suffix == ".vtu":
+        pass
+    else:
         msg = (
-            "import cubit failed, cubit was not importable from the "
-            f"provided path {cubit_path}"
+            'The mesh_vtu_filename argument should end with ".vtu". The provided '
+            f'mesh_vtu_filename "{mesh_vtu_filename}" does not end with .vtu'
         )
-        raise ImportError(msg)
-
-    cubit.init([])
-    if not verbose:
-        cubit.cmd("set echo off")
-        cubit.cmd("set info off")
-        cubit.cmd("set journal off")
-        cubit.cmd("set warning off")
-
-    (
-        geometry_details,
-        total_number_of_volumes,
-    ) = find_number_of_volumes_in_each_step_file(
-        files_with_tags, cubit, verbose, autoheal
-    )
+        raise ValueError(msg)
+
+    if (
+        geometry_index_filename is None
+        or Path(geometry_index_filename).suffix == ".npz"
+    ):
+        pass
+    else:
+        msg = (
+            'The geometry_index_filename argument should end with ".npz". The '
+            f'provided geometry_index_filename "{geometry_index_filename}" does '
+            "not end with .npz"
+        )
+        raise ValueError(msg)
 
-    scale_geometry(geometry_details, cubit, autoheal)
+    check_files_with_tags(files_with_tags)
 
-    tag_geometry_with_mats(geometry_details, implicit_complement_material_tag, cubit)
+    if journal_filename is not None:
+        if Path(journal_filename).suffix != ".jou":
+            msg = (
+                'The journal_filename argument should end with ".jou". The '
+                f'provided journal_filename "{journal_filename}" does not end '
+                "with .jou"
+            )
+            raise ValueError(msg)
+        unsupported = [
+            name
+            for name, value in [
+                ("cache_dir", cache_dir),
+                ("incremental_dir", incremental_dir),
+                ("checkpoint_dir", checkpoint_dir),
+                ("triangle_budget", triangle_budget),
+                ("max_chord_deviation", max_chord_deviation),
+                ("faceting_tolerances", faceting_tolerances),
+                ("mesh_workers", mesh_workers if mesh_workers > 1 else None),
+                ("mesh_h5m_filename", mesh_h5m_filename),
+                ("mesh_vtu_filename", mesh_vtu_filename),
+            ]
+            if value is not None
+        ]
+        if any("faceting_tolerance" in entry for entry in files_with_tags):
+            unsupported.append("faceting_tolerance of entries")
+        if unsupported:
+            msg = f"A journal can't be recorded for a conversion with {unsupported}"
+            raise ValueError(msg)
 
-    if imprint and total_number_of_volumes > 1:
-        imprint_geometry(cubit)
-    if total_number_of_volumes > 1:
-        merge_geometry(merge_tolerance, cubit)
+    if cubit_free:
+        unsupported = [
+            name
+            for name, value in [
+                ("cubit_filename", cubit_filename),
+                ("exo_filename", exo_filename),
+                ("geometry_index_filename", geometry_index_filename),
+                ("preprocessed_cache_dir", preprocessed_cache_dir),
+                ("incremental_dir", incremental_dir),
+                ("checkpoint_dir", checkpoint_dir),
+                ("journal_filename", journal_filename),
+                ("triangle_budget", triangle_budget),
+                ("max_chord_deviation", max_chord_deviation),
+                ("faceting_tolerances", faceting_tolerances),
+                ("mesh_h5m_filename", mesh_h5m_filename),
+                ("mesh_vtu_filename", mesh_vtu_filename),
+            ]
+            if value is not None
+        ]
+        for key in ["tet_mesh", "surface_reflectivity"]:
+            if any(key in entry for entry in files_with_tags):
+                unsupported.append(f"{key} of entries")
+        if unsupported:
+            msg = f"A conversion without Cubit can't be made with {unsupported}"
+            raise ValueError(msg)
+        not_stl = [
+            entry["cad_filename"]
+            for entry in files_with_tags
+            if find_import_type(entry["cad_filename"]) != "stl"
+        ]
+        if not_stl:
+            msg = f"Only STL files can be converted without Cubit, not {not_stl}"
+            raise ValueError(msg)
 
-    # TODO method requires further testing
-    find_reflecting_surfaces_of_reflecting_wedge(
-        geometry_details, surface_reflectivity_name, cubit, verbose
-    )
+    if (triangle_budget is not None or max_chord_deviation is not None) and (
+        faceting_tolerances or any("faceting_tolerance" in e for e in files_with_tags)
+    ):
+        msg = (
+            "A triangle_budget or max_chord_deviation can't be combined with "
+            "faceting tolerances for individual entries or materials"
+        )
+        raise ValueError(msg)
 
-    save_output_files(
-        make_watertight,
-        geometry_details,
-        h5m_filename,
-        cubit_filename,
-        geometry_details_filename,
-        faceting_tolerance,
-        exo_filename,
-        cubit,
-        verbose,
+    if dry_run:
+        # only the arguments are passed on, not the variables of the checks
+        local_values = dict(locals())
+        arguments = {
+            name: local_values[name]
+            for name in signature(cad_to_h5m).parameters
+            if name != "dry_run"
+        }
+        return record_commands(**arguments)
+
+    outputs = {
+        "h5m": h5m_filename,
+        "cub": cubit_filename,
+        "exo": exo_filename,
+        "json": geometry_details_filename,
+        "index": geometry_index_filename,
+        "mesh_h5m": mesh_h5m_filename,
+        "vtu": mesh_vtu_filename,
+    }
+    if cache_dir is not None or checkpoint_dir is not None:
+        key = conversion_key(
+            files_with_tags,
+            merge_tolerance=merge_tolerance,
+            faceting_tolerance=faceting_tolerance,
+            make_watertight=make_watertight,
+            imprint=imprint,
+            autoheal=autoheal,
+            surface_reflectivity_name=surface_reflectivity_name,
+            implicit_complement_material_tag=implicit_complement_material_tag,
+            # only included when set so that the keys of earlier conversions
+            # are unchanged
+            **{
+                name: value
+                for name, value in [
+                    ("triangle_budget", triangle_budget),
+                    ("max_chord_deviation", max_chord_deviation),
+                    ("faceting_tolerances", faceting_tolerances),
+                    ("cluster_imprint_merge", cluster_imprint_merge or None),
+                    ("deduplicate", deduplicate or None),
+                    ("cubit_free", cubit_free or None),
+                ]
+                if value is not None
+            },
+        )
+    if cache_dir is not None:
+        cache = ConversionCache(cache_dir, max_size=cache_max_size)
+        if cache.fetch(key, outputs):
+            if verbose:
+                print(f"using cached conversion {key}")
+            return h5m_filename
+
+    if profile or stage_callback is not None:
+        report = ConversionReport(stage_callback)
+    else:
+        report = None
+
+    if cubit_free:
+        with (
+            report.stage("stl", h5m_filename=h5m_filename) if report else nullcontext()
+        ):
+            geometry_details = stl_to_h5m(
+                files_with_tags,
+                h5m_filename,
+                merge_tolerance,
+                implicit_complement_material_tag,
+                verbose,
+            )
+        count_entry_triangles(geometry_details, h5m_filename)
+        save_geometry_details(geometry_details, geometry_details_filename)
+        if profile:
+            report.write(profile_filename(geometry_details_filename or h5m_filename))
+        if cache_dir is not None:
+            cache.store(key, outputs)
+        return h5m_filename
+
+    if preprocessed_cache_dir is not None:
+        with report.stage("preprocess") if report else nullcontext():
+            preprocessed_files = preprocess_files(
+                files_with_tags,
+                preprocessed_cache_dir,
+                cubit_path,
+                autoheal,
+                max_workers,
+                verbose,
+            )
+    else:
+        preprocessed_files = {}
+
+    if checkpoint_dir is not None:
+        checkpoint = Checkpoint(checkpoint_dir, key)
+    else:
+        checkpoint = None
+
+    converter = Converter(
+        cubit_path, verbose, record_commands=journal_filename is not None
+    )
+    converter.convert(
+        files_with_tags,
+        h5m_filename=h5m_filename,
+        cubit_filename=cubit_filename,
+        merge_tolerance=merge_tolerance,
+        faceting_tolerance=faceting_tolerance,
+        make_watertight=make_watertight,
+        imprint=imprint,
+        geometry_details_filename=geometry_details_filename,
+        surface_reflectivity_name=surface_reflectivity_name,
+        exo_filename=exo_filename,
+        implicit_complement_material_tag=implicit_complement_material_tag,
+        autoheal=autoheal,
+        preprocessed_files=preprocessed_files,
+        report=report,
+        incremental_dir=incremental_dir,
+        mesh_workers=mesh_workers,
+        triangle_budget=triangle_budget,
+        max_chord_deviation=max_chord_deviation,
+        faceting_workers=faceting_workers,
+        faceting_tolerances=faceting_tolerances,
+        cluster_imprint_merge=cluster_imprint_merge,
+        geometry_index_filename=geometry_index_filename,
+        checkpoint=checkpoint,
+        deduplicate=deduplicate,
+        mesh_h5m_filename=mesh_h5m_filename,
+        mesh_vtu_filename=mesh_vtu_filename,
     )
 
-    # resets cubit workspace
-    cubit.cmd("reset")
+    if journal_filename is not None:
+        # the workspace is reset after the conversion, which is left out
+        write_journal(
+            journal_filename,
+            converter.cubit.commands[:-1],
+            files_with_tags,
+            {kind: outputs[kind] for kind in ["h5m", "cub", "exo"]},
+        )
+
+    if profile:
+        report.write(profile_filename(geometry_details_filename or h5m_filename))
+
+    if cache_dir is not None:
+        cache.store(key, outputs)
 
     return h5m_filename
 
 
-def create_tet_mesh(geometry_details, cubit):
-    cubit.cmd("Trimesher volume gradation 1.3")
+def check_files_with_tags(files_with_tags: FilesWithTags):
+    """Checks that each entry has a supported CAD file that exists and a valid
+    material tag so that mistakes are found before Cubit is imported.
 
-    cubit.cmd("volume all size auto factor 5")
-    for entry in geometry_details:
-        if "tet_mesh" in entry.keys():
-            for volume in entry["volumes"]:
-                cubit.cmd(
-                    "volume " + str(volume) + " size auto factor 6"
-                )  # this number is the size of the mesh 1 is small 10 is large
-                cubit.cmd("volume all scheme tetmesh proximity layers off")
-                # example entry ' size 0.5'
-                cubit.cmd(f"volume {volume} " + entry["tet_mesh"])
-                cubit.cmd("mesh volume " + str(volume))
+    Args:
+        files_with_tags: the entries passed to cad_to_h5m.
+    """
+    for entry in files_with_tags:
+        if "cad_filename" not in entry.keys():
+            msg = f"dictionary key cad_filename is missing for {entry}"
+            raise ValueError(msg)
+        find_import_type(entry["cad_filename"])
+        if not Path(entry["cad_filename"]).is_file():
+            msg = f'File with filename {entry["cad_filename"]} could not be found'
+            raise FileNotFoundError(msg)
+
+        if "material_tag" not in entry.keys():
+            msg = f"dictionary key material_tag is missing for {entry}"
+            raise ValueError(msg)
+        if len(entry["material_tag"]) > 27:
+            msg = (
+                "material_tag > 28 characters. Material tags "
+                "must be less than 28 characters use in DAGMC. "
+                f"{entry['material_tag']} is too long."
+            )
+            raise ValueError(msg)
+
+        for key in ["scale", "faceting_tolerance"]:
+            if key in entry.keys() and (
+                isinstance(entry[key], bool)
+                or not isinstance(entry[key], (int, float))
+                or entry[key] <= 0
+            ):
+                msg = f"{key} should be a positive number, not {entry[key]} in {entry}"
+                raise ValueError(msg)
+        if "tet_mesh" in entry.keys() and isinstance(entry["tet_mesh"], dict):
+            check_tet_mesh_target(entry)
+        elif "tet_mesh" in entry.keys() and not isinstance(entry["tet_mesh"], str):
+            msg = (
+                'tet_mesh should be a Cubit mesh instruction such as "size 0.5", '
+                'or a target such as {"tets": 100000}, '
+                f"not {entry['tet_mesh']} in {entry}"
+            )
+            raise ValueError(msg)
 
 
-def scale_geometry(geometry_details: dict, cubit, autoheal):
-    for entry in geometry_details:
+def check_tet_mesh_target(entry: dict):
+    """Checks that the tet_mesh target of an entry has either a number of
+    "tets" or a "memory" budget in bytes and an optional "tolerance" between 0
+    and 1, see fit_tet_mesh_sizes"""
+    target = entry["tet_mesh"]
+    if len({"tets", "memory"} & set(target)) != 1 or not set(target) <= {
+        "tets",
+        "memory",
+        "tolerance",
+    }:
+        msg = (
+            'A tet_mesh target should have either a "tets" or "memory" key and '
+            f'optionally a "tolerance" key, not {target} in {entry}'
+        )
+        raise ValueError(msg)
+    for key, value in target.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0:
+            msg = (
+                f"{key} of tet_mesh should be a positive number, not {value} in {entry}"
+            )
+            raise ValueError(msg)
+    if target.get("tolerance", 0) >= 1:
+        msg = f"tolerance of tet_mesh should be less than 1, not {target} in {entry}"
+        raise ValueError(msg)
+
+
+def profile_filename(filename: str) -> str:
+    """Returns the filename of the profile report saved next to filename"""
+    return str(Path(filename).with_name(Path(filename).stem + "_profile.json"))
+
+
+class Converter:
+    """A Cubit session that is initialised once and reused for many
+    conversions. The stages of the conversion are available as methods so
+    that they can be run individually, or all together with convert. The
+    Cubit workspace is reset after each conversion so that no geometry or
+    groups leak from one conversion into the next.
+
+    Args:
+        cubit_path: the path to the Cubit directory used to import Cubit from.
+            On Ubuntu with Cubit 2021.5 this would be
+            "/opt/Coreform-Cubit-2021.5/bin/"
+        verbose: flag to control the printing of Cubit output and additional
+            details.
+        record_commands: flag to control if the commands sent to Cubit are
+            kept in the commands attribute of the cubit attribute.
+        dry_run: flag to control if the exported files are read. When set the
+            conversion is only planned, see plan, so the exported h5m files
+            are not searched, stitched or counted.
+    """
+
+    def __init__(
+        self,
+        cubit_path: str = "/opt/Coreform-Cubit-2021.5/bin/",
+        verbose: bool = True,
+        record_commands: bool = False,
+        dry_run: bool = False,
+    ):
+        self.verbose = verbose
+        self.dry_run = dry_run
+        self.cubit_path = cubit_path
+        # counts the commands sent to cubit so that they can be measured
+        self.cubit = CountingCubit(import_cubit(cubit_path), record=record_commands)
+        self.cubit.init([])
+        if not verbose:
+            self.cubit.cmd("set echo off")
+            self.cubit.cmd("set info off")
+            self.cubit.cmd("set journal off")
+            self.cubit.cmd("set warning off")
+        self.geometry_details = None
+        self.total_number_of_volumes = 0
+        self.restored_files = {}
+        self.faceting_search = None
+        self.cluster_report = None
+        self.deduplication_report = None
+        self.mesh_stats = None
+        self.mesh_fits = []
+
+    @property
+    def command_count(self) -> int:
+        """The number of commands sent to Cubit by this Converter"""
+        return self.cubit.command_count
+
+    def import_files(
+        self,
+        files_with_tags: FilesWithTags,
+        autoheal: bool = False,
+        preprocessed_files: Optional[dict] = None,
+        incremental_dir: Optional[str] = None,
+        deduplicate: bool = False,
+    ):
+        """Imports the CAD files and records the volume ids of each entry. When
+        an incremental_dir is provided the session saved there by save_session
+        is reopened and only the entries that have changed are imported. When
+        deduplicate is set identical parts are imported and healed once and
+        the counts are kept in deduplication_report."""
+        if incremental_dir is None:
+            entries_to_import = files_with_tags
+        else:
+            entries_to_import = restore_session(
+                files_with_tags, incremental_dir, autoheal, self.cubit
+            )
+        # the volumes of restored entries were scaled and healed before the
+        # session was saved
+        self.restored_files = {
+            preprocessed_file_key(entry): incremental_dir
+            for entry in files_with_tags
+            if not any(entry is other for other in entries_to_import)
+        }
+        self.deduplication_report = DeduplicationReport() if deduplicate else None
+        find_number_of_volumes_in_each_step_file(
+            entries_to_import,
+            self.cubit,
+            self.verbose,
+            autoheal,
+            preprocessed_files,
+            self.deduplication_report,
+        )
+        self.geometry_details = files_with_tags
+        self.total_number_of_volumes = sum(
+            len(entry["volumes"]) for entry in files_with_tags
+        )
+        return self.geometry_details
+
+    def scale(self, autoheal: bool = False, preprocessed_files: Optional[dict] = None):
+        """Scales the volumes of entries with a scale key"""
+        scale_geometry(
+            self.geometry_details,
+            self.cubit,
+            autoheal,
+            {**(preprocessed_files or {}), **self.restored_files},
+        )
+
+    def save_session(self, incremental_dir: str, autoheal: bool = False):
+        """Saves the session and the volume ids of each entry so that later
+        conversions with an incremental_dir only import the entries that have
+        changed. Should be called after importing and scaling."""
+        save_session(self.geometry_details, incremental_dir, autoheal, self.cubit)
+
+    def tag(self, implicit_complement_material_tag: Optional[str] = None):
+        """Groups the volumes of each entry by material tag"""
+        tag_geometry_with_mats(
+            self.geometry_details, implicit_complement_material_tag, self.cubit
+        )
+
+    def find_clusters(self, merge_tolerance: float = 1e-4) -> ClusterReport:
+        """Groups the volumes into clusters of touching volumes, see
+        find_volume_clusters. Once found, imprint and merge act on each
+        cluster separately until the workspace is reset."""
+        self.cluster_report = find_volume_clusters(
+            self.cubit.parse_cubit_list("volume", "all"), self.cubit, merge_tolerance
+        )
+        if self.verbose:
+            print(
+                f"found {len(self.cluster_report.clusters)} clusters of touching "
+                f"volumes, pruning {self.cluster_report.pruned_pairs} of "
+                f"{self.cluster_report.candidate_pairs} pairs of volumes"
+            )
+        return self.cluster_report
+
+    def imprint(self):
+        """Imprints the geometry, skipped if there is a single volume"""
+        if self.total_number_of_volumes > 1:
+            imprint_geometry(self.cubit, self.clusters)
+
+    def merge(self, merge_tolerance: float = 1e-4):
+        """Merges the geometry, skipped if there is a single volume"""
+        if self.total_number_of_volumes > 1:
+            merge_geometry(merge_tolerance, self.cubit, self.clusters)
+
+    @property
+    def clusters(self) -> Optional[List[List[int]]]:
+        """The clusters found by find_clusters or None to act on all volumes"""
+        if self.cluster_report is None:
+            return None
+        return self.cluster_report.clusters
+
+    def reflect(self, surface_reflectivity_name: str = "reflective"):
+        """Groups the reflecting surfaces of entries with surface_reflectivity"""
+        find_reflecting_surfaces_of_reflecting_wedge(
+            self.geometry_details, surface_reflectivity_name, self.cubit, self.verbose
+        )
+
+    def export(
+        self,
+        h5m_filename: str = "dagmc.h5m",
+        faceting_tolerance: float = 1.0e-2,
+        make_watertight: bool = True,
+        geometry_details_filename: Optional[str] = None,
+        triangle_budget: Optional[int] = None,
+        max_chord_deviation: Optional[float] = None,
+        faceting_workers: int = 1,
+        faceting_tolerances: Optional[Dict[str, float]] = None,
+    ):
+        """Exports the DAGMC h5m file and saves the geometry details with the
+        number of triangles of each entry. When a triangle_budget or
+        max_chord_deviation is provided the faceting tolerance is searched for,
+        see search_faceting_tolerance, and the search is saved next to the h5m
+        file. Entries with their own faceting tolerance, or a material tag in
+        faceting_tolerances, are exported at that tolerance, see
+        export_h5m_with_tolerances. A dry run plans the export at the
+        faceting_tolerance, as a search needs the triangles of each trial
+        export, and does not stitch the exports or count their triangles."""
+        if self.dry_run:
+            export_h5m_with_tolerances(
+                h5m_filename,
+                self.geometry_details,
+                faceting_tolerance,
+                faceting_tolerances,
+                make_watertight,
+                self.cubit,
+                self.verbose,
+                dry_run=True,
+            )
+            return h5m_filename
+        if triangle_budget is None and max_chord_deviation is None:
+            export_h5m_with_tolerances(
+                h5m_filename,
+                self.geometry_details,
+                faceting_tolerance,
+                faceting_tolerances,
+                make_watertight,
+                self.cubit,
+                self.verbose,
+            )
+        else:
+            self.faceting_search = search_faceting_tolerance(
+                h5m_filename,
+                self.cubit,
+                triangle_budget=triangle_budget,
+                max_chord_deviation=max_chord_deviation,
+                make_watertight=make_watertight,
+                workers=faceting_workers,
+                cubit_path=self.cubit_path,
+                verbose=self.verbose,
+            )
+            self.faceting_search.write(faceting_filename(h5m_filename))
+        count_entry_triangles(self.geometry_details, h5m_filename)
+        save_geometry_details(self.geometry_details, geometry_details_filename)
+        return h5m_filename
+
+    def save_index(self, geometry_index_filename: str, h5m_filename: Optional[str]):
+        """Saves the properties of each volume to a GeometryIndex .npz file.
+        Should be called after exporting so that the number of triangles of
+        each volume can be read from the h5m file."""
+        index = build_geometry_index(self.geometry_details, self.cubit, h5m_filename)
+        index.save(geometry_index_filename)
+        return index
+
+    def mesh(
+        self,
+        exo_filename: Optional[str] = None,
+        cubit_filename: Optional[str] = None,
+        mesh_workers: int = 1,
+        mesh_h5m_filename: Optional[str] = None,
+        mesh_vtu_filename: Optional[str] = None,
+    ):
+        """Tet meshes entries with a tet_mesh key and saves the exo and cub
+        files, and the h5m and vtu files of the tet mesh, see export_tet_mesh.
+        When mesh_workers is more than one, independent volumes are meshed in
+        parallel worker processes. The sizes fitted to entries with a target
+        number of tets are kept in mesh_fits."""
+        if mesh_workers > 1:
+            self.mesh_fits = mesh_in_parallel(
+                self.geometry_details,
+                self.cubit,
+                self.cubit_path,
+                mesh_workers,
+                self.verbose,
+            )
+        else:
+            self.mesh_fits = create_tet_mesh(self.geometry_details, self.cubit)
+        if self.verbose:
+            for fit in self.mesh_fits:
+                print(
+                    f"volumes {fit.volume_ids} meshed with size {fit.size:.6g} "
+                    f"for a target of {fit.target_tets} tets"
+                )
+        save_mesh_files(exo_filename, cubit_filename, self.cubit, self.dry_run)
+        if mesh_h5m_filename is not None or mesh_vtu_filename is not None:
+            self.mesh_stats = export_tet_mesh(
+                self.geometry_details,
+                self.cubit,
+                mesh_h5m_filename,
+                mesh_vtu_filename,
+                from_blocks=mesh_workers > 1,
+            )
+            if self.verbose:
+                print_mesh_stats(self.mesh_stats)
+
+    def save_checkpoint(
+        self, checkpoint: Checkpoint, stage: str, h5m_filename: Optional[str] = None
+    ):
+        """Saves the session and the entries to the checkpoint after the stage,
+        see Checkpoint.save"""
+        checkpoint.save(
+            stage,
+            self.geometry_details,
+            self.cubit,
+            self.cluster_report.to_dict() if self.cluster_report else None,
+            h5m_filename,
+        )
+
+    def resume(self, files_with_tags: FilesWithTags, checkpoint: Checkpoint):
+        """Opens the session saved by save_checkpoint and restores the volume
+        ids of the entries and the clusters found before it was saved"""
+        manifest = checkpoint.restore(files_with_tags, self.cubit)
+        self.geometry_details = files_with_tags
+        self.total_number_of_volumes = sum(
+            len(entry["volumes"]) for entry in files_with_tags
+        )
+        if manifest["cluster_report"] is not None:
+            self.cluster_report = ClusterReport(**manifest["cluster_report"])
+        if self.verbose:
+            print(f"resuming after the {manifest['stage']} stage")
+        return self.geometry_details
+
+    def reset(self):
+        """Resets the Cubit workspace ready for the next conversion"""
+        self.cubit.cmd("reset")
+        self.geometry_details = None
+        self.total_number_of_volumes = 0
+        self.restored_files = {}
+        self.faceting_search = None
+        self.cluster_report = None
+        self.deduplication_report = None
+        self.mesh_stats = None
+        self.mesh_fits = []
+
+    def convert(
+        self,
+        files_with_tags: FilesWithTags,
+        h5m_filename: str = "dagmc.h5m",
+        cubit_filename: Optional[str] = None,
+        merge_tolerance: float = 1e-4,
+        faceting_tolerance: float = 1.0e-2,
+        make_watertight: bool = True,
+        imprint: bool = True,
+        geometry_details_filename: Optional[str] = None,
+        surface_reflectivity_name: str = "reflective",
+        exo_filename: Optional[str] = None,
+        implicit_complement_material_tag: Optional[str] = None,
+        autoheal: bool = False,
+        preprocessed_files: Optional[dict] = None,
+        report: Optional[ConversionReport] = None,
+        incremental_dir: Optional[str] = None,
+        mesh_workers: int = 1,
+        triangle_budget: Optional[int] = None,
+        max_chord_deviation: Optional[float] = None,
+        faceting_workers: int = 1,
+        faceting_tolerances: Optional[Dict[str, float]] = None,
+        cluster_imprint_merge: bool = False,
+        geometry_index_filename: Optional[str] = None,
+        checkpoint: Optional[Checkpoint] = None,
+        deduplicate: bool = False,
+        mesh_h5m_filename: Optional[str] = None,
+        mesh_vtu_filename: Optional[str] = None,
+    ):
+        """Runs all the stages of a conversion, see cad_to_h5m for a
+        description of the arguments. The workspace is reset afterwards, even
+        if a stage fails. When a ConversionReport is provided the time, memory,
+        number of commands and entity counts of each stage are recorded. When a
+        Checkpoint is provided the conversion resumes after the last stage
+        saved in it and is saved after the import, merge and export stages."""
+
+        def stage(name, **kwargs):
+            if report is None:
+                return nullcontext()
+            return report.stage(name, self.cubit, **kwargs)
+
+        def completed(name):
+            return checkpoint is not None and checkpoint.completed(name)
+
+        def save_checkpoint(name, **kwargs):
+            if checkpoint is not None:
+                with stage("save_checkpoint"):
+                    self.save_checkpoint(checkpoint, name, **kwargs)
+
+        try:
+            if completed("import"):
+                with stage("resume"):
+                    self.resume(files_with_tags, checkpoint)
+            else:
+                with stage("import"):
+                    self.import_files(
+                        files_with_tags,
+                        autoheal,
+                        preprocessed_files,
+                        incremental_dir,
+                        deduplicate,
+                    )
+                if report is not None and self.deduplication_report is not None:
+                    report.details["deduplication"] = (
+                        self.deduplication_report.to_dict()
+                    )
+                with stage("scale"):
+                    self.scale(autoheal, preprocessed_files)
+                if incremental_dir is not None:
+                    with stage("save_session"):
+                        self.save_session(incremental_dir, autoheal)
+                save_checkpoint("import")
+            if not completed("merge"):
+                with stage("tag"):
+                    self.tag(implicit_complement_material_tag)
+                if cluster_imprint_merge:
+                    with stage("cluster"):
+                        self.find_clusters(merge_tolerance)
+                    if report is not None:
+                        report.details["clusters"] = self.cluster_report.to_dict()
+                if imprint:
+                    with stage("imprint"):
+                        self.imprint()
+                with stage("merge"):
+                    self.merge(merge_tolerance)
+                with stage("reflect"):
+                    self.reflect(surface_reflectivity_name)
+                save_checkpoint("merge")
+            if completed("export"):
+                checkpoint.restore_h5m(h5m_filename)
+                save_geometry_details(self.geometry_details, geometry_details_filename)
+            else:
+                with stage("export", h5m_filename=h5m_filename):
+                    self.export(
+                        h5m_filename,
+                        faceting_tolerance,
+                        make_watertight,
+                        geometry_details_filename,
+                        triangle_budget,
+                        max_chord_deviation,
+                        faceting_workers,
+                        faceting_tolerances,
+                    )
+                save_checkpoint("export", h5m_filename=h5m_filename)
+            if geometry_index_filename is not None:
+                with stage("index"):
+                    self.save_index(geometry_index_filename, h5m_filename)
+            with stage("mesh"):
+                self.mesh(
+                    exo_filename,
+                    cubit_filename,
+                    mesh_workers,
+                    mesh_h5m_filename,
+                    mesh_vtu_filename,
+                )
+            if self.mesh_fits and report is not None:
+                report.details["tet_mesh_fits"] = [
+                    fit.to_dict() for fit in self.mesh_fits
+                ]
+            if self.mesh_stats is not None:
+                if report is not None:
+                    report.details["tet_mesh"] = {
+                        tag: stats.to_dict() for tag, stats in self.mesh_stats.items()
+                    }
+                save_geometry_details(self.geometry_details, geometry_details_filename)
+        finally:
+            self.reset()
+        return h5m_filename
+
+
+def scale_geometry(
+    geometry_details: dict,
+    cubit,
+    autoheal,
+    preprocessed_files: Optional[dict] = None,
+):
+    """Scales the volumes of each entry with a scale key and autoheals the
+    scaled volumes. Entries imported from preprocessed files were scaled and
+    healed during preprocessing, and entries restored from an incremental
+    session before it was saved, so they are skipped. The other volumes were
+    healed, or copied from healed volumes, during the import.
+    """
+    preprocessed_files = preprocessed_files or {}
+    not_preprocessed = [
+        entry
+        for entry in geometry_details
+        if preprocessed_file_key(entry) not in preprocessed_files
+    ]
+    for entry in not_preprocessed:
         if "scale" in entry.keys():
             cubit.cmd(f'volume {" ".join(entry["volumes"])}  scale  {entry["scale"]}')
 
-    # autoheal geometry issues
+    # autoheal geometry issues, the other volumes were healed during the import
     if autoheal:
-        cubit.cmd("healer autoheal vol all")
-
-
-# TODO implent a flag to allow tet file info to be saved
-# def save_tet_details_to_json_file(
-#         geometry_details,
-#         filename="mesh_details.json"):
-#     for entry in geometry_details:
-#         material = entry["material"]
-#     tets_in_volumes = cubit.parse_cubit_list(
-#         "tet", " in volume " + " ".join(entry["volumes"])
-#     )
-#     print("material ", material, " has ", len(tets_in_volumes), " tets")
-#     entry["tet_ids"] = tets_in_volumes
-#     with open(filename, "w") as outfile:
-#         json.dump(geometry_details, outfile, indent=4)
+        scaled_volumes = [
+            volume
+            for entry in not_preprocessed
+            if "scale" in entry.keys()
+            for volume in entry["volumes"]
+        ]
+        if scaled_volumes:
+            cubit.cmd(f"healer autoheal vol {format_ids(scaled_volumes)}")
 
 
 def save_output_files(
@@ -206,15 +1048,57 @@ def save_output_files(
     exo_filename: str,
     cubit,
     verbose: bool,
+    mesh_h5m_filename: Optional[str] = None,
+    mesh_vtu_filename: Optional[str] = None,
 ):
     """This saves the output files"""
-    cubit.cmd("set attribute on")
-    # use a faceting_tolerance 1.0e-4 or smaller for accurate simulations
+    save_geometry_details(geometry_details, geometry_details_filename)
+
+    export_h5m(h5m_filename, faceting_tolerance, make_watertight, cubit, verbose)
+
+    create_tet_mesh(geometry_details, cubit)
+
+    save_mesh_files(exo_filename, cubit_filename, cubit)
+
+    if mesh_h5m_filename is not None or mesh_vtu_filename is not None:
+        mesh_stats = export_tet_mesh(
+            geometry_details, cubit, mesh_h5m_filename, mesh_vtu_filename
+        )
+        if verbose:
+            print_mesh_stats(mesh_stats)
+
+    return h5m_filename
+
+
+def print_mesh_stats(mesh_stats: Dict[str, MaterialMeshStats]):
+    """Prints the number of tets and their volume for each material"""
+    for material_tag, stats in mesh_stats.items():
+        print(
+            f"material {material_tag} has {stats.tets} tets with a volume of "
+            f"{stats.volume:.6g} in volumes {stats.volume_ids}"
+        )
+
+
+def save_geometry_details(geometry_details: dict, geometry_details_filename: str):
     if geometry_details_filename is not None:
         with open(geometry_details_filename, "w") as outfile:
             json.dump(geometry_details, outfile, indent=4)
 
-    Path(h5m_filename).parents[0].mkdir(parents=True, exist_ok=True)
+
+def export_h5m(
+    h5m_filename: str,
+    faceting_tolerance: float,
+    make_watertight: bool,
+    cubit,
+    verbose: bool,
+    dry_run: bool = False,
+):
+    """Exports the geometry to a DAGMC h5m file. A dry run sends the export
+    command without making the folder of the h5m file."""
+    cubit.cmd("set attribute on")
+    # use a faceting_tolerance 1.0e-4 or smaller for accurate simulations
+    if not dry_run:
+        Path(h5m_filename).parents[0].mkdir(parents=True, exist_ok=True)
     if verbose:
         print("using faceting_tolerance of ", faceting_tolerance)
     if make_watertight:
@@ -233,49 +1117,180 @@ def save_output_files(
             + str(faceting_tolerance)
         )
 
-    create_tet_mesh(geometry_details, cubit)
 
+def export_h5m_with_tolerances(
+    h5m_filename: str,
+    geometry_details: List[dict],
+    faceting_tolerance: float,
+    faceting_tolerances: Optional[Dict[str, float]],
+    make_watertight: bool,
+    cubit,
+    verbose: bool,
+    dry_run: bool = False,
+):
+    """Exports the geometry to a DAGMC h5m file with a faceting tolerance for
+    each entry. The tolerance of an entry is its faceting_tolerance key, the
+    tolerance of its material tag in faceting_tolerances or else the
+    faceting_tolerance. When the entries have different tolerances the
+    geometry is exported at each tolerance and the surfaces are combined with
+    stitch_surfaces. Surfaces shared by volumes with different tolerances use
+    the finest tolerance. When make_watertight is set the combined file is
+    made watertight with the DAGMC make_watertight program, as neighbouring
+    surfaces exported at different tolerances have different facets on their
+    shared curves, and an error is raised before exporting if the program is
+    not installed. Different tolerances without make_watertight are rejected
+    as the combined file would have cracks between the surfaces. A dry run sends the export commands, with placeholder
+    filenames in the temporary folder, without making any folders and without
+    combining the exports.
+    """
+    faceting_tolerances = faceting_tolerances or {}
+    tolerance_of_volume = {}
+    for entry in geometry_details:
+        tolerance = entry.get(
+            "faceting_tolerance",
+            faceting_tolerances.get(entry.get("material_tag"), faceting_tolerance),
+        )
+        for volume in entry["volumes"]:
+            tolerance_of_volume[int(volume)] = tolerance
+
+    tolerances = sorted(set(tolerance_of_volume.values()))
+    if len(tolerances) < 2:
+        export_h5m(
+            h5m_filename,
+            tolerances[0] if tolerances else faceting_tolerance,
+            make_watertight,
+            cubit,
+            verbose,
+            dry_run,
+        )
+        return
+
+    if not make_watertight:
+        msg = (
+            f"The entries have different faceting tolerances {tolerances}. The "
+            "surfaces exported at each tolerance don't share vertices on their "
+            "curves, so the combined h5m file is only watertight when "
+            "make_watertight is set"
+        )
+        raise ValueError(msg)
+    find_make_watertight()
+
+    surfaces_of_tolerance = {tolerance: [] for tolerance in tolerances}
+    surface_ids = cubit.parse_cubit_list("surface", "all")
+    for surface_id in surface_ids:
+        tolerance = min(
+            tolerance_of_volume.get(volume_id, faceting_tolerance)
+            for volume_id in cubit.get_relatives("surface", surface_id, "volume")
+        )
+        surfaces_of_tolerance[tolerance].append(surface_id)
+
+    if dry_run:
+        tmp_dir_context = nullcontext(tempfile.gettempdir())
+    else:
+        tmp_dir_context = tempfile.TemporaryDirectory()
+    with tmp_dir_context as tmp_dir:
+        filenames = {}
+        for tolerance in tolerances:
+            if surfaces_of_tolerance[tolerance] or tolerance == tolerances[0]:
+                filenames[tolerance] = str(Path(tmp_dir) / f"{tolerance}.h5m")
+                export_h5m(
+                    filenames[tolerance],
+                    tolerance,
+                    make_watertight,
+                    cubit,
+                    verbose,
+                    dry_run,
+                )
+        if dry_run:
+            return
+        Path(h5m_filename).parents[0].mkdir(parents=True, exist_ok=True)
+        stitch_surfaces(
+            filenames[tolerances[0]],
+            {
+                filenames[tolerance]: surfaces_of_tolerance[tolerance]
+                for tolerance in tolerances[1:]
+                if surfaces_of_tolerance[tolerance]
+            },
+            h5m_filename,
+        )
+    if make_watertight:
+        seal(h5m_filename)
+
+
+def count_entry_triangles(geometry_details: List[dict], h5m_filename: str):
+    """Adds the number of triangles on the surfaces of the volumes of each
+    entry to the entry as a "triangles" key. Skipped if h5py is not installed
+    or the h5m file can't be read."""
+    try:
+        triangles_of_volume = count_volume_triangles(h5m_filename)
+    except (ImportError, OSError, KeyError):
+        return
+    for entry in geometry_details:
+        entry["triangles"] = sum(
+            triangles_of_volume.get(int(volume), 0) for volume in entry["volumes"]
+        )
+
+
+def save_mesh_files(
+    exo_filename: Optional[str],
+    cubit_filename: Optional[str],
+    cubit,
+    dry_run: bool = False,
+):
+    """Saves the tet mesh as an exo file and the session as a cub file. A dry
+    run sends the commands without making the folder of the exo file."""
     if exo_filename is not None:
-        Path(exo_filename).parents[0].mkdir(parents=True, exist_ok=True)
+        if not dry_run:
+            Path(exo_filename).parents[0].mkdir(parents=True, exist_ok=True)
         cubit.cmd(f'export mesh "{exo_filename}" overwrite')
 
     if cubit_filename is not None:
         cubit.cmd('save as "' + cubit_filename + '" overwrite')
 
-    return h5m_filename
 
+def imprint_geometry(cubit, clusters: Optional[List[List[int]]] = None):
+    """Imprints all volumes, or the volumes of each cluster separately
 
-def imprint_geometry(cubit):
-    cubit.cmd("imprint body all")
+    Args:
+        clusters: the ids of the volumes in each cluster of touching volumes,
+            see find_volume_clusters. Volumes outside of the clusters touch no
+            other volume and are not imprinted.
+    """
+    if clusters is None:
+        cubit.cmd("imprint body all")
+        return
+    for cluster in clusters:
+        cubit.cmd(f"imprint volume {format_ids(cluster)}")
 
 
-def merge_geometry(merge_tolerance: float, cubit):
+def merge_geometry(
+    merge_tolerance: float, cubit, clusters: Optional[List[List[int]]] = None
+):
     """merges the geometry with te specified tolerance
 
     Args:
         merge_tolerance: The allowable distance between surfaces before merging
             them together. Optional as there is a default built into the DAGMC
             export command
+        clusters: the ids of the volumes in each cluster of touching volumes,
+            see find_volume_clusters. When provided the volumes of each cluster
+            are merged separately.
     """
     cubit.cmd(f"merge tolerance {merge_tolerance}")
-    cubit.cmd("merge vol all group_results")
+    if clusters is None:
+        cubit.cmd("merge vol all group_results")
+        return
+    for cluster in clusters:
+        cubit.cmd(f"merge volume {format_ids(cluster)} group_results")
 
 
-def find_all_surfaces_of_reflecting_wedge(new_vols, cubit, verbose: bool):
+def find_all_surfaces_of_reflecting_wedge(new_vols, cubit, verbose: bool = False):
+    """Classifies the surfaces of the volumes, marking the surfaces that lie on
+    the cut planes of a wedge as reflectors"""
     surfaces_in_volume = cubit.parse_cubit_list(
         "surface", " in volume " + " ".join(new_vols)
     )
-    surface_info_dict = {}
-    for surface_id in surfaces_in_volume:
-        surface = cubit.surface(surface_id)
-        # area = surface.area()
-        vertex_in_surface = cubit.parse_cubit_list(
-            "vertex", " in surface " + str(surface_id)
-        )
-        if surface.is_planar() and len(vertex_in_surface) == 4:
-            surface_info_dict[surface_id] = {"reflector": True}
-        else:
-            surface_info_dict[surface_id] = {"reflector": False}
+    surface_info_dict = classify_surfaces(surfaces_in_volume, cubit)
     if verbose:
         print("surface_info_dict", surface_info_dict)
     return surface_info_dict
@@ -284,6 +1299,10 @@ def find_all_surfaces_of_reflecting_wedge(new_vols, cubit, verbose: bool):
 def find_reflecting_surfaces_of_reflecting_wedge(
     geometry_details, surface_reflectivity_name, cubit, verbose
 ):
+    """Updates the reflecting surfaces of the wedge after imprinting and
+    merging and groups them with the surface_reflectivity_name. Surfaces that
+    no longer exist are removed and surfaces created by imprinting are
+    classified."""
     if verbose:
         print("running find_reflecting_surfaces_of_reflecting_wedge")
     wedge_volume = None
@@ -292,126 +1311,200 @@ def find_reflecting_surfaces_of_reflecting_wedge(
             print(entry)
             print(entry.keys())
         if "surface_reflectivity" in entry.keys():
-            surface_info_dict = entry["surface_reflectivity"]
             wedge_volume = " ".join(entry["volumes"])
-            surfaces_in_wedge_volume = cubit.parse_cubit_list(
-                "surface", " in volume " + str(wedge_volume)
+            surfaces_in_wedge_volume = set(
+                cubit.parse_cubit_list("surface", " in volume " + str(wedge_volume))
             )
             if verbose:
                 print("found surface_reflectivity")
                 print("wedge_volume", wedge_volume)
                 print("surfaces_in_wedge_volume", surfaces_in_wedge_volume)
-            for surface_id in surface_info_dict.keys():
-                if surface_info_dict[surface_id]["reflector"]:
-                    if verbose:
-                        print(
-                            surface_id,
-                            "surface originally reflecting but does it still exist",
-                        )
-                    if surface_id not in surfaces_in_wedge_volume:
-                        del surface_info_dict[surface_id]
-            for surface_id in surfaces_in_wedge_volume:
-                if surface_id not in surface_info_dict.keys():
-                    surface_info_dict[surface_id] = {"reflector": True}
-                    cubit.cmd(
-                        'group "'
-                        + surface_reflectivity_name
-                        + '" add surf '
-                        + str(surface_id)
-                    )
-                    cubit.cmd("surface " + str(surface_id) + " visibility on")
+            # keys become strings if the details were loaded from JSON
+            surface_info_dict = {
+                int(surface_id): info
+                for surface_id, info in entry["surface_reflectivity"].items()
+                if int(surface_id) in surfaces_in_wedge_volume
+            }
+            new_surfaces = sorted(surfaces_in_wedge_volume - surface_info_dict.keys())
+            if new_surfaces:
+                surface_info_dict.update(classify_surfaces(new_surfaces, cubit))
+
+            reflectors = [
+                surface_id
+                for surface_id, info in surface_info_dict.items()
+                if info["reflector"]
+            ]
+            with CommandBuffer(cubit) as buffer:
+                buffer.add(
+                    'group "' + surface_reflectivity_name + '" add surf {ids}',
+                    reflectors,
+                )
+                buffer.add("surface {ids} visibility on", reflectors)
             entry["surface_reflectivity"] = surface_info_dict
             return geometry_details, wedge_volume
     return geometry_details, wedge_volume
 
 
 def tag_geometry_with_mats(geometry_details, implicit_complement_material_tag, cubit):
-    for entry in geometry_details:
-        if "material_tag" in entry.keys():
+    """Groups the volumes of each entry by material tag. Entries that share a
+    material tag are added to the group with a single command."""
+    with CommandBuffer(cubit) as buffer:
+        for entry in geometry_details:
+            if "material_tag" in entry.keys():
+
+                if len(entry["material_tag"]) > 27:
+                    msg = (
+                        "material_tag > 28 characters. Material tags "
+                        "must be less than 28 characters use in DAGMC. "
+                        f"{entry['material_tag']} is too long."
+                    )
+                    raise ValueError(msg)
 
-            if len(entry["material_tag"]) > 27:
-                msg = (
-                    "material_tag > 28 characters. Material tags "
-                    "must be less than 28 characters use in DAGMC. "
-                    f"{entry['material_tag']} is too long."
+                buffer.add(
+                    'group "mat:' + str(entry["material_tag"]) + '" add volume {ids}',
+                    entry["volumes"],
                 )
+                if entry["material_tag"].lower() == "graveyard":
+                    if implicit_complement_material_tag is not None:
+                        graveyard_volume_number = entry["volumes"][0]
+                        buffer.add(
+                            f'group "mat:{implicit_complement_material_tag}_comp" '
+                            "add vol {ids}",
+                            [graveyard_volume_number],
+                        )
+            else:
+                msg = f"dictionary key material_tag is missing for {entry}"
                 raise ValueError(msg)
 
-            cubit.cmd(
-                'group "mat:'
-                + str(entry["material_tag"])
-                + '" add volume '
-                + " ".join(entry["volumes"])
-            )
-            if entry["material_tag"].lower() == "graveyard":
-                if implicit_complement_material_tag is not None:
-                    graveyard_volume_number = entry["volumes"][0]
-                    cubit.cmd(
-                        f'group "mat:{implicit_complement_material_tag}_comp" add vol {graveyard_volume_number}'
-                    )
-        else:
-            msg = f"dictionary key material_tag is missing for {entry}"
-            raise ValueError(msg)
+
+def find_new_volumes(cubit, last_volume_id: int) -> List[str]:
+    """Returns the ids of the volumes that exist and were created after the
+    volume with id last_volume_id. Only the range of new ids is queried so the
+    cost does not grow with the number of volumes already in the session.
+
+    Args:
+        cubit: the cubit module.
+        last_volume_id: the id of the last volume created before the new
+            volumes, as returned by cubit.get_last_id("volume").
+    """
+    newest_volume_id = cubit.get_last_id("volume")
+    if newest_volume_id <= last_volume_id:
+        return []
+    new_vols = cubit.parse_cubit_list(
+        "volume", f"{last_volume_id + 1} to {newest_volume_id}"
+    )
+    return list(map(str, sorted(new_vols)))
 
 
-def find_number_of_volumes_in_each_step_file(files_with_tags, cubit, verbose, autoheal):
-    """ """
+def find_number_of_volumes_in_each_step_file(
+    files_with_tags,
+    cubit,
+    verbose,
+    autoheal,
+    preprocessed_files: Optional[dict] = None,
+    deduplication: Optional[DeduplicationReport] = None,
+):
+    """Imports each CAD file and records the volume ids created by the import
+    in the "volumes" key of the entry. Files found in preprocessed_files are
+    imported from their preprocessed sat file which has already been united,
+    validated, scaled and healed.
+
+    When a DeduplicationReport is provided, entries with the same CAD file
+    contents as an earlier entry copy its volumes instead of importing the
+    file again. Only one of each set of identical volumes is healed and the
+    others are replaced by copies, see heal_unique_volumes. The counts are
+    recorded in the report.
+
+    Returns:
+        The entries with their volume ids and the total number of volumes
+    """
+    preprocessed_files = preprocessed_files or {}
+    total_number_of_volumes = 0
+    imported_files = {}
+    # volumes restored from an incremental session are already validated
+    # and healed, only the volumes created from here on are checked
+    first_volume_id = cubit.get_last_id("volume")
     for entry in files_with_tags:
         if verbose:
             print(f'loading {entry["cad_filename"]}')
-        current_vols = cubit.parse_cubit_list("volume", "all")
-        if entry["cad_filename"].endswith(".stp") or entry["cad_filename"].endswith(
-            ".step"
-        ):
-            import_type = "step"
-        elif entry["cad_filename"].endswith(".sat"):
-            import_type = "acis"
-        elif entry["cad_filename"].endswith(".stl"):
-            import_type = "stl"
-        else:
-            msg = (
-                f'File format for {entry["cad_filename"]} is not supported.'
-                "Try step files or sat files"
-            )
-            raise ValueError(msg)
+        last_volume_id = cubit.get_last_id("volume")
+        import_type = find_import_type(entry["cad_filename"])
         if not Path(entry["cad_filename"]).is_file():
             msg = f'File with filename {entry["cad_filename"]} could not be found'
             raise FileNotFoundError(msg)
         short_file_name = os.path.split(entry["cad_filename"])[-1]
-        cubit.cmd(
-            "import "
-            + import_type
-            + ' "'
-            + entry["cad_filename"]
-            + '" separate_bodies no_surfaces no_curves no_vertices '
-        )
-        all_vols = cubit.parse_cubit_list("volume", "all")
-        new_vols = set(current_vols).symmetric_difference(set(all_vols))
-        new_vols = list(map(str, new_vols))
-        if len(new_vols) > 1:
+        if deduplication is not None:
+            file_key = (
+                hash_file(entry["cad_filename"]),
+                preprocessed_files.get(preprocessed_file_key(entry)),
+            )
+        if deduplication is not None and file_key in imported_files:
+            cubit.cmd(f"volume {format_ids(imported_files[file_key])} copy")
+            deduplication.copied_entries += 1
+        elif preprocessed_file_key(entry) in preprocessed_files:
+            cubit.cmd(
+                'import acis "'
+                + preprocessed_files[preprocessed_file_key(entry)]
+                + '" separate_bodies no_surfaces no_curves no_vertices '
+            )
+        else:
             cubit.cmd(
-                "unite vol " + " ".join(new_vols) + " with vol " + " ".join(new_vols)
+                "import "
+                + import_type
+                + ' "'
+                + entry["cad_filename"]
+                + '" separate_bodies no_surfaces no_curves no_vertices '
             )
-        all_vols = cubit.parse_cubit_list("volume", "all")
-        new_vols_after_unite = set(current_vols).symmetric_difference(set(all_vols))
-        new_vols_after_unite = list(map(str, new_vols_after_unite))
+            new_vols = find_new_volumes(cubit, last_volume_id)
+            if len(new_vols) > 1:
+                cubit.cmd(
+                    "unite vol "
+                    + " ".join(new_vols)
+                    + " with vol "
+                    + " ".join(new_vols)
+                )
+        new_vols_after_unite = find_new_volumes(cubit, last_volume_id)
+        if deduplication is not None:
+            imported_files.setdefault(file_key, new_vols_after_unite)
         entry["volumes"] = new_vols_after_unite
+        total_number_of_volumes += len(new_vols_after_unite)
         cubit.cmd(
             'group "' + short_file_name + '" add volume ' + " ".join(entry["volumes"])
         )
         if "surface_reflectivity" in entry.keys():
             entry["surface_reflectivity"] = find_all_surfaces_of_reflecting_wedge(
-                new_vols_after_unite, cubit
+                new_vols_after_unite, cubit, verbose
             )
             if verbose:
                 print("entry['surface_reflectivity']", entry["surface_reflectivity"])
     cubit.cmd("separate body all")
+    if first_volume_id == 0:
+        imported_volumes = "all"
+    else:
+        imported_volumes = format_ids(find_new_volumes(cubit, first_volume_id))
 
-    # checks the cad is clean and catches some errors with the geometry early
-    cubit.cmd("validate vol all")
+    # preprocessed files have already been validated and healed
+    if imported_volumes and any(
+        preprocessed_file_key(entry) not in preprocessed_files
+        for entry in files_with_tags
+    ):
+        # checks the cad is clean and catches some errors with the geometry early
+        cubit.cmd(f"validate vol {imported_volumes}")
 
-    # autoheal geometry issues
-    if autoheal:
-        cubit.cmd("healer autoheal vol all")
+        # autoheal geometry issues
+        if autoheal and deduplication is not None:
+            report = heal_unique_volumes(
+                [
+                    entry
+                    for entry in files_with_tags
+                    if preprocessed_file_key(entry) not in preprocessed_files
+                ],
+                cubit,
+                verbose,
+            )
+            deduplication.healed_volumes = report.healed_volumes
+            deduplication.copied_volumes = report.copied_volumes
+        elif autoheal:
+            cubit.cmd(f"healer autoheal vol {imported_volumes}")
 
-    return files_with_tags, sum(all_vols)
+    return files_with_tags, total_number_of_volumes
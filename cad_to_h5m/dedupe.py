@@ -0,0 +1,226 @@
+import math
+import os
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional
+
+from .commands import format_ids
+
+# the number of significant figures the properties of volumes are compared to
+SIGNIFICANT_FIGURES = 6
+
+# the relative difference allowed between the volume of a duplicate and the
+# volume of its overlap with the copy put in its place
+OVERLAP_TOLERANCE = 1e-5
+
+
+@dataclass
+class DeduplicationReport:
+    """The duplicate CAD files and volumes found by the import
+
+    Args:
+        copied_entries: the number of entries whose CAD file had already been
+            imported for another entry and were copied instead.
+        healed_volumes: the number of volumes that were healed.
+        copied_volumes: the number of volumes replaced by a copy of an
+            identical healed volume instead of being healed.
+    """
+
+    copied_entries: int = 0
+    healed_volumes: int = 0
+    copied_volumes: int = 0
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def _rounded(value: float) -> str:
+    return f"{value:.{SIGNIFICANT_FIGURES}g}"
+
+
+def geometric_fingerprint(volume_id: int, cubit) -> tuple:
+    """Returns properties of a volume that don't change when it is moved or
+    rotated about the z axis, the volume, the surface area, the number of
+    surfaces and the height. Volumes with the same fingerprint may be copies of
+    each other, which is checked when a copy is put in place, see
+    copy_into_place.
+
+    Args:
+        volume_id: the id of the volume.
+        cubit: the cubit module.
+    """
+    surface_ids = cubit.get_relatives("volume", volume_id, "surface")
+    return (
+        _rounded(cubit.get_volume_volume(volume_id)),
+        _rounded(sum(cubit.get_surface_area(surface) for surface in surface_ids)),
+        len(surface_ids),
+        _rounded(cubit.get_bounding_box("volume", volume_id)[8]),
+    )
+
+
+def find_duplicate_volumes(volume_ids: List[int], cubit) -> Dict[int, List[int]]:
+    """Groups the volumes by their geometric fingerprint
+
+    Args:
+        volume_ids: the ids of the volumes.
+        cubit: the cubit module.
+
+    Returns:
+        The first volume of each fingerprint mapped to the other volumes with
+        the same fingerprint
+    """
+    representatives = {}
+    duplicates = {}
+    for volume_id in volume_ids:
+        fingerprint = geometric_fingerprint(volume_id, cubit)
+        if fingerprint in representatives:
+            duplicates[representatives[fingerprint]].append(volume_id)
+        else:
+            representatives[fingerprint] = volume_id
+            duplicates[volume_id] = []
+    return duplicates
+
+
+def _boxes_match(first: list, second: list) -> bool:
+    tolerance = 1e-6 * max(1.0, first[9])
+    return all(abs(first[index] - second[index]) <= tolerance for index in range(9))
+
+
+def fills_volume(copy: int, duplicate: int, cubit) -> bool:
+    """Returns True if the copy fills the duplicate volume, found from the
+    volume of their intersection. Mirror images, and parts rotated about
+    other axes, can have the same fingerprint and bounding box as the
+    duplicate but only part of their volume overlaps it.
+
+    Args:
+        copy: the id of the copy put in place.
+        duplicate: the id of the volume the copy replaces.
+        cubit: the cubit module.
+    """
+    last_volume_id = cubit.get_last_id("volume")
+    cubit.cmd(f"intersect volume {copy} {duplicate} keep")
+    intersections = list(range(last_volume_id + 1, cubit.get_last_id("volume") + 1))
+    if not intersections:
+        return False
+    overlap = sum(cubit.get_volume_volume(volume) for volume in intersections)
+    cubit.cmd(f"delete volume {format_ids(intersections)}")
+    return math.isclose(
+        overlap, cubit.get_volume_volume(duplicate), rel_tol=OVERLAP_TOLERANCE
+    )
+
+
+def copy_into_place(representative: int, duplicate: int, cubit) -> Optional[int]:
+    """Copies the representative volume onto the duplicate volume by rotating
+    it about the z axis, as for the repeated sectors of a tokamak, and moving
+    it so the centres meet. A translation alone is tried if the rotation does
+    not fit. The copy is kept when its bounding box matches the bounding box
+    of the duplicate and it fills the duplicate, see fills_volume.
+
+    Args:
+        representative: the id of the volume to copy.
+        duplicate: the id of the volume to put the copy onto.
+        cubit: the cubit module.
+
+    Returns:
+        The id of the copy or None if no copy matched the duplicate
+    """
+    centre = cubit.get_center_point("volume", representative)
+    target = cubit.get_center_point("volume", duplicate)
+    target_box = cubit.get_bounding_box("volume", duplicate)
+
+    angles = [0.0]
+    radius = math.hypot(centre[0], centre[1])
+    if radius > 0 and math.isclose(
+        radius, math.hypot(target[0], target[1]), rel_tol=1e-6
+    ):
+        angle = math.degrees(
+            math.atan2(target[1], target[0]) - math.atan2(centre[1], centre[0])
+        )
+        if not math.isclose(angle % 360, 0, abs_tol=1e-9):
+            angles.insert(0, angle)
+
+    for angle in angles:
+        last_volume_id = cubit.get_last_id("volume")
+        if angle == 0.0:
+            cubit.cmd(f"volume {representative} copy")
+        else:
+            cubit.cmd(f"volume {representative} copy rotate {angle:.12g} about z")
+        copy = cubit.get_last_id("volume")
+        if copy == last_volume_id:
+            return None
+        moved = cubit.get_center_point("volume", copy)
+        offset = [target[axis] - moved[axis] for axis in range(3)]
+        if any(abs(value) > 0 for value in offset):
+            cubit.cmd(
+                f"volume {copy} move x {offset[0]:.12g} y {offset[1]:.12g} "
+                f"z {offset[2]:.12g}"
+            )
+        if _boxes_match(
+            cubit.get_bounding_box("volume", copy), target_box
+        ) and fills_volume(copy, duplicate, cubit):
+            return copy
+        cubit.cmd(f"delete volume {copy}")
+    return None
+
+
+def heal_unique_volumes(
+    geometry_details: List[dict], cubit, verbose: bool = False
+) -> DeduplicationReport:
+    """Heals one volume of each set of identical volumes and replaces the
+    others with moved or rotated copies of the healed volume. The volume ids
+    and file groups of the entries are updated with the ids of the copies.
+    Volumes of entries with surface_reflectivity are always healed as their
+    surface ids have already been recorded.
+
+    Args:
+        geometry_details: the imported entries with their volume ids.
+        cubit: the cubit module.
+        verbose: flag to control the printing of the duplicates found.
+    """
+    report = DeduplicationReport()
+    fixed_volumes = []
+    candidates = []
+    for entry in geometry_details:
+        volumes = [int(volume) for volume in entry["volumes"]]
+        if "surface_reflectivity" in entry:
+            fixed_volumes.extend(volumes)
+        else:
+            candidates.extend(volumes)
+
+    duplicates = find_duplicate_volumes(candidates, cubit)
+    to_heal = fixed_volumes + list(duplicates)
+    if to_heal:
+        cubit.cmd(f"healer autoheal vol {format_ids(to_heal)}")
+    report.healed_volumes = len(to_heal)
+
+    copies = {}
+    failed = []
+    for representative, others in duplicates.items():
+        for duplicate in others:
+            copy = copy_into_place(representative, duplicate, cubit)
+            if copy is None:
+                failed.append(duplicate)
+            else:
+                copies[duplicate] = copy
+    if copies:
+        cubit.cmd(f"delete volume {format_ids(copies)}")
+    if failed:
+        cubit.cmd(f"healer autoheal vol {format_ids(failed)}")
+        report.healed_volumes += len(failed)
+    report.copied_volumes = len(copies)
+
+    for entry in geometry_details:
+        replaced = [copies[int(v)] for v in entry["volumes"] if int(v) in copies]
+        if not replaced:
+            continue
+        entry["volumes"] = [
+            str(copies.get(int(volume), volume)) for volume in entry["volumes"]
+        ]
+        short_file_name = os.path.split(entry["cad_filename"])[-1]
+        cubit.cmd(f'group "{short_file_name}" add volume {format_ids(replaced)}')
+
+    if verbose:
+        print(
+            f"healed {report.healed_volumes} volumes and copied "
+            f"{report.copied_volumes} identical healed volumes"
+        )
+    return report
@@ -0,0 +1,245 @@
+import json
+import math
+import multiprocessing
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import List, Optional
+
+from .inspect import count_triangles
+from .utils import import_cubit
+
+
+@dataclass
+class FacetingTrial:
+    """The number of triangles exported at one faceting tolerance
+
+    Args:
+        faceting_tolerance: the faceting tolerance of the export.
+        triangles: the number of triangles in the exported h5m file.
+    """
+
+    faceting_tolerance: float
+    triangles: int
+
+
+@dataclass
+class FacetingSearch:
+    """The result of search_faceting_tolerance
+
+    Args:
+        faceting_tolerance: the chosen faceting tolerance.
+        triangles: the number of triangles at the chosen faceting tolerance.
+        trials: every export made during the search ordered by faceting
+            tolerance, which shows the trade off between the faceting tolerance
+            and the number of triangles.
+    """
+
+    faceting_tolerance: float
+    triangles: int
+    trials: List[FacetingTrial] = field(default_factory=list)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    def write(self, filename: str):
+        """Saves the search as a JSON file"""
+        Path(filename).parents[0].mkdir(parents=True, exist_ok=True)
+        with open(filename, "w") as outfile:
+            json.dump(self.to_dict(), outfile, indent=4)
+
+
+def faceting_filename(filename: str) -> str:
+    """Returns the filename of the faceting search saved next to filename"""
+    return str(Path(filename).with_name(Path(filename).stem + "_faceting.json"))
+
+
+def export_trial(
+    cub_filename: str,
+    faceting_tolerance: float,
+    h5m_filename: str,
+    make_watertight: bool,
+    cubit_path: str,
+    verbose: bool = False,
+) -> int:
+    """Opens a saved session, exports it at the faceting tolerance and returns
+    the number of triangles. This is run in worker processes by
+    search_faceting_tolerance.
+
+    Args:
+        cub_filename: the saved session to open.
+        faceting_tolerance: the faceting tolerance of the export.
+        h5m_filename: the filename to export the h5m file to.
+        make_watertight: flag to control if the geometry is made watertight.
+        cubit_path: the path to the Cubit directory used to import Cubit from.
+        verbose: flag to control the printing of Cubit output.
+    """
+    # imported here as core imports this module
+    from .core import export_h5m
+
+    cubit = import_cubit(cubit_path)
+    cubit.init([])
+    if not verbose:
+        cubit.cmd("set echo off")
+        cubit.cmd("set info off")
+        cubit.cmd("set journal off")
+        cubit.cmd("set warning off")
+    cubit.cmd(f'open "{cub_filename}"')
+    export_h5m(h5m_filename, faceting_tolerance, make_watertight, cubit, verbose)
+    cubit.cmd("reset")
+    return count_triangles(h5m_filename)
+
+
+def search_faceting_tolerance(
+    h5m_filename: str,
+    cubit,
+    triangle_budget: Optional[int] = None,
+    max_chord_deviation: Optional[float] = None,
+    make_watertight: bool = True,
+    min_tolerance: float = 1.0e-5,
+    max_tolerance: float = 1.0,
+    max_trials: int = 10,
+    workers: int = 1,
+    cubit_path: Optional[str] = None,
+    verbose: bool = False,
+) -> FacetingSearch:
+    """Finds the faceting tolerance to export the current session with and
+    saves the h5m file exported at that tolerance to h5m_filename.
+
+    The faceting tolerance is the largest allowed distance between the facets
+    and the surfaces, so a max_chord_deviation is met by any tolerance up to
+    it and the coarsest of these, the max_chord_deviation itself, is used. A
+    smaller tolerance gives more triangles, so with a max_chord_deviation a
+    triangle_budget is only checked. With a triangle_budget alone the
+    smallest tolerance whose export fits within the budget is searched for by
+    bisection of the logarithm of the tolerance. With more than one worker the
+    session is saved and each round exports several tolerances in parallel
+    worker processes, narrowing the search range faster.
+
+    Args:
+        h5m_filename: the filename to save the chosen export to.
+        cubit: the cubit module, with the geometry imprinted, merged and
+            grouped ready for export.
+        triangle_budget: the maximum number of triangles in the h5m file.
+        max_chord_deviation: the maximum distance between the facets and the
+            surfaces of the geometry.
+        make_watertight: flag to control if the geometry is made watertight.
+        min_tolerance: the smallest faceting tolerance to try.
+        max_tolerance: the largest faceting tolerance to try.
+        max_trials: the maximum number of exports made in the search.
+        workers: the number of exports made in parallel worker processes.
+        cubit_path: the path to the Cubit directory used to import Cubit from
+            in worker processes.
+        verbose: flag to control the printing of Cubit output.
+    """
+    # imported here as core imports this module
+    from .core import export_h5m
+
+    if triangle_budget is None and max_chord_deviation is None:
+        msg = "A triangle_budget or max_chord_deviation must be provided"
+        raise ValueError(msg)
+    if max_chord_deviation is not None:
+        max_tolerance = min(max_tolerance, max_chord_deviation)
+        min_tolerance = min(min_tolerance, max_tolerance)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        trial_filenames = {}
+        trials = {}
+        pool = None
+        cub_filename = str(Path(tmp_dir) / "session.cub")
+        if workers > 1 and max_chord_deviation is None:
+            cubit.cmd(f'save as "{cub_filename}" overwrite')
+            # each worker imports and initialises its own copy of cubit so a
+            # fresh interpreter is spawned instead of forking the current process
+            context = multiprocessing.get_context("spawn")
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+
+        def export(tolerances):
+            filenames = [
+                str(Path(tmp_dir) / f"trial_{len(trials) + index}.h5m")
+                for index in range(len(tolerances))
+            ]
+            if pool is None:
+                counts = []
+                for tolerance, filename in zip(tolerances, filenames):
+                    export_h5m(filename, tolerance, make_watertight, cubit, verbose)
+                    counts.append(count_triangles(filename))
+            else:
+                futures = [
+                    pool.submit(
+                        export_trial,
+                        cub_filename,
+                        tolerance,
+                        filename,
+                        make_watertight,
+                        cubit_path,
+                        verbose,
+                    )
+                    for tolerance, filename in zip(tolerances, filenames)
+                ]
+                counts = [future.result() for future in futures]
+            for tolerance, filename, count in zip(tolerances, filenames, counts):
+                trials[tolerance] = count
+                trial_filenames[tolerance] = filename
+                if verbose:
+                    print(f"faceting_tolerance {tolerance} gives {count} triangles")
+
+        try:
+            if max_chord_deviation is not None:
+                export([max_tolerance])
+                chosen = max_tolerance
+            else:
+                export([min_tolerance, max_tolerance])
+            if triangle_budget is not None and trials[max_tolerance] > triangle_budget:
+                msg = (
+                    f"The largest faceting tolerance {max_tolerance} gives "
+                    f"{trials[max_tolerance]} triangles which exceeds the "
+                    f"triangle_budget of {triangle_budget}"
+                )
+                raise ValueError(msg)
+            if max_chord_deviation is None:
+                # the bracket is between a tolerance that is over the budget
+                # and the smallest tolerance found within the budget
+                low, high = math.log(min_tolerance), math.log(max_tolerance)
+                if trials[min_tolerance] <= triangle_budget:
+                    high = low
+                while high - low > 0.01 and len(trials) < max_trials:
+                    number = min(workers, max_trials - len(trials))
+                    step = (high - low) / (number + 1)
+                    tolerances = [
+                        math.exp(low + step * (index + 1)) for index in range(number)
+                    ]
+                    export(tolerances)
+                    for tolerance in tolerances:
+                        if trials[tolerance] <= triangle_budget:
+                            high = min(high, math.log(tolerance))
+                    low = max(
+                        [low]
+                        + [
+                            math.log(tolerance)
+                            for tolerance in tolerances
+                            if trials[tolerance] > triangle_budget
+                            and math.log(tolerance) < high
+                        ]
+                    )
+                chosen = min(
+                    tolerance
+                    for tolerance, count in trials.items()
+                    if count <= triangle_budget
+                )
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        Path(h5m_filename).parents[0].mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(trial_filenames[chosen], h5m_filename)
+
+    return FacetingSearch(
+        faceting_tolerance=chosen,
+        triangles=trials[chosen],
+        trials=[
+            FacetingTrial(tolerance, trials[tolerance]) for tolerance in sorted(trials)
+        ],
+    )
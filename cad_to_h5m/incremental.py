@@ -0,0 +1,109 @@
+import json
+from pathlib import Path
+from typing import List, Optional
+
+from .cache import hash_file
+from .commands import format_ids
+
+MANIFEST_FILENAME = "manifest.json"
+SESSION_FILENAME = "session.cub"
+
+
+def entry_fingerprint(entry: dict) -> dict:
+    """Returns the parts of an entry that change the imported geometry. Other
+    keys such as the material_tag are applied after the import so changing
+    them does not require the file to be imported again."""
+    return {
+        "cad_filename": entry["cad_filename"],
+        "cad_file_hash": hash_file(entry["cad_filename"]),
+        "scale": entry.get("scale"),
+    }
+
+
+def load_manifest(incremental_dir: str, autoheal: bool) -> Optional[dict]:
+    """Returns the manifest of the saved session or None if there is no saved
+    session or it was created with different settings"""
+    manifest_path = Path(incremental_dir) / MANIFEST_FILENAME
+    session_path = Path(incremental_dir) / SESSION_FILENAME
+    if not manifest_path.is_file() or not session_path.is_file():
+        return None
+    with open(manifest_path) as infile:
+        manifest = json.load(infile)
+    if manifest["autoheal"] != autoheal:
+        return None
+    return manifest
+
+
+def restore_session(
+    files_with_tags: List[dict], incremental_dir: str, autoheal: bool, cubit
+) -> List[dict]:
+    """Opens the session saved by save_session and removes the volumes of
+    entries that have changed or are no longer in files_with_tags. The volume
+    ids of unchanged entries are restored to the entries.
+
+    Args:
+        files_with_tags: the entries passed to cad_to_h5m.
+        incremental_dir: the folder containing the saved session.
+        autoheal: flag to control if the geometry is autohealed, the saved
+            session is only used if it was created with the same setting.
+        cubit: the cubit module.
+
+    Returns:
+        The entries that were not found in the saved session and need to be
+        imported
+    """
+    manifest = load_manifest(incremental_dir, autoheal)
+    if manifest is None:
+        return list(files_with_tags)
+
+    cubit.cmd(f'open "{Path(incremental_dir) / SESSION_FILENAME}"')
+
+    unmatched = list(manifest["entries"])
+    changed_entries = []
+    for entry in files_with_tags:
+        fingerprint = entry_fingerprint(entry)
+        for saved in unmatched:
+            if saved["fingerprint"] == fingerprint:
+                entry["volumes"] = saved["volumes"]
+                if "surface_reflectivity" in saved:
+                    entry["surface_reflectivity"] = saved["surface_reflectivity"]
+                unmatched.remove(saved)
+                break
+        else:
+            changed_entries.append(entry)
+
+    stale_volumes = [volume for saved in unmatched for volume in saved["volumes"]]
+    if stale_volumes:
+        cubit.cmd(f"delete volume {format_ids(stale_volumes)}")
+
+    return changed_entries
+
+
+def save_session(
+    files_with_tags: List[dict], incremental_dir: str, autoheal: bool, cubit
+):
+    """Saves the Cubit session and a manifest of the entries with their file
+    hashes and volume ids so that a later conversion can reuse the imported
+    geometry of the unchanged entries
+
+    Args:
+        files_with_tags: the entries with their imported volume ids.
+        incremental_dir: the folder to save the session in.
+        autoheal: the autoheal setting used to create the session.
+        cubit: the cubit module.
+    """
+    Path(incremental_dir).mkdir(parents=True, exist_ok=True)
+    # the old manifest is removed first so it can never describe a newer
+    # session file if saving is interrupted
+    (Path(incremental_dir) / MANIFEST_FILENAME).unlink(missing_ok=True)
+
+    entries = []
+    for entry in files_with_tags:
+        saved = {"fingerprint": entry_fingerprint(entry), "volumes": entry["volumes"]}
+        if "surface_reflectivity" in entry:
+            saved["surface_reflectivity"] = entry["surface_reflectivity"]
+        entries.append(saved)
+
+    cubit.cmd(f'save as "{Path(incremental_dir) / SESSION_FILENAME}" overwrite')
+    with open(Path(incremental_dir) / MANIFEST_FILENAME, "w") as outfile:
+        json.dump({"autoheal": autoheal, "entries": entries}, outfile, indent=4)
@@ -0,0 +1,182 @@
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from .clusters import volume_bounding_boxes
+from .inspect import count_volume_triangles
+
+
+class GeometryIndex:
+    """The properties of each volume of a conversion held in columns, one row
+    per volume, so that they can be saved to a compact NumPy .npz file and
+    queried without Cubit or the h5m file.
+
+    The surfaces of each volume are stored as one flat array of surface ids
+    with the surfaces of row i found between surface_offsets[i] and
+    surface_offsets[i + 1].
+
+    Args:
+        volume_ids: the id of each volume.
+        material_tags: the material tag of each volume.
+        cad_filenames: the CAD file each volume was imported from.
+        bounding_boxes: the [xmin, ymin, zmin, xmax, ymax, zmax] of each
+            volume.
+        volumes: the volume of each volume.
+        triangles: the number of triangles on the surfaces of each volume in
+            the exported h5m file, -1 where it is not known.
+        surface_ids: the ids of the surfaces of all the volumes.
+        surface_offsets: the start of the surfaces of each volume in
+            surface_ids, with one extra value for the end of the last volume.
+        reflectors: True for the surfaces in surface_ids that are reflecting
+            surfaces of a wedge.
+    """
+
+    columns = [
+        "volume_ids",
+        "material_tags",
+        "cad_filenames",
+        "bounding_boxes",
+        "volumes",
+        "triangles",
+        "surface_ids",
+        "surface_offsets",
+        "reflectors",
+    ]
+
+    def __init__(
+        self,
+        volume_ids: np.ndarray,
+        material_tags: np.ndarray,
+        cad_filenames: np.ndarray,
+        bounding_boxes: np.ndarray,
+        volumes: np.ndarray,
+        triangles: np.ndarray,
+        surface_ids: np.ndarray,
+        surface_offsets: np.ndarray,
+        reflectors: np.ndarray,
+    ):
+        self.volume_ids = np.asarray(volume_ids, dtype=int)
+        self.material_tags = np.asarray(material_tags, dtype=str)
+        self.cad_filenames = np.asarray(cad_filenames, dtype=str)
+        self.bounding_boxes = np.asarray(bounding_boxes, dtype=float).reshape(-1, 6)
+        self.volumes = np.asarray(volumes, dtype=float)
+        self.triangles = np.asarray(triangles, dtype=int)
+        self.surface_ids = np.asarray(surface_ids, dtype=int)
+        self.surface_offsets = np.asarray(surface_offsets, dtype=int)
+        self.reflectors = np.asarray(reflectors, dtype=bool)
+
+    def __len__(self) -> int:
+        return len(self.volume_ids)
+
+    def save(self, filename: str):
+        """Saves the index as a compressed NumPy .npz file"""
+        Path(filename).parents[0].mkdir(parents=True, exist_ok=True)
+        with open(filename, "wb") as outfile:
+            np.savez_compressed(
+                outfile, **{column: getattr(self, column) for column in self.columns}
+            )
+
+    @classmethod
+    def load(cls, filename: str) -> "GeometryIndex":
+        """Loads an index saved with save"""
+        with np.load(filename) as data:
+            return cls(**{column: data[column] for column in cls.columns})
+
+    def _row(self, volume_id: int) -> int:
+        rows = np.nonzero(self.volume_ids == volume_id)[0]
+        if len(rows) == 0:
+            msg = f"volume {volume_id} is not in the geometry index"
+            raise ValueError(msg)
+        return int(rows[0])
+
+    def volumes_of_material(self, material_tag: str) -> np.ndarray:
+        """Returns the ids of the volumes with the material tag"""
+        return self.volume_ids[self.material_tags == material_tag]
+
+    def volumes_of_file(self, cad_filename: str) -> np.ndarray:
+        """Returns the ids of the volumes imported from the CAD file"""
+        return self.volume_ids[self.cad_filenames == str(cad_filename)]
+
+    def volumes_containing_point(self, point: Sequence[float]) -> np.ndarray:
+        """Returns the ids of the volumes whose bounding box contains the
+        point. The point may be outside of the volumes themselves, so these are
+        the candidates to check, for example when placing a source."""
+        point = np.asarray(point, dtype=float)
+        inside = np.all(
+            (self.bounding_boxes[:, :3] <= point)
+            & (point <= self.bounding_boxes[:, 3:]),
+            axis=1,
+        )
+        return self.volume_ids[inside]
+
+    def surfaces_of_volume(self, volume_id: int) -> np.ndarray:
+        """Returns the ids of the surfaces of the volume"""
+        row = self._row(volume_id)
+        start, end = self.surface_offsets[row], self.surface_offsets[row + 1]
+        return self.surface_ids[start:end]
+
+    def reflecting_surfaces(self) -> np.ndarray:
+        """Returns the ids of the reflecting surfaces"""
+        return np.unique(self.surface_ids[self.reflectors])
+
+    def bounding_box_of_volume(self, volume_id: int) -> np.ndarray:
+        """Returns the [xmin, ymin, zmin, xmax, ymax, zmax] of the volume"""
+        return self.bounding_boxes[self._row(volume_id)]
+
+
+def build_geometry_index(
+    geometry_details: List[dict], cubit, h5m_filename: Optional[str] = None
+) -> GeometryIndex:
+    """Collects the properties of each volume of the entries from the Cubit
+    session. The number of triangles of each volume is read from the h5m file
+    when it is provided and h5py is installed.
+
+    Args:
+        geometry_details: the entries with their volume ids.
+        cubit: the cubit module.
+        h5m_filename: the exported h5m file.
+    """
+    volume_ids = []
+    material_tags = []
+    cad_filenames = []
+    reflector_ids = set()
+    for entry in geometry_details:
+        for volume in entry["volumes"]:
+            volume_ids.append(int(volume))
+            material_tags.append(entry.get("material_tag", ""))
+            cad_filenames.append(str(entry["cad_filename"]))
+        for surface_id, info in entry.get("surface_reflectivity", {}).items():
+            if info["reflector"]:
+                reflector_ids.add(int(surface_id))
+
+    surfaces = [
+        [int(surface) for surface in cubit.get_relatives("volume", volume, "surface")]
+        for volume in volume_ids
+    ]
+    surface_ids = np.array([s for volume in surfaces for s in volume], dtype=int)
+
+    triangles = np.full(len(volume_ids), -1)
+    if h5m_filename is not None:
+        try:
+            triangles_of_volume = count_volume_triangles(h5m_filename)
+        except (ImportError, OSError, KeyError):
+            triangles_of_volume = None
+        if triangles_of_volume is not None:
+            triangles = np.array(
+                [triangles_of_volume.get(volume, -1) for volume in volume_ids]
+            )
+
+    return GeometryIndex(
+        volume_ids=volume_ids,
+        material_tags=material_tags,
+        cad_filenames=cad_filenames,
+        bounding_boxes=volume_bounding_boxes(volume_ids, cubit),
+        volumes=[cubit.get_volume_volume(volume) for volume in volume_ids],
+        triangles=triangles,
+        surface_ids=surface_ids,
+        surface_offsets=np.concatenate(
+            [[0], np.cumsum([len(volume) for volume in surfaces])]
+        ),
+        reflectors=np.isin(surface_ids, list(reflector_ids)),
+    )
@@ -0,0 +1,410 @@
+"""Reads the volumes, materials and triangle counts of a DAGMC h5m file with
+h5py, without MOAB. Only the set tables and the coordinates of the vertices are
+read, in chunks, so the triangle connectivity table is never loaded and large
+files can be inspected with little memory.
+
+The h5m file uses the MOAB HDF5 layout. DAGMC volumes and surfaces are entity
+sets with a CATEGORY tag of "Volume" or "Surface". The children of a volume
+set are its surface sets and the contents of a surface set are its triangles
+and vertices. Material groups are sets with a CATEGORY of "Group" and a NAME
+tag starting with "mat:" that contain volume sets.
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+import numpy as np
+
+from .moab import RANGE_BIT, import_h5py
+
+CHUNK_SIZE = 2**20
+
+
+def tag_value_to_str(value) -> str:
+    if isinstance(value, (np.void, np.ndarray)):
+        value = value.tobytes()
+    if isinstance(value, bytes):
+        return value.split(b"\x00")[0].decode("ascii", errors="replace")
+    return str(value)
+
+
+def _merge_ranges(ranges: List[tuple]) -> List[tuple]:
+    """Merges overlapping and adjacent (start, stop) ranges"""
+    merged = []
+    for start, stop in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], stop))
+        else:
+            merged.append((start, stop))
+    return merged
+
+
+def _handles_to_ranges(handles: np.ndarray) -> List[tuple]:
+    """Converts sorted handles into (start, stop) ranges of consecutive handles"""
+    if len(handles) == 0:
+        return []
+    handles = np.unique(handles)
+    breaks = np.nonzero(np.diff(handles) != 1)[0]
+    starts = np.concatenate([[handles[0]], handles[breaks + 1]])
+    stops = np.concatenate([handles[breaks], [handles[-1]]]) + 1
+    return list(zip(starts.tolist(), stops.tolist()))
+
+
+def _intersect_ranges(ranges: List[tuple], start: int, stop: int) -> List[tuple]:
+    """Returns the parts of the ranges within start and stop"""
+    intersection = []
+    for range_start, range_stop in ranges:
+        low, high = max(range_start, start), min(range_stop, stop)
+        if low < high:
+            intersection.append((low, high))
+    return intersection
+
+
+def _range_length(ranges: List[tuple]) -> int:
+    return sum(stop - start for start, stop in ranges)
+
+
+@dataclass
+class MaterialSummary:
+    """The triangles, vertices and extent of the volumes of one material
+
+    Args:
+        volume_ids: the ids of the volumes in the material group.
+        triangles: the number of triangles on the surfaces of the volumes.
+        vertices: the number of vertices on the surfaces of the volumes.
+        bounding_box: the [xmin, ymin, zmin, xmax, ymax, zmax] of the volumes.
+    """
+
+    volume_ids: List[int]
+    triangles: int
+    vertices: int
+    bounding_box: List[float]
+
+
+@dataclass
+class H5mSummary:
+    """A summary of a DAGMC h5m file. The per volume values are arrays in the
+    order of volume_ids.
+
+    Args:
+        filename: the h5m filename.
+        triangles: the total number of triangles in the file.
+        vertices: the total number of vertices in the file.
+        volume_ids: the ids of the volumes.
+        volume_triangles: the number of triangles on the surfaces of each
+            volume.
+        volume_vertices: the number of vertices on the surfaces of each volume.
+        volume_bounding_boxes: the [xmin, ymin, zmin, xmax, ymax, zmax] of each
+            volume.
+        materials: the material group names mapped to their MaterialSummary.
+    """
+
+    filename: str
+    triangles: int
+    vertices: int
+    volume_ids: np.ndarray
+    volume_triangles: np.ndarray
+    volume_vertices: np.ndarray
+    volume_bounding_boxes: np.ndarray
+    materials: Dict[str, MaterialSummary] = field(default_factory=dict)
+
+    @property
+    def material_tags(self) -> List[str]:
+        """The material group names, such as "mat:steel" """
+        return list(self.materials)
+
+    def to_dict(self) -> dict:
+        return {
+            "filename": self.filename,
+            "triangles": self.triangles,
+            "vertices": self.vertices,
+            "volumes": {
+                int(volume_id): {
+                    "triangles": int(triangles),
+                    "vertices": int(vertices),
+                    "bounding_box": bounding_box.tolist(),
+                }
+                for volume_id, triangles, vertices, bounding_box in zip(
+                    self.volume_ids,
+                    self.volume_triangles,
+                    self.volume_vertices,
+                    self.volume_bounding_boxes,
+                )
+            },
+            "materials": {
+                name: {
+                    "volume_ids": material.volume_ids,
+                    "triangles": material.triangles,
+                    "vertices": material.vertices,
+                    "bounding_box": material.bounding_box,
+                }
+                for name, material in self.materials.items()
+            },
+        }
+
+
+class H5mReader:
+    """Reads the entity sets of a DAGMC h5m file. The file is opened read only
+    and the set contents and children tables, which hold ranges of handles and
+    so are small next to the triangle connectivity, are read once when first
+    needed.
+
+    Args:
+        filename: the h5m filename.
+    """
+
+    def __init__(self, filename: str):
+        h5py = import_h5py()
+        self.filename = filename
+        self.file = h5py.File(filename, "r")
+        tstt = self.file["tstt"]
+
+        coordinates = tstt["nodes/coordinates"]
+        self.node_start = int(coordinates.attrs["start_id"])
+        self.node_count = coordinates.shape[0]
+
+        if "elements/Tri3/connectivity" in tstt:
+            connectivity = tstt["elements/Tri3/connectivity"]
+            self.tri_start = int(connectivity.attrs["start_id"])
+            self.tri_count = connectivity.shape[0]
+        else:
+            self.tri_start = 0
+            self.tri_count = 0
+
+        self.set_list = tstt["sets/list"][...]
+        self.set_start = int(tstt["sets/list"].attrs["start_id"])
+        self._set_tables = {}
+        self._coordinates = None
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def set_handles(self) -> np.ndarray:
+        return np.arange(len(self.set_list)) + self.set_start
+
+    def set_tag(self, tag_name: str) -> Dict[int, object]:
+        """Returns the set handles mapped to their value of a tag, reading the
+        tag from the sparse tag table or the dense set tag table"""
+        tstt = self.file["tstt"]
+        values = {}
+        if f"tags/{tag_name}/id_list" in tstt:
+            handles = tstt[f"tags/{tag_name}/id_list"][...]
+            tag_values = tstt[f"tags/{tag_name}/values"][...]
+            set_range = (self.set_start, self.set_start + len(self.set_list))
+            for handle, value in zip(handles.tolist(), tag_values):
+                if set_range[0] <= handle < set_range[1]:
+                    values[handle] = value
+        if f"sets/tags/{tag_name}" in tstt:
+            tag_values = tstt[f"sets/tags/{tag_name}"][...]
+            for handle, value in zip(self.set_handles().tolist(), tag_values):
+                values.setdefault(handle, value)
+        return values
+
+    def _set_table_slice(self, handle: int, column: int, table: str) -> np.ndarray:
+        index = handle - self.set_start
+        start = 0 if index == 0 else int(self.set_list[index - 1, column]) + 1
+        stop = int(self.set_list[index, column]) + 1
+        if stop <= start:
+            return np.zeros(0, dtype=np.int64)
+        if table not in self._set_tables:
+            self._set_tables[table] = self.file["tstt/sets"][table][...]
+        return self._set_tables[table][start:stop]
+
+    def contents_ranges(self, handle: int) -> List[tuple]:
+        """Returns the contents of a set as (start, stop) handle ranges"""
+        contents = self._set_table_slice(handle, 0, "contents")
+        if int(self.set_list[handle - self.set_start, 3]) & RANGE_BIT:
+            pairs = contents.reshape(-1, 2).tolist()
+            return _merge_ranges([(start, start + count) for start, count in pairs])
+        return _handles_to_ranges(contents)
+
+    def children(self, handle: int) -> List[int]:
+        return self._set_table_slice(handle, 1, "children").tolist()
+
+    def triangle_ranges(self, ranges: List[tuple]) -> List[tuple]:
+        return _intersect_ranges(
+            ranges, self.tri_start, self.tri_start + self.tri_count
+        )
+
+    def node_ranges(self, ranges: List[tuple]) -> List[tuple]:
+        return _intersect_ranges(
+            ranges, self.node_start, self.node_start + self.node_count
+        )
+
+    def bounding_box(self, node_ranges: List[tuple]) -> np.ndarray:
+        """Returns the [xmin, ymin, zmin, xmax, ymax, zmax] of the nodes in the
+        ranges, reading the coordinates in chunks. The coordinates of files
+        with no more than one chunk of nodes are read once and kept."""
+        lower = np.full(3, np.inf)
+        upper = np.full(3, -np.inf)
+        coordinates = self._coordinates
+        if coordinates is None:
+            coordinates = self.file["tstt/nodes/coordinates"]
+            if self.node_count <= CHUNK_SIZE:
+                coordinates = self._coordinates = coordinates[...]
+        for start, stop in node_ranges:
+            for chunk_start in range(start, stop, CHUNK_SIZE):
+                chunk_stop = min(chunk_start + CHUNK_SIZE, stop)
+                chunk = coordinates[
+                    chunk_start - self.node_start : chunk_stop - self.node_start
+                ]
+                lower = np.minimum(lower, chunk.min(axis=0))
+                upper = np.maximum(upper, chunk.max(axis=0))
+        return np.concatenate([lower, upper])
+
+
+def inspect_h5m(filename: str) -> H5mSummary:
+    """Returns the number of triangles and vertices and the bounding box of
+    each volume and material in a DAGMC h5m file.
+
+    Args:
+        filename: the h5m filename.
+    """
+    with H5mReader(filename) as reader:
+        categories = {
+            handle: tag_value_to_str(value)
+            for handle, value in reader.set_tag("CATEGORY").items()
+        }
+        global_ids = reader.set_tag("GLOBAL_ID")
+        names = {
+            handle: tag_value_to_str(value)
+            for handle, value in reader.set_tag("NAME").items()
+        }
+
+        surface_triangles = {}
+        surface_nodes = {}
+        for handle, category in categories.items():
+            if category == "Surface":
+                contents = reader.contents_ranges(handle)
+                surface_triangles[handle] = reader.triangle_ranges(contents)
+                surface_nodes[handle] = reader.node_ranges(contents)
+
+        def summarise(surfaces):
+            triangles = _merge_ranges(
+                [r for surface in surfaces for r in surface_triangles[surface]]
+            )
+            nodes = _merge_ranges(
+                [r for surface in surfaces for r in surface_nodes[surface]]
+            )
+            return _range_length(triangles), _range_length(nodes), nodes
+
+        volume_handles = sorted(
+            handle for handle, category in categories.items() if category == "Volume"
+        )
+        volume_surfaces = {}
+        volume_ids = []
+        volume_triangles = []
+        volume_vertices = []
+        volume_bounding_boxes = []
+        for handle in volume_handles:
+            surfaces = [
+                child for child in reader.children(handle) if child in surface_triangles
+            ]
+            volume_surfaces[handle] = surfaces
+            triangles, vertices, nodes = summarise(surfaces)
+            volume_ids.append(int(global_ids.get(handle, len(volume_ids) + 1)))
+            volume_triangles.append(triangles)
+            volume_vertices.append(vertices)
+            volume_bounding_boxes.append(reader.bounding_box(nodes))
+
+        materials = {}
+        volume_id_of_handle = dict(zip(volume_handles, volume_ids))
+        for handle, name in names.items():
+            if categories.get(handle) != "Group" or not name.startswith("mat:"):
+                continue
+            members = [
+                member
+                for start, stop in reader.contents_ranges(handle)
+                for member in range(start, stop)
+                if member in volume_surfaces
+            ]
+            surfaces = sorted(
+                set(
+                    surface for member in members for surface in volume_surfaces[member]
+                )
+            )
+            triangles, vertices, nodes = summarise(surfaces)
+            materials[name] = MaterialSummary(
+                volume_ids=[volume_id_of_handle[member] for member in members],
+                triangles=triangles,
+                vertices=vertices,
+                bounding_box=reader.bounding_box(nodes).tolist(),
+            )
+
+        return H5mSummary(
+            filename=filename,
+            triangles=reader.tri_count,
+            vertices=reader.node_count,
+            volume_ids=np.array(volume_ids, dtype=int),
+            volume_triangles=np.array(volume_triangles, dtype=int),
+            volume_vertices=np.array(volume_vertices, dtype=int),
+            volume_bounding_boxes=np.array(volume_bounding_boxes).reshape(-1, 6),
+            materials=materials,
+        )
+
+
+def count_volume_triangles(filename: str) -> Dict[int, int]:
+    """Returns the number of triangles of each volume in a DAGMC h5m file,
+    keyed by volume id. Faster than inspect_h5m as the vertices and bounding
+    boxes are not found.
+
+    Args:
+        filename: the h5m filename.
+    """
+    with H5mReader(filename) as reader:
+        categories = {
+            handle: tag_value_to_str(value)
+            for handle, value in reader.set_tag("CATEGORY").items()
+        }
+        global_ids = reader.set_tag("GLOBAL_ID")
+
+        surface_triangles = {
+            handle: _range_length(
+                reader.triangle_ranges(reader.contents_ranges(handle))
+            )
+            for handle, category in categories.items()
+            if category == "Surface"
+        }
+
+        volume_triangles = {}
+        volume_handles = sorted(
+            handle for handle, category in categories.items() if category == "Volume"
+        )
+        for handle in volume_handles:
+            volume_id = int(global_ids.get(handle, len(volume_triangles) + 1))
+            volume_triangles[volume_id] = sum(
+                surface_triangles.get(child, 0) for child in reader.children(handle)
+            )
+        return volume_triangles
+
+
+def count_triangles(filename: str) -> int:
+    """Returns the number of triangles in a DAGMC h5m file, read from the
+    shape of the connectivity table without loading it"""
+    with H5mReader(filename) as reader:
+        return reader.tri_count
+
+
+def material_tags(filename: str) -> List[str]:
+    """Returns the names of the material groups in a DAGMC h5m file. Only the
+    NAME and CATEGORY tags of the sets are read so this is faster than
+    inspect_h5m, which also reads the set contents and vertex coordinates.
+
+    Args:
+        filename: the h5m filename.
+    """
+    with H5mReader(filename) as reader:
+        categories = reader.set_tag("CATEGORY")
+        tags = []
+        for handle, value in reader.set_tag("NAME").items():
+            name = tag_value_to_str(value)
+            category = tag_value_to_str(categories.get(handle, ""))
+            if category == "Group" and name.startswith("mat:"):
+                tags.append(name)
+        return tags
@@ -0,0 +1,95 @@
+import json
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .cache import hash_file
+from .utils import import_cubit
+
+
+def journal_manifest_filename(journal_filename: str) -> str:
+    """Returns the filename of the manifest saved next to a journal"""
+    path = Path(journal_filename)
+    return str(path.parent / f"{path.stem}_manifest.json")
+
+
+def write_journal(
+    journal_filename: str,
+    commands: List[str],
+    geometry_details: List[dict],
+    outputs: Dict[str, Optional[str]],
+):
+    """Saves the Cubit commands of a conversion as a journal file and a
+    manifest with the hashes of the CAD files, the volume ids of each entry and
+    the output files. The commands already contain the volume ids found during
+    the conversion so the journal only reproduces the conversion while the CAD
+    files are unchanged.
+
+    Args:
+        journal_filename: the .jou filename.
+        commands: the Cubit commands in the order they were sent.
+        geometry_details: the entries with their volume ids.
+        outputs: the output files written by Cubit, keyed by kind.
+    """
+    Path(journal_filename).parents[0].mkdir(parents=True, exist_ok=True)
+    with open(journal_filename, "w") as outfile:
+        outfile.write("# journal recorded by cad_to_h5m\n")
+        for command in commands:
+            outfile.write(f"{command}\n")
+
+    manifest = {
+        "journal_filename": str(journal_filename),
+        "command_count": len(commands),
+        "cad_file_hashes": {
+            entry["cad_filename"]: hash_file(entry["cad_filename"])
+            for entry in geometry_details
+        },
+        "geometry_details": geometry_details,
+        "outputs": {kind: filename for kind, filename in outputs.items() if filename},
+    }
+    with open(journal_manifest_filename(journal_filename), "w") as outfile:
+        json.dump(manifest, outfile, indent=4)
+
+
+def replay_journal(
+    journal_filename: str,
+    cubit_path: str = "/opt/Coreform-Cubit-2021.5/bin/",
+    check_files: bool = True,
+) -> Dict[str, str]:
+    """Replays a journal saved by cad_to_h5m with a single Cubit playback
+    command, so none of the conversion logic runs in Python. The CAD files
+    are checked against the hashes in the manifest first as changed files
+    would not have the volume ids used by the commands.
+
+    Args:
+        journal_filename: the .jou filename.
+        cubit_path: the path to the Cubit directory used to import Cubit from.
+        check_files: flag to control if the CAD files are checked.
+
+    Returns:
+        The output files written by Cubit, keyed by kind
+    """
+    with open(journal_manifest_filename(journal_filename)) as infile:
+        manifest = json.load(infile)
+
+    if check_files:
+        changed = [
+            filename
+            for filename, file_hash in manifest["cad_file_hashes"].items()
+            if not Path(filename).is_file() or hash_file(filename) != file_hash
+        ]
+        if changed:
+            msg = (
+                f"The CAD files {changed} have changed since the journal "
+                f"{journal_filename} was recorded, convert them with cad_to_h5m "
+                "to record a new journal"
+            )
+            raise ValueError(msg)
+
+    for filename in manifest["outputs"].values():
+        Path(filename).parents[0].mkdir(parents=True, exist_ok=True)
+
+    cubit = import_cubit(cubit_path)
+    cubit.init([])
+    cubit.cmd(f'playback "{journal_filename}"')
+    cubit.cmd("reset")
+    return manifest["outputs"]
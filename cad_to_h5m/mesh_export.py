@@ -0,0 +1,367 @@
+"""Writes the tet mesh of a Cubit session to a MOAB h5m file, for OpenMC
+unstructured mesh tallies, and to a VTK .vtu file without going through an
+Exodus file.
+
+Cubit returns the nodes of one tet per call so the tets of each volume are
+read in chunks and appended to the connectivity table of the h5m file as they
+arrive. Only the node ids and coordinates are kept in memory. The Cubit node
+ids are then replaced with the handles of the nodes, chunk by chunk, and the
+volume of each tet is summed per volume and material. The .vtu file is
+written from the h5m file, also in chunks, as raw appended data.
+"""
+
+import tempfile
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+from .moab import (
+    DENSE_TAG,
+    ENTITY_TYPES,
+    RANGE_BIT,
+    SPARSE_TAG,
+    import_h5py,
+    opaque,
+    write_tag,
+)
+
+CHUNK_SIZE = 2**16
+
+# the VTK cell type of a linear tet
+VTK_TETRA = 10
+
+
+@dataclass
+class MaterialMeshStats:
+    """The tets of the volumes of one material
+
+    Args:
+        volume_ids: the ids of the meshed volumes with the material tag.
+        tets: the number of tets in the volumes.
+        volume: the sum of the volumes of the tets.
+    """
+
+    volume_ids: List[int] = field(default_factory=list)
+    tets: int = 0
+    volume: float = 0.0
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def tet_volumes(corners: np.ndarray) -> np.ndarray:
+    """Returns the volumes of tets from the coordinates of their corners, an
+    array with a shape of (tets, 4, 3)"""
+    edges = corners[:, 1:] - corners[:, :1]
+    return np.abs(np.linalg.det(edges)) / 6
+
+
+def _volume_tet_chunks(
+    volume_id: int, cubit, chunk_size: int, from_blocks: bool
+) -> Iterator[np.ndarray]:
+    """Yields the Cubit node ids of the tets of a volume in chunks"""
+    if from_blocks:
+        tet_ids = cubit.get_block_tets(volume_id)
+    else:
+        tet_ids = cubit.get_volume_tets(volume_id)
+    for start in range(0, len(tet_ids), chunk_size):
+        connectivity = [
+            cubit.get_connectivity("tet", tet_id)
+            for tet_id in tet_ids[start : start + chunk_size]
+        ]
+        yield np.array(connectivity, dtype=np.int64).reshape(-1, 4)
+
+
+def _write_vtu(
+    vtu_filename: str,
+    coordinates: np.ndarray,
+    connectivity,
+    volume_ids: np.ndarray,
+    material_ids: np.ndarray,
+    tet_counts: np.ndarray,
+    chunk_size: int,
+):
+    """Writes an unstructured grid of tets to a .vtu file with the data
+    appended as raw binary blocks, each led by its size in bytes. The
+    connectivity is read from the h5m dataset in chunks and the cell data is
+    repeated per volume from the number of tets of each volume."""
+    tet_count = int(tet_counts.sum())
+    arrays = [
+        ("Points", "Float64", 3, coordinates.size * 8),
+        ("connectivity", "Int64", 1, tet_count * 4 * 8),
+        ("offsets", "Int64", 1, tet_count * 8),
+        ("types", "UInt8", 1, tet_count),
+        ("volume_id", "Int32", 1, tet_count * 4),
+        ("material_id", "Int32", 1, tet_count * 4),
+    ]
+    offsets = np.concatenate([[0], np.cumsum([8 + size for *_, size in arrays])])
+    elements = [
+        f'<DataArray type="{dtype}" Name="{name}" NumberOfComponents="{components}" '
+        f'format="appended" offset="{offset}"/>'
+        for (name, dtype, components, _), offset in zip(arrays, offsets)
+    ]
+    header = (
+        '<?xml version="1.0"?>\n'
+        '<VTKFile type="UnstructuredGrid" version="1.0" '
+        'byte_order="LittleEndian" header_type="UInt64">\n'
+        "<UnstructuredGrid>\n"
+        f'<Piece NumberOfPoints="{len(coordinates)}" NumberOfCells="{tet_count}">\n'
+        f"<Points>{elements[0]}</Points>\n"
+        f"<Cells>{''.join(elements[1:4])}</Cells>\n"
+        f'<CellData Scalars="material_id">{"".join(elements[4:])}</CellData>\n'
+        "</Piece>\n"
+        "</UnstructuredGrid>\n"
+        '<AppendedData encoding="raw">\n_'
+    )
+
+    def cell_values(values, start, stop):
+        volume_of_tet = np.searchsorted(
+            np.cumsum(tet_counts), np.arange(start, stop), side="right"
+        )
+        return values[volume_of_tet].astype("<i4")
+
+    Path(vtu_filename).parents[0].mkdir(parents=True, exist_ok=True)
+    with open(vtu_filename, "wb") as outfile:
+        outfile.write(header.encode("ascii"))
+        for name, *_, size in arrays:
+            outfile.write(np.uint64(size).tobytes())
+            if name == "Points":
+                outfile.write(coordinates.astype("<f8").tobytes())
+                continue
+            for start in range(0, tet_count, chunk_size):
+                stop = min(start + chunk_size, tet_count)
+                if name == "connectivity":
+                    # the handles of the nodes start at 1, vtk indices at 0
+                    block = connectivity[start:stop].astype("<i8") - 1
+                elif name == "offsets":
+                    block = 4 * np.arange(start + 1, stop + 1, dtype="<i8")
+                elif name == "types":
+                    block = np.full(stop - start, VTK_TETRA, dtype=np.uint8)
+                elif name == "volume_id":
+                    block = cell_values(volume_ids, start, stop)
+                else:
+                    block = cell_values(material_ids, start, stop)
+                outfile.write(block.tobytes())
+        outfile.write(b"\n</AppendedData>\n</VTKFile>\n")
+
+
+def export_tet_mesh(
+    geometry_details: List[dict],
+    cubit,
+    h5m_filename: Optional[str] = None,
+    vtu_filename: Optional[str] = None,
+    from_blocks: bool = False,
+    chunk_size: int = CHUNK_SIZE,
+) -> Dict[str, MaterialMeshStats]:
+    """Writes the tets of the volumes of entries with a tet_mesh key to a
+    MOAB h5m file and/or a VTK .vtu file. The h5m file has a set of the tets
+    of each volume, with the volume id in its GLOBAL_ID and MATERIAL_SET tags,
+    and a "mat:" group of the volume sets of each material. The cells of the
+    .vtu file have a volume_id and a material_id, the position of the
+    material tag in the returned statistics. The number of tets and the sum of
+    their volumes are added to each entry as "tets" and "tet_volume" keys.
+
+    Args:
+        geometry_details: the entries with their volume ids.
+        cubit: the cubit module.
+        h5m_filename: the MOAB h5m filename of the tet mesh.
+        vtu_filename: the VTK .vtu filename of the tet mesh.
+        from_blocks: flag to control if the tets of each volume are read from
+            the block with the id of the volume, as for meshes imported from
+            shards meshed in parallel, instead of from the volume.
+        chunk_size: the number of tets read from Cubit and written at once.
+
+    Returns:
+        The statistics of the tets of each material tag
+    """
+    h5py = import_h5py()
+
+    meshed = [
+        (int(volume), entry)
+        for entry in geometry_details
+        if "tet_mesh" in entry
+        for volume in entry["volumes"]
+    ]
+    material_tags = list(dict.fromkeys(entry["material_tag"] for _, entry in meshed))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # the mesh is written to a temporary h5m file when only a .vtu file
+        # is requested so that the tets are never all held in memory
+        mesh_filename = h5m_filename or str(Path(tmp_dir) / "mesh.h5m")
+        Path(mesh_filename).parents[0].mkdir(parents=True, exist_ok=True)
+        with h5py.File(mesh_filename, "w") as h5m_file:
+            tstt = h5m_file.create_group("tstt")
+            connectivity = tstt.create_dataset(
+                "elements/Tet4/connectivity",
+                shape=(0, 4),
+                maxshape=(None, 4),
+                chunks=(chunk_size, 4),
+                dtype=np.int64,
+            )
+
+            tet_counts = np.zeros(len(meshed), dtype=np.int64)
+            node_ids = []
+            for index, (volume_id, _) in enumerate(meshed):
+                for chunk in _volume_tet_chunks(
+                    volume_id, cubit, chunk_size, from_blocks
+                ):
+                    start = connectivity.shape[0]
+                    connectivity.resize(start + len(chunk), axis=0)
+                    connectivity[start:] = chunk
+                    tet_counts[index] += len(chunk)
+                    node_ids.append(np.unique(chunk))
+            tet_count = int(tet_counts.sum())
+            node_ids = np.unique(np.concatenate(node_ids or [np.zeros(0, np.int64)]))
+
+            coordinates = np.zeros((len(node_ids), 3))
+            for start in range(0, len(node_ids), chunk_size):
+                coordinates[start : start + chunk_size] = [
+                    cubit.get_nodal_coordinates(int(node_id))
+                    for node_id in node_ids[start : start + chunk_size]
+                ]
+            dataset = tstt.create_dataset("nodes/coordinates", data=coordinates)
+            dataset.attrs["start_id"] = 1
+
+            # the node ids are replaced by the handles of the nodes, which
+            # are numbered from 1 in the order of the node ids
+            volumes = np.zeros(len(meshed))
+            volume_of_tet_ends = np.cumsum(tet_counts)
+            for start in range(0, tet_count, chunk_size):
+                stop = min(start + chunk_size, tet_count)
+                nodes = np.searchsorted(node_ids, connectivity[start:stop])
+                connectivity[start:stop] = nodes + 1
+                volume_of_tet = np.searchsorted(
+                    volume_of_tet_ends, np.arange(start, stop), side="right"
+                )
+                np.add.at(volumes, volume_of_tet, tet_volumes(coordinates[nodes]))
+
+            tet_start = len(node_ids) + 1
+            connectivity.attrs["start_id"] = tet_start
+            set_start = tet_start + tet_count
+            _write_mesh_sets(
+                h5py,
+                tstt,
+                [volume_id for volume_id, _ in meshed],
+                [entry["material_tag"] for _, entry in meshed],
+                material_tags,
+                tet_start,
+                tet_counts,
+                set_start,
+            )
+
+            if vtu_filename is not None:
+                _write_vtu(
+                    vtu_filename,
+                    coordinates,
+                    connectivity,
+                    np.array([volume_id for volume_id, _ in meshed]),
+                    np.array(
+                        [
+                            material_tags.index(entry["material_tag"])
+                            for _, entry in meshed
+                        ]
+                    ),
+                    tet_counts,
+                    chunk_size,
+                )
+
+    stats = {tag: MaterialMeshStats() for tag in material_tags}
+    for entry in geometry_details:
+        if "tet_mesh" in entry:
+            entry["tets"] = 0
+            entry["tet_volume"] = 0.0
+    for (volume_id, entry), count, volume in zip(meshed, tet_counts, volumes):
+        material = stats[entry["material_tag"]]
+        material.volume_ids.append(volume_id)
+        material.tets += int(count)
+        material.volume += float(volume)
+        entry["tets"] += int(count)
+        entry["tet_volume"] += float(volume)
+    return stats
+
+
+def _write_mesh_sets(
+    h5py,
+    tstt,
+    volume_ids: List[int],
+    volume_materials: List[str],
+    material_tags: List[str],
+    tet_start: int,
+    tet_counts: np.ndarray,
+    set_start: int,
+):
+    """Writes a set of the tets of each volume and a group of the volume sets
+    of each material to the h5m file, with the tag definitions"""
+    first_tets = tet_start + np.concatenate([[0], np.cumsum(tet_counts)[:-1]])
+    contents = [
+        [int(first), int(count)] for first, count in zip(first_tets, tet_counts)
+    ]
+    flags = [RANGE_BIT] * len(volume_ids)
+    group_start = set_start + len(volume_ids)
+    for tag in material_tags:
+        contents.append(
+            [
+                set_start + index
+                for index, material in enumerate(volume_materials)
+                if material == tag
+            ]
+        )
+        flags.append(0)
+
+    set_list = np.full((len(contents), 4), -1, dtype=np.int64)
+    set_list[:, 0] = np.cumsum([len(values) for values in contents]) - 1
+    set_list[:, 3] = flags
+
+    tstt.attrs["max_id"] = np.uint64(group_start + len(material_tags) - 1)
+    tstt["elemtypes"] = h5py.enum_dtype(
+        {name: value for value, name in enumerate(ENTITY_TYPES)}, basetype="i4"
+    )
+    tstt.create_dataset("history", data=np.zeros(0, dtype=h5py.string_dtype()))
+    tstt["elements/Tet4"].attrs.create(
+        "element_type", ENTITY_TYPES.index("Tet"), dtype=tstt["elemtypes"].dtype
+    )
+
+    dataset = tstt.create_dataset("sets/list", data=set_list)
+    dataset.attrs["start_id"] = set_start
+    tstt.create_dataset(
+        "sets/contents",
+        data=np.array([value for row in contents for value in row], np.int64),
+    )
+    for table in ["children", "parents"]:
+        tstt.create_dataset(f"sets/{table}", data=np.zeros(0, np.int64))
+
+    volume_handles = np.arange(set_start, group_start)
+    group_handles = np.arange(group_start, group_start + len(material_tags))
+    write_tag(tstt, "GLOBAL_ID", np.int32, DENSE_TAG)
+    tstt.create_dataset(
+        "sets/tags/GLOBAL_ID",
+        data=np.concatenate([volume_ids, np.arange(1, len(material_tags) + 1)]).astype(
+            np.int32
+        ),
+    )
+    write_tag(
+        tstt,
+        "MATERIAL_SET",
+        np.int32,
+        SPARSE_TAG,
+        volume_handles,
+        np.array(volume_ids, dtype=np.int32),
+    )
+    write_tag(
+        tstt,
+        "CATEGORY",
+        "V32",
+        SPARSE_TAG,
+        group_handles,
+        np.array([opaque("Group") for _ in material_tags], dtype="V32"),
+    )
+    write_tag(
+        tstt,
+        "NAME",
+        "V32",
+        SPARSE_TAG,
+        group_handles,
+        np.array([opaque(f"mat:{tag}") for tag in material_tags], dtype="V32"),
+    )
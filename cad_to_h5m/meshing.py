@@ -0,0 +1,399 @@
+import math
+import multiprocessing
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .commands import CommandBuffer, format_ids
+from .utils import import_cubit
+
+# an estimate of the memory Cubit uses for each tet of a mesh, including its
+# share of the nodes, used to turn a memory budget into a number of tets
+BYTES_PER_TET = 1024
+
+# the fraction of the target number of tets in the trial mesh
+TRIAL_FRACTION = 1 / 8
+
+# the number of times a mesh outside the tolerance of its target is redone
+MAX_REMESHES = 2
+
+
+def target_tet_count(tet_mesh: dict) -> int:
+    """Returns the number of tets a tet_mesh target asks for, given directly
+    with a "tets" key or as a memory budget in bytes with a "memory" key"""
+    if "tets" in tet_mesh:
+        return max(1, round(tet_mesh["tets"]))
+    return max(1, round(tet_mesh["memory"] / BYTES_PER_TET))
+
+
+def estimate_tet_count(size: float, volume: float, area: float) -> float:
+    """Returns an estimate of the number of tets with an edge length of size
+    in a volume, the regular tets that fill the volume and a layer of tets on
+    the triangles of its surfaces"""
+    return 6 * math.sqrt(2) * volume / size**3 + 4 / math.sqrt(3) * area / size**2
+
+
+def estimate_element_size(target_tets: float, volume: float, area: float) -> float:
+    """Returns the edge length that gives the target number of tets according
+    to estimate_tet_count, found by bisection as the count falls with size"""
+    lower = (6 * math.sqrt(2) * volume / target_tets) ** (1 / 3)
+    upper = lower + math.sqrt(4 / math.sqrt(3) * area / target_tets)
+    for _ in range(60):
+        size = math.sqrt(lower * upper)
+        if estimate_tet_count(size, volume, area) > target_tets:
+            lower = size
+        else:
+            upper = size
+    return math.sqrt(lower * upper)
+
+
+@dataclass
+class TetMeshFit:
+    """The meshes made of the volumes of an entry with a target number of tets
+    and the element size fitted to them
+
+    Args:
+        volume_ids: the ids of the volumes of the entry.
+        target_tets: the number of tets asked for.
+        tolerance: the accepted relative difference from the target.
+        volume: the total volume of the volumes.
+        area: the total area of the surfaces of the volumes.
+        sizes: the element sizes meshed so far, the trial mesh first.
+        tets: the number of tets of each of the meshes.
+        size: the element size the volumes are meshed with.
+    """
+
+    volume_ids: List[str]
+    target_tets: int
+    tolerance: float
+    volume: float
+    area: float
+    sizes: List[float] = field(default_factory=list)
+    tets: List[int] = field(default_factory=list)
+    size: Optional[float] = None
+
+    def add_mesh(self, size: float, tets: int):
+        """Records a mesh of the volumes. A mesh without tets is a mesh that
+        Cubit failed to make and can't be fitted to, so an error is raised."""
+        if tets == 0:
+            msg = (
+                f"volumes {format_ids(self.volume_ids)} failed to mesh with an "
+                f"element size of {size:.6g}, no tets were made"
+            )
+            raise RuntimeError(msg)
+        self.sizes.append(size)
+        self.tets.append(tets)
+
+    def within_tolerance(self) -> bool:
+        """Returns True if the last mesh is within the tolerance of the target"""
+        return bool(self.tets) and (
+            abs(self.tets[-1] - self.target_tets) <= self.tolerance * self.target_tets
+        )
+
+    def next_size(self) -> float:
+        """Returns the element size expected to give the target number of tets.
+        After one mesh the estimate of estimate_tet_count is scaled to match
+        it. After two meshes the size is interpolated on a log log scale
+        between the last two meshes."""
+        if len(self.sizes) >= 2 and self.sizes[-1] != self.sizes[-2]:
+            slope = math.log(self.tets[-1] / self.tets[-2]) / math.log(
+                self.sizes[-1] / self.sizes[-2]
+            )
+            if slope < 0:
+                return self.sizes[-1] * (self.target_tets / self.tets[-1]) ** (
+                    1 / slope
+                )
+        correction = self.tets[-1] / estimate_tet_count(
+            self.sizes[-1], self.volume, self.area
+        )
+        return estimate_element_size(
+            self.target_tets / correction, self.volume, self.area
+        )
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def count_tets(volume_ids: List[str], cubit) -> int:
+    return len(cubit.parse_cubit_list("tet", f"in volume {format_ids(volume_ids)}"))
+
+
+def fit_tet_mesh_sizes(
+    geometry_details: List[dict], cubit
+) -> Tuple[List[dict], List[TetMeshFit]]:
+    """Finds the element size of each entry whose tet_mesh is a target, a
+    dictionary with a number of "tets" or a "memory" budget in bytes and an
+    optional relative "tolerance" that defaults to 0.1. A first size is
+    estimated from the volume and surface area of the volumes and a coarse
+    trial mesh, with about an eighth of the target tets, is made and deleted.
+    The size is then fitted so the estimate matches the trial mesh. The entries
+    are not changed, the size is kept in the size of the returned fit.
+
+    Args:
+        geometry_details: the entries with their volume ids.
+        cubit: the cubit module.
+
+    Returns:
+        The entries with a tet_mesh key, with targets replaced by a Cubit size
+        instruction, and the fit of each target
+    """
+    entries_to_mesh = []
+    fits = []
+    for entry in geometry_details:
+        if "tet_mesh" not in entry:
+            continue
+        if not isinstance(entry["tet_mesh"], dict):
+            entries_to_mesh.append(entry)
+            continue
+
+        ids = format_ids(entry["volumes"])
+        volume_ids = [int(volume) for volume in entry["volumes"]]
+        fit = TetMeshFit(
+            volume_ids=[str(volume) for volume in entry["volumes"]],
+            target_tets=target_tet_count(entry["tet_mesh"]),
+            tolerance=entry["tet_mesh"].get("tolerance", 0.1),
+            volume=sum(cubit.get_volume_volume(volume) for volume in volume_ids),
+            area=sum(
+                cubit.get_surface_area(surface)
+                for volume in volume_ids
+                for surface in cubit.get_relatives("volume", volume, "surface")
+            ),
+        )
+        trial_size = estimate_element_size(
+            fit.target_tets * TRIAL_FRACTION, fit.volume, fit.area
+        )
+        cubit.cmd(f"volume {ids} scheme tetmesh proximity layers off")
+        cubit.cmd(f"volume {ids} size {trial_size:.6g}")
+        cubit.cmd(f"mesh volume {ids}")
+        fit.add_mesh(float(f"{trial_size:.6g}"), count_tets(fit.volume_ids, cubit))
+        cubit.cmd(f"delete mesh volume {ids} propagate")
+
+        fit.size = float(f"{fit.next_size():.6g}")
+        entries_to_mesh.append(dict(entry, tet_mesh=f"size {fit.size:.6g}"))
+        fits.append(fit)
+    return entries_to_mesh, fits
+
+
+def remesh_to_targets(fits: List[TetMeshFit], cubit) -> List[TetMeshFit]:
+    """Counts the tets of the meshes of entries with a target and meshes them
+    again, up to MAX_REMESHES times, with a size fitted to the meshes made so
+    far while they are outside the tolerance of their target. The final size
+    is kept in the size of each fit.
+
+    Args:
+        fits: the fits returned by fit_tet_mesh_sizes.
+        cubit: the cubit module.
+    """
+    for fit in fits:
+        fit.add_mesh(fit.size, count_tets(fit.volume_ids, cubit))
+        ids = format_ids(fit.volume_ids)
+        for _ in range(MAX_REMESHES):
+            if fit.within_tolerance():
+                break
+            size = float(f"{fit.next_size():.6g}")
+            cubit.cmd(f"delete mesh volume {ids} propagate")
+            cubit.cmd(f"volume {ids} size {size:.6g}")
+            cubit.cmd(f"mesh volume {ids}")
+            fit.add_mesh(size, count_tets(fit.volume_ids, cubit))
+            fit.size = size
+    return fits
+
+
+def set_mesh_defaults(cubit):
+    """Sets the mesh gradation and default element size that the tet meshes,
+    including the trial meshes of fit_tet_mesh_sizes, are made with"""
+    cubit.cmd("Trimesher volume gradation 1.3")
+
+    cubit.cmd("volume all size auto factor 5")
+
+
+def create_tet_mesh(geometry_details, cubit) -> List[TetMeshFit]:
+    """Tet meshes the volumes of entries with a tet_mesh key. Volumes that
+    share the same tet_mesh instruction are sized and meshed together so the
+    number of commands does not grow with the number of volumes. The sizes of
+    entries with a target number of tets or memory budget are fitted first,
+    see fit_tet_mesh_sizes, and their meshes are redone if they miss the
+    target, see remesh_to_targets. Returns the fit of each target."""
+    set_mesh_defaults(cubit)
+    entries_to_mesh, fits = fit_tet_mesh_sizes(geometry_details, cubit)
+    if not entries_to_mesh:
+        return fits
+
+    with CommandBuffer(cubit) as buffer:
+        buffer.cmd("volume all scheme tetmesh proximity layers off")
+        for entry in entries_to_mesh:
+            # this number is the size of the mesh 1 is small 10 is large
+            buffer.add("volume {ids} size auto factor 6", entry["volumes"])
+        for entry in entries_to_mesh:
+            # example entry ' size 0.5'
+            buffer.add("volume {ids} " + entry["tet_mesh"], entry["volumes"])
+        for entry in entries_to_mesh:
+            buffer.add("mesh volume {ids}", entry["volumes"])
+    return remesh_to_targets(fits, cubit)
+
+
+def find_mesh_shards(
+    geometry_details, cubit, number_of_shards: int
+) -> List[Dict[str, str]]:
+    """Splits the volumes to be tet meshed into shards that can be meshed
+    independently. Volumes that share a merged surface are kept in the same
+    shard so that the mesh on the shared surface is conformal. The groups of
+    connected volumes are then balanced across the shards by their size.
+
+    Args:
+        geometry_details: the entries with their volume ids.
+        cubit: the cubit module.
+        number_of_shards: the maximum number of shards.
+
+    Returns:
+        A list of shards, each a dictionary of volume ids mapped to the
+        tet_mesh instruction of the volume
+    """
+    tet_mesh_of_volume = {
+        str(volume): entry["tet_mesh"]
+        for entry in geometry_details
+        if "tet_mesh" in entry
+        for volume in entry["volumes"]
+    }
+
+    # union find of volumes joined by merged surfaces
+    parents = {volume: volume for volume in tet_mesh_of_volume}
+
+    def find_root(volume):
+        while parents[volume] != volume:
+            parents[volume] = parents[parents[volume]]
+            volume = parents[volume]
+        return volume
+
+    for volume in tet_mesh_of_volume:
+        for surface_id in cubit.get_relatives("volume", int(volume), "surface"):
+            for neighbour in cubit.get_relatives("surface", surface_id, "volume"):
+                neighbour = str(neighbour)
+                if neighbour in parents:
+                    parents[find_root(neighbour)] = find_root(volume)
+
+    connected_groups = {}
+    for volume in tet_mesh_of_volume:
+        connected_groups.setdefault(find_root(volume), []).append(volume)
+
+    # the largest groups are placed first, each in the currently smallest shard
+    def group_size(volumes):
+        return sum(cubit.get_volume_volume(int(volume)) for volume in volumes)
+
+    shards = [{} for _ in range(min(number_of_shards, len(connected_groups)))]
+    shard_sizes = [0.0] * len(shards)
+    for volumes in sorted(connected_groups.values(), key=group_size, reverse=True):
+        smallest = shard_sizes.index(min(shard_sizes))
+        shard_sizes[smallest] += group_size(volumes)
+        for volume in volumes:
+            shards[smallest][volume] = tet_mesh_of_volume[volume]
+    return shards
+
+
+def mesh_shard(
+    cub_filename: str,
+    tet_mesh_of_volume: Dict[str, str],
+    exo_filename: str,
+    cubit_path: str,
+    verbose: bool = False,
+) -> str:
+    """Opens a saved session, removes the volumes that are not in the shard,
+    tet meshes the shard and exports the mesh. Each volume is put in a block
+    with the same id as the volume so that the ids are kept when the shards
+    are combined. This is run in worker processes by mesh_in_parallel.
+
+    Args:
+        cub_filename: the saved session to open.
+        tet_mesh_of_volume: the volume ids of the shard mapped to their tet_mesh
+            instruction.
+        exo_filename: the filename to export the mesh of the shard to.
+        cubit_path: the path to the Cubit directory used to import Cubit from.
+        verbose: flag to control the printing of Cubit output.
+    """
+    cubit = import_cubit(cubit_path)
+    cubit.init([])
+    if not verbose:
+        cubit.cmd("set echo off")
+        cubit.cmd("set info off")
+        cubit.cmd("set journal off")
+        cubit.cmd("set warning off")
+
+    cubit.cmd(f'open "{cub_filename}"')
+    other_volumes = [
+        volume
+        for volume in cubit.parse_cubit_list("volume", "all")
+        if str(volume) not in tet_mesh_of_volume
+    ]
+    if other_volumes:
+        cubit.cmd(f"delete volume {format_ids(other_volumes)}")
+
+    create_tet_mesh(
+        [
+            {"volumes": [volume], "tet_mesh": tet_mesh}
+            for volume, tet_mesh in tet_mesh_of_volume.items()
+        ],
+        cubit,
+    )
+    for volume in tet_mesh_of_volume:
+        cubit.cmd(f"block {volume} add volume {volume}")
+    cubit.cmd(f'export mesh "{exo_filename}" overwrite')
+    cubit.cmd("reset")
+    return exo_filename
+
+
+def mesh_in_parallel(
+    geometry_details,
+    cubit,
+    cubit_path: str,
+    mesh_workers: int,
+    verbose: bool = False,
+) -> List[TetMeshFit]:
+    """Tet meshes the volumes of entries with a tet_mesh key in parallel worker
+    processes and imports the combined mesh into the current session. The
+    session is saved and each worker meshes one shard of it, see
+    find_mesh_shards. The meshes of the shards are then imported into the
+    current session so that exporting the mesh writes a single file with
+    consistent node and element numbering. The sizes of entries with a target
+    number of tets are fitted in the current session before it is saved, see
+    fit_tet_mesh_sizes, with the same mesh settings as create_tet_mesh, but
+    the meshes of the shards are not redone. Returns the fit of each target.
+
+    Args:
+        geometry_details: the entries with their volume ids.
+        cubit: the cubit module.
+        cubit_path: the path to the Cubit directory used to import Cubit from.
+        mesh_workers: the number of worker processes.
+        verbose: flag to control the printing of Cubit output.
+    """
+    set_mesh_defaults(cubit)
+    entries_to_mesh, fits = fit_tet_mesh_sizes(geometry_details, cubit)
+    shards = find_mesh_shards(entries_to_mesh, cubit, mesh_workers)
+    if not shards:
+        return fits
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cub_filename = str(Path(tmp_dir) / "session.cub")
+        cubit.cmd(f'save as "{cub_filename}" overwrite')
+
+        # each worker imports and initialises its own copy of cubit so a fresh
+        # interpreter is spawned instead of forking the current process
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=len(shards), mp_context=context) as pool:
+            futures = [
+                pool.submit(
+                    mesh_shard,
+                    cub_filename,
+                    shard,
+                    str(Path(tmp_dir) / f"shard_{index}.exo"),
+                    cubit_path,
+                    verbose,
+                )
+                for index, shard in enumerate(shards)
+            ]
+            shard_filenames = [future.result() for future in futures]
+
+        for shard_filename in shard_filenames:
+            cubit.cmd(f'import mesh "{shard_filename}" no_geom')
+    return fits
@@ -0,0 +1,89 @@
+"""The parts of the MOAB HDF5 layout shared by the modules that read and write
+h5m files with h5py, see inspect for a description of the layout.
+"""
+
+import numpy as np
+
+# the flag of a set whose contents are kept in the order they were added
+ORDERED_BIT = 0x4
+
+# the flag of a set whose contents are stored as (start handle, count) pairs
+RANGE_BIT = 0x8
+
+# the MOAB entity types, in the order of the MOAB EntityType enum
+ENTITY_TYPES = [
+    "Vertex",
+    "Edge",
+    "Tri",
+    "Quad",
+    "Polygon",
+    "Tet",
+    "Pyramid",
+    "Prism",
+    "Knife",
+    "Hex",
+    "Polyhedron",
+    "EntitySet",
+]
+
+# the storage class of MOAB tags
+SPARSE_TAG = 1
+DENSE_TAG = 2
+
+
+def import_h5py():
+    try:
+        import h5py
+    except ImportError:
+        msg = (
+            "import h5py failed, h5py is needed to read h5m files. It can be "
+            "installed with pip install h5py"
+        )
+        raise ImportError(msg)
+    return h5py
+
+
+def expand_contents(contents: np.ndarray, flags: int) -> np.ndarray:
+    """Returns the handles in the contents of a set stored with the flags"""
+    if flags & RANGE_BIT:
+        pairs = contents.reshape(-1, 2)
+        if len(pairs) == 0:
+            return np.zeros(0, dtype=np.int64)
+        return np.concatenate(
+            [np.arange(start, start + count) for start, count in pairs.tolist()]
+        )
+    return contents
+
+
+def encode_contents(handles: np.ndarray, flags: int):
+    """Returns the contents of a set as ranges if that is shorter, and the
+    flags of the set"""
+    if flags & ORDERED_BIT or len(handles) == 0:
+        return handles, flags & ~RANGE_BIT
+    handles = np.unique(handles)
+    breaks = np.nonzero(np.diff(handles) != 1)[0]
+    starts = np.concatenate([[handles[0]], handles[breaks + 1]])
+    stops = np.concatenate([handles[breaks], [handles[-1]]]) + 1
+    if 2 * len(starts) < len(handles):
+        return np.stack([starts, stops - starts], axis=1).ravel(), flags | RANGE_BIT
+    return handles, flags & ~RANGE_BIT
+
+
+def opaque(text: str) -> np.void:
+    """Returns the text as the 32 byte opaque value of a NAME or CATEGORY tag"""
+    return np.void(text.encode("ascii").ljust(32, b"\x00"))
+
+
+def write_tag(
+    tstt, name: str, type_, storage: int, handles=None, values=None, is_handle=False
+):
+    """Writes the definition of a MOAB tag and its values for the handles,
+    as a sparse tag when handles are provided"""
+    group = tstt.create_group(f"tags/{name}")
+    group.attrs["class"] = storage
+    group["type"] = np.dtype(type_)
+    if is_handle:
+        group.attrs["is_handle"] = 1
+    if handles is not None:
+        group.create_dataset("id_list", data=np.asarray(handles, dtype=np.int64))
+        group.create_dataset("values", data=values)
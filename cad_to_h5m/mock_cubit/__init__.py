@@ -0,0 +1,46 @@
+import importlib.util
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+
+from .cubit import read_state
+
+# passing this as the cubit_path makes "import cubit" find the mock cubit
+# module in processes that have not already imported cubit
+MOCK_CUBIT_PATH = str(Path(__file__).parent)
+
+
+@contextmanager
+def use_mock_cubit(planning: bool = False):
+    """Makes "import cubit" return a fresh mock cubit module within the context,
+    whichever cubit_path is used. Any previously imported cubit module is
+    restored afterwards.
+
+    Args:
+        planning: flag to control if the CAD files are read and the outputs
+            written, when set each import makes a single placeholder volume
+            and nothing is exported.
+
+    Yields:
+        the mock cubit module, which can be inspected for the commands sent and
+        the simulated volumes, surfaces and groups.
+    """
+    previous_cubit = sys.modules.get("cubit")
+    spec = importlib.util.spec_from_file_location(
+        "cubit", Path(MOCK_CUBIT_PATH) / "cubit.py"
+    )
+    mock_cubit = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mock_cubit)
+    mock_cubit.planning = planning
+    sys.modules["cubit"] = mock_cubit
+    try:
+        yield mock_cubit
+    finally:
+        # cubit_path=MOCK_CUBIT_PATH adds the folder to sys.path, which would
+        # hide a real cubit module found later in sys.path
+        while MOCK_CUBIT_PATH in sys.path:
+            sys.path.remove(MOCK_CUBIT_PATH)
+        if previous_cubit is None:
+            sys.modules.pop("cubit", None)
+        else:
+            sys.modules["cubit"] = previous_cubit
@@ -0,0 +1,708 @@
+"""A pure Python stand in for the cubit module. Commands are recorded and the
+geometry is simulated with boxes so that the orchestration of a conversion can
+be tested and benchmarked without a Cubit license. Each body found in an
+imported CAD file becomes a unit cube volume with six planar surfaces. Bodies
+are counted from the MANIFOLD_SOLID_BREP entries of STEP files and the body
+records of SAT files, STL files contain a single body. Exported h5m files use
+the MOAB layout with each surface faceted into a grid of triangles that gets
+finer with smaller faceting tolerances. Tet meshed volumes are split into
+slabs along x of six tets each, with nodes numbered in order of volume id.
+
+When planning is set the CAD files are not read, each import makes a single
+placeholder volume, and nothing is exported or saved, so a conversion can be
+planned quickly and without h5py.
+
+This file is imported as the top level cubit module by adding its folder to
+sys.path (for example cubit_path=cad_to_h5m.mock_cubit.MOCK_CUBIT_PATH) so it
+keeps all state at the module level like the real cubit module.
+"""
+
+import json
+import math
+import re
+import shlex
+from pathlib import Path
+
+commands = []
+volumes = {}
+surfaces = {}
+groups = {}
+last_ids = {"volume": 0, "surface": 0}
+mesh_sizes = {}
+tets = {}
+initialised = False
+planning = False
+
+
+class Surface:
+    def __init__(self, surface_id):
+        self.surface_id = surface_id
+
+    def id(self):
+        return self.surface_id
+
+    def is_planar(self):
+        return True
+
+    def area(self):
+        return surfaces[self.surface_id]["area"]
+
+
+class Volume:
+    def __init__(self, volume_id):
+        self.volume_id = volume_id
+
+    def id(self):
+        return self.volume_id
+
+    def volume(self):
+        return get_volume_volume(self.volume_id)
+
+
+def init(args):
+    global initialised
+    initialised = True
+    _reset()
+    commands.clear()
+
+
+def _reset():
+    volumes.clear()
+    surfaces.clear()
+    groups.clear()
+    mesh_sizes.clear()
+    tets.clear()
+    last_ids["volume"] = 0
+    last_ids["surface"] = 0
+
+
+def _count_bodies(filename, import_type):
+    if import_type == "stl":
+        return 1
+    with open(filename, errors="ignore") as infile:
+        contents = infile.read()
+    if import_type == "step":
+        count = contents.count("MANIFOLD_SOLID_BREP") + contents.count(
+            "BREP_WITH_VOIDS"
+        )
+    else:
+        count = len(re.findall(r"^body\b", contents, flags=re.MULTILINE))
+    return max(count, 1)
+
+
+def _add_volume(bounding_box):
+    last_ids["volume"] += 1
+    volume_id = last_ids["volume"]
+    surface_ids = []
+    for _ in range(6):
+        last_ids["surface"] += 1
+        surface_ids.append(last_ids["surface"])
+    _set_bounding_box(volume_id, bounding_box, surface_ids)
+    return volume_id
+
+
+def _set_bounding_box(volume_id, bounding_box, surface_ids):
+    """Sets the box of a volume and the position and size of its six
+    surfaces"""
+    xmin, ymin, zmin, xmax, ymax, zmax = bounding_box
+    centre = [(xmin + xmax) / 2, (ymin + ymax) / 2, (zmin + zmax) / 2]
+    size = [xmax - xmin, ymax - ymin, zmax - zmin]
+    surface_index = 0
+    for axis in range(3):
+        for direction in [-1, 1]:
+            normal = [0.0, 0.0, 0.0]
+            normal[axis] = float(direction)
+            centroid = list(centre)
+            centroid[axis] += direction * size[axis] / 2
+            other_axes = [other for other in range(3) if other != axis]
+            surfaces[surface_ids[surface_index]] = {
+                "volume": volume_id,
+                "normal": normal,
+                "centroid": centroid,
+                "area": size[other_axes[0]] * size[other_axes[1]],
+            }
+            surface_index += 1
+    volumes[volume_id] = {
+        **volumes.get(volume_id, {}),
+        "bounding_box": list(bounding_box),
+        "surfaces": surface_ids,
+    }
+
+
+def _reflect_box(bounding_box, axis):
+    """Returns the box reflected in the plane through the origin normal to the
+    x, y or z axis"""
+    index = "xyz".index(axis)
+    reflected = list(bounding_box)
+    reflected[index] = -bounding_box[index + 3]
+    reflected[index + 3] = -bounding_box[index]
+    return reflected
+
+
+def _intersect_boxes(first, second):
+    """Returns the overlap of two volumes as a box or None if they do not
+    overlap. Reflected volumes stand in for parts without mirror symmetry so a
+    reflected volume only fills half of the box it shares with an unreflected
+    volume."""
+    box = [
+        max(first["bounding_box"][axis], second["bounding_box"][axis])
+        for axis in range(3)
+    ]
+    box += [
+        min(first["bounding_box"][axis], second["bounding_box"][axis])
+        for axis in range(3, 6)
+    ]
+    if any(box[axis] >= box[axis + 3] for axis in range(3)):
+        return None
+    if first.get("mirrored", False) != second.get("mirrored", False):
+        box[3] = (box[0] + box[3]) / 2
+    return box
+
+
+def _transform_box(bounding_box, options):
+    """Returns the box moved by ["move", "x", dx, "y", dy, "z", dz] or the
+    box around the rotated box for ["rotate", angle, "about", "z"]"""
+    xmin, ymin, zmin, xmax, ymax, zmax = bounding_box
+    if options[0] == "move":
+        offset = {"x": 0.0, "y": 0.0, "z": 0.0}
+        for axis, value in zip(options[1::2], options[2::2]):
+            offset[axis] = float(value)
+        delta = [offset["x"], offset["y"], offset["z"]]
+        return [value + delta[index % 3] for index, value in enumerate(bounding_box)]
+    angle = math.radians(float(options[1]))
+    corners = [(x, y) for x in (xmin, xmax) for y in (ymin, ymax)]
+    rotated = [
+        (
+            x * math.cos(angle) - y * math.sin(angle),
+            x * math.sin(angle) + y * math.cos(angle),
+        )
+        for x, y in corners
+    ]
+    xs = [round(x, 12) for x, _ in rotated]
+    ys = [round(y, 12) for _, y in rotated]
+    return [min(xs), min(ys), zmin, max(xs), max(ys), zmax]
+
+
+def _entity_type(name):
+    """Returns "volume" or "surface" for the abbreviations used in commands"""
+    if name.startswith("vol") or name == "body":
+        return "volume"
+    if name.startswith("surf"):
+        return "surface"
+    return name
+
+
+def _split_ids(tokens, entity_type="volume"):
+    """Returns the ids at the start of a list of tokens, such as ["1", "to",
+    "3", "7", "scale", "2"], and the remaining tokens"""
+    if tokens and tokens[0] == "all":
+        return list(_entities(entity_type)), tokens[1:]
+    ids = []
+    index = 0
+    while index < len(tokens) and tokens[index].isdigit():
+        if index + 2 < len(tokens) and tokens[index + 1] == "to":
+            ids.extend(range(int(tokens[index]), int(tokens[index + 2]) + 1))
+            index += 3
+        else:
+            ids.append(int(tokens[index]))
+            index += 1
+    return ids, tokens[index:]
+
+
+def _parse_ids(tokens, entity_type="volume"):
+    return _split_ids(tokens, entity_type)[0]
+
+
+def _entities(entity_type):
+    if _entity_type(entity_type) == "volume":
+        return volumes
+    if _entity_type(entity_type) == "surface":
+        return surfaces
+    return {}
+
+
+def _write(filename, contents):
+    Path(filename).parents[0].mkdir(parents=True, exist_ok=True)
+    with open(filename, "w") as outfile:
+        outfile.write(contents)
+
+
+def _delete_volume(volume_id):
+    for surface_id in volumes.pop(volume_id)["surfaces"]:
+        surfaces.pop(surface_id)
+        for members in groups.values():
+            members.discard(("surface", surface_id))
+    tets.pop(volume_id, None)
+    for members in groups.values():
+        members.discard(("volume", volume_id))
+
+
+def cmd(command):
+    if not initialised:
+        raise RuntimeError("cubit.init must be called before cubit.cmd")
+    commands.append(command)
+    tokens = shlex.split(command)
+    if not tokens:
+        return True
+    keyword = tokens[0].lower()
+
+    if keyword == "reset":
+        _reset()
+    elif keyword == "import" and tokens[1] != "mesh":
+        import_type, filename = tokens[1], tokens[2]
+        bodies = 1 if planning else _count_bodies(filename, import_type)
+        for _ in range(bodies):
+            offset = last_ids["volume"]
+            _add_volume([offset, 0, 0, offset + 1, 1, 1])
+    elif keyword == "group":
+        entity_type = _entity_type(tokens[3])
+        ids = _parse_ids(tokens[4:], entity_type)
+        groups.setdefault(tokens[1], set()).update(
+            (entity_type, entity_id) for entity_id in ids
+        )
+    elif keyword in ["volume", "vol"]:
+        ids, options = _split_ids(tokens[1:])
+        if options[:1] == ["scale"]:
+            for volume_id in ids:
+                volumes[volume_id]["bounding_box"] = [
+                    value * float(options[1])
+                    for value in volumes[volume_id]["bounding_box"]
+                ]
+        elif options[:1] == ["copy"]:
+            for volume_id in ids:
+                bounding_box = volumes[volume_id]["bounding_box"]
+                if len(options) > 1:
+                    bounding_box = _transform_box(bounding_box, options[1:])
+                copy_id = _add_volume(bounding_box)
+                if volumes[volume_id].get("mirrored"):
+                    volumes[copy_id]["mirrored"] = True
+        elif options[:1] == ["reflect"]:
+            for volume_id in ids:
+                _set_bounding_box(
+                    volume_id,
+                    _reflect_box(volumes[volume_id]["bounding_box"], options[1]),
+                    volumes[volume_id]["surfaces"],
+                )
+                volumes[volume_id]["mirrored"] = not volumes[volume_id].get(
+                    "mirrored", False
+                )
+        elif options[:1] in [["move"], ["rotate"]]:
+            for volume_id in ids:
+                _set_bounding_box(
+                    volume_id,
+                    _transform_box(volumes[volume_id]["bounding_box"], options),
+                    volumes[volume_id]["surfaces"],
+                )
+        elif options[:1] == ["size"] and options[1] != "auto":
+            for volume_id in ids:
+                mesh_sizes[volume_id] = float(options[1])
+    elif keyword == "intersect":
+        ids = _parse_ids(tokens[2:])
+        box = _intersect_boxes(volumes[ids[0]], volumes[ids[1]])
+        if "keep" not in tokens:
+            for volume_id in ids[:2]:
+                _delete_volume(volume_id)
+        if box is not None:
+            _add_volume(box)
+    elif keyword == "mesh" and _entity_type(tokens[1]) == "volume":
+        for volume_id in _parse_ids(tokens[2:]):
+            tets[volume_id] = _estimate_tets(volume_id)
+    elif keyword == "delete" and tokens[1] == "mesh":
+        for volume_id in _parse_ids(tokens[3:]):
+            tets.pop(volume_id, None)
+    elif keyword == "delete" and _entity_type(tokens[1]) == "volume":
+        for volume_id in _parse_ids(tokens[2:]):
+            _delete_volume(volume_id)
+    elif keyword in ["export", "save"] and planning:
+        pass
+    elif keyword == "export" and tokens[1] == "acis":
+        _write(tokens[2], "".join(f"body {volume_id}\n" for volume_id in volumes))
+    elif keyword == "export" and tokens[1] == "dagmc":
+        tolerance = 1.0e-2
+        if "faceting_tolerance" in tokens:
+            tolerance = float(tokens[tokens.index("faceting_tolerance") + 1])
+        _write_dagmc(tokens[2], tolerance)
+    elif keyword == "import" and tokens[1] == "mesh":
+        with open(tokens[2]) as infile:
+            tets.update(
+                {int(key): value for key, value in json.load(infile)["tets"].items()}
+            )
+    elif keyword == "export" and tokens[1] == "mesh":
+        _write(tokens[2], json.dumps({"tets": tets}))
+    elif keyword == "save":
+        _write(tokens[2], json.dumps(_state()))
+    elif keyword == "open":
+        _load_state(tokens[1])
+    elif keyword == "playback":
+        with open(tokens[1]) as infile:
+            lines = [line.rstrip("\n") for line in infile]
+        for line in lines:
+            if line.strip() and not line.startswith("#"):
+                cmd(line)
+    return True
+
+
+def _facets_per_edge(tolerance):
+    """The number of facets along each edge of a surface, finer faceting
+    tolerances give more triangles"""
+    return max(1, min(50, math.ceil(math.sqrt(1.0e-2 / tolerance))))
+
+
+def _write_dagmc(filename, tolerance):
+    """Writes a h5m file in the MOAB layout with each box surface faceted into
+    a grid of triangles. The state of the session is kept in the mock_state
+    attribute of the file."""
+    import h5py
+    import numpy as np
+
+    facets = _facets_per_edge(tolerance)
+    grid = np.linspace(0.0, 1.0, facets + 1)
+    u, v = [values.ravel() for values in np.meshgrid(grid, grid, indexing="ij")]
+    corners = np.arange(facets * (facets + 1)).reshape(facets, facets + 1)[:, :-1]
+    corners = corners.ravel()
+    grid_triangles = np.concatenate(
+        [
+            np.stack([corners, corners + facets + 1, corners + 1], axis=1),
+            np.stack([corners + 1, corners + facets + 1, corners + facets + 2], axis=1),
+        ]
+    )
+
+    surface_ids = sorted(surfaces)
+    nodes_per_surface = (facets + 1) ** 2
+    triangles_per_surface = len(grid_triangles)
+    node_count = nodes_per_surface * len(surface_ids)
+    surface_volumes = [surfaces[surface_id]["volume"] for surface_id in surface_ids]
+    boxes = np.array(
+        [volumes[volume_id]["bounding_box"] for volume_id in surface_volumes]
+    ).reshape(-1, 6)
+    normals = np.array([surfaces[surface_id]["normal"] for surface_id in surface_ids])
+    centroids = np.array(
+        [surfaces[surface_id]["centroid"] for surface_id in surface_ids]
+    ).reshape(-1, 3)
+    # the grid spans the box in the two directions perpendicular to the normal
+    in_plane = np.abs(normals.reshape(-1, 3)) < 0.5
+    first = np.argmax(in_plane, axis=1)
+    second = 2 - np.argmax(in_plane[:, ::-1], axis=1)
+    points = np.repeat(centroids[:, np.newaxis, :], len(u), axis=1)
+    for axis in range(3):
+        for direction, fraction in [(first, u), (second, v)]:
+            rows = direction == axis
+            lower = boxes[rows, axis, np.newaxis]
+            upper = boxes[rows, axis + 3, np.newaxis]
+            points[rows, :, axis] = lower + fraction * (upper - lower)
+    coordinates = points.reshape(-1, 3)
+    node_starts = np.arange(len(surface_ids)) * nodes_per_surface
+    connectivity = (
+        grid_triangles[np.newaxis] + node_starts[:, np.newaxis, np.newaxis] + 1
+    ).reshape(-1, 3)
+
+    # handles are numbered nodes first, then triangles, then sets
+    triangle_start = node_count + 1
+    set_start = triangle_start + len(connectivity)
+    surface_handles = {
+        surface_id: set_start + index for index, surface_id in enumerate(surface_ids)
+    }
+    volume_ids = sorted(volumes)
+    volume_handles = {
+        volume_id: set_start + len(surface_ids) + index
+        for index, volume_id in enumerate(volume_ids)
+    }
+    group_names = sorted(groups)
+
+    contents, children, flags, categories, global_ids = [], [], [], [], []
+    for index, surface_id in enumerate(surface_ids):
+        contents.append(
+            [
+                index * nodes_per_surface + 1,
+                nodes_per_surface,
+                triangle_start + index * triangles_per_surface,
+                triangles_per_surface,
+            ]
+        )
+        children.append([])
+        flags.append(0x8)
+        categories.append("Surface")
+        global_ids.append(surface_id)
+    for volume_id in volume_ids:
+        contents.append([])
+        children.append(
+            [
+                surface_handles[surface_id]
+                for surface_id in volumes[volume_id]["surfaces"]
+            ]
+        )
+        flags.append(0)
+        categories.append("Volume")
+        global_ids.append(volume_id)
+    for index, name in enumerate(group_names):
+        handles = {"volume": volume_handles, "surface": surface_handles}
+        contents.append(
+            sorted(
+                handles[entity_type][entity_id]
+                for entity_type, entity_id in groups[name]
+                if entity_id in handles[entity_type]
+            )
+        )
+        children.append([])
+        flags.append(0)
+        categories.append("Group")
+        global_ids.append(index + 1)
+
+    set_list = np.zeros((len(contents), 4), dtype=np.int64)
+    set_list[:, 0] = np.cumsum([len(values) for values in contents]) - 1
+    set_list[:, 1] = np.cumsum([len(values) for values in children]) - 1
+    set_list[:, 2] = -1
+    set_list[:, 3] = flags
+
+    def opaque(text):
+        return np.void(text.encode("ascii").ljust(32, b"\x00"))
+
+    Path(filename).parents[0].mkdir(parents=True, exist_ok=True)
+    with h5py.File(filename, "w") as h5m_file:
+        h5m_file.attrs["mock_state"] = json.dumps(_state())
+        dataset = h5m_file.create_dataset("tstt/nodes/coordinates", data=coordinates)
+        dataset.attrs["start_id"] = 1
+        dataset = h5m_file.create_dataset(
+            "tstt/elements/Tri3/connectivity", data=connectivity
+        )
+        dataset.attrs["start_id"] = triangle_start
+        dataset = h5m_file.create_dataset("tstt/sets/list", data=set_list)
+        dataset.attrs["start_id"] = set_start
+        for table, values in [("contents", contents), ("children", children)]:
+            h5m_file.create_dataset(
+                f"tstt/sets/{table}",
+                data=np.array([value for row in values for value in row], np.int64),
+            )
+        h5m_file.create_dataset("tstt/sets/parents", data=np.zeros(0, np.int64))
+        h5m_file.create_dataset("tstt/sets/tags/GLOBAL_ID", data=global_ids)
+        h5m_file.create_dataset(
+            "tstt/tags/CATEGORY/id_list",
+            data=np.arange(set_start, set_start + len(categories)),
+        )
+        h5m_file.create_dataset(
+            "tstt/tags/CATEGORY/values",
+            data=np.array([opaque(category) for category in categories]),
+        )
+        h5m_file.create_dataset(
+            "tstt/tags/NAME/id_list",
+            data=np.arange(len(group_names), dtype=np.int64)
+            + set_start
+            + len(surface_ids)
+            + len(volume_ids),
+        )
+        h5m_file.create_dataset(
+            "tstt/tags/NAME/values",
+            data=np.array([opaque(name) for name in group_names], dtype="V32"),
+        )
+
+
+def _estimate_tets(volume_id):
+    size = mesh_sizes.get(volume_id, 0.2)
+    # the number of regular tets with an edge length of size that fill the box,
+    # rounded to whole slabs of six tets
+    estimate = 6 * math.sqrt(2) * get_volume_volume(volume_id) / size**3
+    return 6 * max(1, round(estimate / 6))
+
+
+# the corners of the six tets of a slab that share its diagonal, with the
+# corners numbered x + 2 * y + 4 * z
+_SLAB_TETS = [
+    (0, 1, 3, 7),
+    (0, 1, 5, 7),
+    (0, 2, 3, 7),
+    (0, 2, 6, 7),
+    (0, 4, 5, 7),
+    (0, 4, 6, 7),
+]
+
+
+def _tet_layout():
+    """Returns the first node and tet ids of each meshed volume"""
+    layout = {}
+    node_start = 1
+    tet_start = 1
+    for volume_id in sorted(tets):
+        layout[volume_id] = (node_start, tet_start)
+        node_start += 4 * (tets[volume_id] // 6 + 1)
+        tet_start += tets[volume_id]
+    return layout
+
+
+def _state():
+    return {
+        "volumes": volumes,
+        "surfaces": surfaces,
+        "groups": {name: sorted(members) for name, members in groups.items()},
+        "last_ids": last_ids,
+        "tets": tets,
+    }
+
+
+def read_state(filename):
+    """Returns the state saved in a cub file or exported to a h5m file"""
+    if Path(filename).suffix == ".h5m":
+        import h5py
+
+        with h5py.File(filename, "r") as h5m_file:
+            return json.loads(h5m_file.attrs["mock_state"])
+    with open(filename) as infile:
+        return json.load(infile)
+
+
+def _load_state(filename):
+    state = read_state(filename)
+    _reset()
+    volumes.update({int(key): value for key, value in state["volumes"].items()})
+    surfaces.update({int(key): value for key, value in state["surfaces"].items()})
+    groups.update(
+        {
+            name: set((entity_type, entity_id) for entity_type, entity_id in members)
+            for name, members in state["groups"].items()
+        }
+    )
+    last_ids.update(state["last_ids"])
+    tets.update({int(key): value for key, value in state["tets"].items()})
+
+
+def parse_cubit_list(entity_type, query):
+    query = query.strip()
+    if query == "all":
+        return tuple(sorted(_entities(entity_type)))
+    tokens = query.split()
+    if tokens[0] == "in":
+        owner_type = _entity_type(tokens[1])
+        owner_ids = _parse_ids(tokens[2:], owner_type)
+        if entity_type == "surface" and owner_type == "volume":
+            return tuple(
+                surface_id
+                for volume_id in owner_ids
+                for surface_id in volumes[volume_id]["surfaces"]
+            )
+        if entity_type == "vertex" and owner_type == "surface":
+            # each box face has four corners, numbered by surface
+            return tuple(
+                surface_id * 4 + corner
+                for surface_id in owner_ids
+                for corner in range(4)
+            )
+        if entity_type == "tet" and owner_type == "volume":
+            return tuple(range(sum(tets.get(volume_id, 0) for volume_id in owner_ids)))
+    # like Cubit, ids of entities that do not exist are left out
+    return tuple(
+        entity_id
+        for entity_id in _parse_ids(tokens, entity_type)
+        if entity_id in _entities(entity_type)
+    )
+
+
+def surface(surface_id):
+    return Surface(surface_id)
+
+
+def volume(volume_id):
+    return Volume(volume_id)
+
+
+def get_relatives(source_type, source_id, target_type):
+    if _entity_type(source_type) == "surface" and target_type == "vertex":
+        return parse_cubit_list("vertex", f"in surface {source_id}")
+    if _entity_type(source_type) == "volume" and _entity_type(target_type) == "surface":
+        return tuple(volumes[source_id]["surfaces"])
+    if _entity_type(source_type) == "surface" and _entity_type(target_type) == "volume":
+        return (surfaces[source_id]["volume"],)
+    return ()
+
+
+def get_last_id(entity_type):
+    return last_ids.get(entity_type, 0)
+
+
+def get_volume_count():
+    return len(volumes)
+
+
+def get_surface_count():
+    return len(surfaces)
+
+
+def get_tri_count():
+    return 0
+
+
+def get_tet_count():
+    return sum(tets.values())
+
+
+def get_volume_tets(volume_id):
+    if volume_id not in tets:
+        return ()
+    tet_start = _tet_layout()[volume_id][1]
+    return tuple(range(tet_start, tet_start + tets[volume_id]))
+
+
+def get_block_tets(block_id):
+    # the meshes of shards are put in blocks with the ids of their volumes
+    return get_volume_tets(block_id)
+
+
+def get_connectivity(entity_type, entity_id):
+    for volume_id, (node_start, tet_start) in _tet_layout().items():
+        if tet_start <= entity_id < tet_start + tets[volume_id]:
+            slab, tet = divmod(entity_id - tet_start, 6)
+            return tuple(
+                node_start + 4 * (slab + corner % 2) + corner // 2
+                for corner in _SLAB_TETS[tet]
+            )
+    return ()
+
+
+def get_nodal_coordinates(node_id):
+    for volume_id, (node_start, _) in _tet_layout().items():
+        slabs = tets[volume_id] // 6
+        if node_start <= node_id < node_start + 4 * (slabs + 1):
+            plane, corner = divmod(node_id - node_start, 4)
+            xmin, ymin, zmin, xmax, ymax, zmax = volumes[volume_id]["bounding_box"]
+            return (
+                xmin + (xmax - xmin) * plane / slabs,
+                (ymin, ymax)[corner % 2],
+                (zmin, zmax)[corner // 2],
+            )
+    return ()
+
+
+def get_volume_volume(volume_id):
+    xmin, ymin, zmin, xmax, ymax, zmax = volumes[volume_id]["bounding_box"]
+    return (xmax - xmin) * (ymax - ymin) * (zmax - zmin)
+
+
+def get_surface_area(surface_id):
+    return surfaces[surface_id]["area"]
+
+
+def get_surface_normal(surface_id):
+    return tuple(surfaces[surface_id]["normal"])
+
+
+def get_center_point(entity_type, entity_id):
+    if entity_type == "surface":
+        return tuple(surfaces[entity_id]["centroid"])
+    xmin, ymin, zmin, xmax, ymax, zmax = volumes[entity_id]["bounding_box"]
+    return ((xmin + xmax) / 2, (ymin + ymax) / 2, (zmin + zmax) / 2)
+
+
+def get_bounding_box(entity_type, entity_id):
+    """Returns the bounding box in the same layout as Cubit, [xmin, xmax,
+    xrange, ymin, ymax, yrange, zmin, zmax, zrange, diagonal]"""
+    xmin, ymin, zmin, xmax, ymax, zmax = volumes[entity_id]["bounding_box"]
+    return [
+        xmin,
+        xmax,
+        xmax - xmin,
+        ymin,
+        ymax,
+        ymax - ymin,
+        zmin,
+        zmax,
+        zmax - zmin,
+        math.dist((xmin, ymin, zmin), (xmax, ymax, zmax)),
+    ]
@@ -0,0 +1,82 @@
+import copy
+from inspect import signature
+from typing import List
+
+from .mock_cubit import use_mock_cubit
+
+# the arguments that name files written by the conversion
+OUTPUT_ARGUMENTS = [
+    "h5m_filename",
+    "cubit_filename",
+    "exo_filename",
+    "geometry_details_filename",
+    "geometry_index_filename",
+    "mesh_h5m_filename",
+    "mesh_vtu_filename",
+]
+
+
+def plan(files_with_tags: List[dict], **kwargs) -> List[str]:
+    """Validates the entries and arguments of a conversion without importing
+    Cubit and returns the Cubit commands that cad_to_h5m would run, in order.
+    This is the same as calling cad_to_h5m with dry_run=True.
+
+    Args:
+        files_with_tags: the entries passed to cad_to_h5m.
+        kwargs: the other arguments of cad_to_h5m.
+    """
+    # imported here as core imports this module when planning
+    from .core import cad_to_h5m
+
+    kwargs["dry_run"] = True
+    return cad_to_h5m(files_with_tags, **kwargs)
+
+
+def record_commands(**arguments) -> List[str]:
+    """Runs the Cubit stages of the conversion against the mock Cubit module in
+    planning mode and returns the commands it was sent. The CAD files are not
+    read and nothing is exported, so no files are written, Cubit and h5py are
+    never imported and the plan takes milliseconds.
+
+    Each CAD file is planned as a single placeholder volume, so the volume and
+    surface ids in the commands are placeholders for the ids Cubit gives the
+    bodies it imports and the unite of files with several bodies is not
+    shown. The caches, the incremental and checkpoint folders, the journal
+    and the profile are not used as they would read or write files and the
+    worker pools are not started, so the plan is of a full conversion in a
+    single process. A faceting search, see search_faceting_tolerance, is
+    planned as a single export at the faceting_tolerance and the geometry
+    details, index and tet mesh files, which are written without Cubit, are
+    left out. A conversion without Cubit sends no commands.
+
+    Args:
+        arguments: the arguments of cad_to_h5m, which have already been
+            validated.
+    """
+    # imported here as core imports this module when planning
+    from .core import Converter
+
+    if arguments["cubit_free"]:
+        return []
+
+    convert_parameters = signature(Converter.convert).parameters
+    convert_arguments = {
+        name: value for name, value in arguments.items() if name in convert_parameters
+    }
+    convert_arguments["files_with_tags"] = copy.deepcopy(arguments["files_with_tags"])
+    convert_arguments.update(
+        incremental_dir=None,
+        mesh_workers=1,
+        faceting_workers=1,
+        geometry_details_filename=None,
+        geometry_index_filename=None,
+        mesh_h5m_filename=None,
+        mesh_vtu_filename=None,
+    )
+
+    with use_mock_cubit(planning=True):
+        converter = Converter(
+            verbose=arguments["verbose"], record_commands=True, dry_run=True
+        )
+        converter.convert(**convert_arguments)
+        return list(converter.cubit.commands)
@@ -0,0 +1,159 @@
+import hashlib
+import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .cache import hash_file
+from .utils import find_import_type, import_cubit
+
+
+def preprocessed_key(cad_filename: str, scale: Optional[float], autoheal: bool) -> str:
+    """Returns the key that identifies the preprocessed version of a CAD file.
+    The key combines the file contents with the scale and autoheal settings
+    as these change the preprocessed geometry.
+
+    Args:
+        cad_filename: the filename of the CAD file.
+        scale: the scale applied to the geometry or None if not scaled.
+        autoheal: flag to control if the geometry is autohealed.
+    """
+    description = json.dumps(
+        {
+            "cad_file_hash": hash_file(cad_filename),
+            "scale": scale,
+            "autoheal": autoheal,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(description.encode()).hexdigest()
+
+
+def preprocessed_file_key(entry: dict) -> Tuple[str, Optional[float]]:
+    """Returns the key of an entry in the dictionary returned by
+    preprocess_files. The same CAD file at different scales has different
+    preprocessed files so the scale is part of the key."""
+    return entry["cad_filename"], entry.get("scale")
+
+
+def preprocess_file(
+    cad_filename: str,
+    sat_filename: str,
+    scale: Optional[float],
+    autoheal: bool,
+    cubit_path: str,
+    verbose: bool = False,
+) -> str:
+    """Imports, unites, validates, scales and optionally heals a single CAD
+    file in its own Cubit session and saves the result as an ACIS sat file.
+    This is run in worker processes by preprocess_files.
+
+    Args:
+        cad_filename: the filename of the CAD file to preprocess.
+        sat_filename: the filename of the sat file to save the result to.
+        scale: the scale to apply to the geometry or None to leave unscaled.
+        autoheal: flag to control if the geometry is autohealed.
+        cubit_path: the path to the Cubit directory used to import Cubit from.
+        verbose: flag to control the printing of Cubit output.
+    """
+    cubit = import_cubit(cubit_path)
+    cubit.init([])
+    if not verbose:
+        cubit.cmd("set echo off")
+        cubit.cmd("set info off")
+        cubit.cmd("set journal off")
+        cubit.cmd("set warning off")
+
+    import_type = find_import_type(cad_filename)
+    cubit.cmd(
+        f'import {import_type} "{cad_filename}" '
+        "separate_bodies no_surfaces no_curves no_vertices "
+    )
+    vols = list(map(str, cubit.parse_cubit_list("volume", "all")))
+    if len(vols) > 1:
+        cubit.cmd("unite vol " + " ".join(vols) + " with vol " + " ".join(vols))
+    cubit.cmd("separate body all")
+    cubit.cmd("validate vol all")
+    if scale is not None:
+        cubit.cmd(f"volume all scale {scale}")
+    if autoheal:
+        cubit.cmd("healer autoheal vol all")
+
+    Path(sat_filename).parents[0].mkdir(parents=True, exist_ok=True)
+    # writes to a temporary file first so that a failed export never leaves
+    # an incomplete file in the cache
+    tmp_filename = str(Path(sat_filename).with_suffix(".tmp.sat"))
+    cubit.cmd(f'export acis "{tmp_filename}" overwrite')
+    Path(tmp_filename).replace(sat_filename)
+    cubit.cmd("reset")
+    return sat_filename
+
+
+def preprocess_files(
+    files_with_tags: List[dict],
+    cache_dir: str,
+    cubit_path: str,
+    autoheal: bool,
+    max_workers: Optional[int] = None,
+    verbose: bool = False,
+) -> Dict[Tuple[str, Optional[float]], str]:
+    """Finds or creates the preprocessed sat file for each STEP and SAT file in
+    files_with_tags. Files that are not already in the cache are preprocessed
+    in parallel worker processes, each with its own Cubit session. STL files
+    are not preprocessed as facet based geometry can't be saved in the sat
+    format.
+
+    Args:
+        files_with_tags: the entries passed to cad_to_h5m.
+        cache_dir: the folder used to store the preprocessed sat files.
+        cubit_path: the path to the Cubit directory used to import Cubit from.
+        autoheal: flag to control if the geometry is autohealed.
+        max_workers: the maximum number of worker processes. Defaults to the
+            number of processors on the machine.
+        verbose: flag to control the printing of additional details.
+
+    Returns:
+        A dictionary of the (cad_filename, scale) of entries, see
+        preprocessed_file_key, mapped to preprocessed sat filenames
+    """
+    preprocessed_files = {}
+    misses = {}
+    for entry in files_with_tags:
+        cad_filename = entry["cad_filename"]
+        if find_import_type(cad_filename) == "stl":
+            continue
+        scale = entry.get("scale")
+        key = preprocessed_key(cad_filename, scale, autoheal)
+        sat_filename = str(Path(cache_dir) / f"{key}.sat")
+        preprocessed_files[preprocessed_file_key(entry)] = sat_filename
+        if not Path(sat_filename).is_file():
+            misses[sat_filename] = (cad_filename, scale)
+
+    if verbose:
+        print(
+            f"{len(preprocessed_files) - len(misses)} preprocessed files found "
+            f"in cache, preprocessing {len(misses)} files"
+        )
+
+    if misses:
+        # each worker imports and initialises its own copy of cubit so a fresh
+        # interpreter is spawned instead of forking the current process
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as pool:
+            futures = [
+                pool.submit(
+                    preprocess_file,
+                    cad_filename,
+                    sat_filename,
+                    scale,
+                    autoheal,
+                    cubit_path,
+                    verbose,
+                )
+                for sat_filename, (cad_filename, scale) in misses.items()
+            ]
+            for future in futures:
+                future.result()
+
+    return preprocessed_files
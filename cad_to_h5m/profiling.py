@@ -0,0 +1,129 @@
+import json
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from .inspect import count_triangles
+
+try:
+    import resource
+except ImportError:
+    # the resource module is not available on Windows
+    resource = None
+
+
+def peak_rss() -> Optional[int]:
+    """Returns the peak resident set size of the process in bytes or None if
+    it can't be measured on this platform"""
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    if sys.platform == "darwin":
+        return max_rss
+    return max_rss * 1024
+
+
+def count_h5m_triangles(h5m_filename: str) -> Optional[int]:
+    """Returns the number of triangles in a DAGMC h5m file or None if h5py is
+    not installed or the file can't be read"""
+    try:
+        return count_triangles(h5m_filename)
+    except (ImportError, OSError, KeyError):
+        return None
+
+
+@dataclass
+class StageRecord:
+    """The measurements made for a single stage of a conversion
+
+    Args:
+        name: the name of the stage.
+        wall_time: the wall time of the stage in seconds.
+        peak_rss: the peak resident set size of the process in bytes at the
+            end of the stage.
+        command_count: the number of commands sent to Cubit during the stage.
+        volumes: the number of volumes in the Cubit session after the stage.
+        surfaces: the number of surfaces in the Cubit session after the stage.
+        triangles: the number of triangles after the stage. This is the number
+            of triangles in the exported h5m file for the export stage.
+        tets: the number of tets in the Cubit session after the stage.
+    """
+
+    name: str
+    wall_time: float
+    peak_rss: Optional[int] = None
+    command_count: Optional[int] = None
+    volumes: Optional[int] = None
+    surfaces: Optional[int] = None
+    triangles: Optional[int] = None
+    tets: Optional[int] = None
+
+
+class ConversionReport:
+    """Records the wall time, peak memory, number of Cubit commands and entity
+    counts of each stage of a conversion.
+
+    Args:
+        callback: an optional function that is called with the StageRecord of
+            each stage as soon as the stage finishes.
+    """
+
+    def __init__(self, callback: Optional[Callable[[StageRecord], None]] = None):
+        self.callback = callback
+        self.stages: List[StageRecord] = []
+        # other results of the conversion, such as the clusters of volumes
+        self.details: Dict[str, dict] = {}
+
+    @contextmanager
+    def stage(self, name: str, cubit=None, h5m_filename: Optional[str] = None):
+        """Measures the stage run within the context.
+
+        Args:
+            name: the name of the stage.
+            cubit: the cubit module used to count the entities after the stage.
+                If it counts commands (see CountingCubit) the number of commands
+                sent during the stage is also recorded.
+            h5m_filename: the h5m file written by the stage, used to count the
+                exported triangles.
+        """
+        start_command_count = getattr(cubit, "command_count", None)
+        start_time = time.perf_counter()
+        yield
+        record = StageRecord(
+            name=name,
+            wall_time=time.perf_counter() - start_time,
+            peak_rss=peak_rss(),
+        )
+        if start_command_count is not None:
+            record.command_count = cubit.command_count - start_command_count
+        if cubit is not None:
+            record.volumes = cubit.get_volume_count()
+            record.surfaces = cubit.get_surface_count()
+            record.triangles = cubit.get_tri_count()
+            record.tets = cubit.get_tet_count()
+        if h5m_filename is not None:
+            record.triangles = count_h5m_triangles(h5m_filename)
+        self.stages.append(record)
+        if self.callback is not None:
+            self.callback(record)
+
+    @property
+    def total_wall_time(self) -> float:
+        return sum(record.wall_time for record in self.stages)
+
+    def to_dict(self) -> dict:
+        return {
+            "total_wall_time": self.total_wall_time,
+            "stages": [asdict(record) for record in self.stages],
+            "details": self.details,
+        }
+
+    def write(self, filename: str):
+        """Saves the report as a JSON file"""
+        Path(filename).parents[0].mkdir(parents=True, exist_ok=True)
+        with open(filename, "w") as outfile:
+            json.dump(self.to_dict(), outfile, indent=4)
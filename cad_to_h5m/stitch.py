@@ -0,0 +1,325 @@
+"""Combines the surfaces of DAGMC h5m files exported from the same Cubit
+session at different faceting tolerances into a single h5m file.
+
+The file exported at the finest tolerance is used as the base. The triangles
+and vertices of the chosen surfaces are replaced with those of the same
+surfaces, matched by their GLOBAL_ID, in the other files. The entity sets keep
+their handles so set handles stored in tags, such as the surface senses, are
+unchanged. The nodes and triangles are given new handles after the sets.
+"""
+
+import shutil
+import subprocess
+from typing import Dict, List
+
+import numpy as np
+
+from .inspect import H5mReader, tag_value_to_str
+from .moab import encode_contents, expand_contents
+
+
+def _surface_handles(reader: H5mReader) -> Dict[int, int]:
+    """Returns the GLOBAL_ID of each surface set mapped to its handle"""
+    global_ids = reader.set_tag("GLOBAL_ID")
+    return {
+        int(global_ids[handle]): handle
+        for handle, value in reader.set_tag("CATEGORY").items()
+        if tag_value_to_str(value) == "Surface"
+    }
+
+
+def _read_sets(reader: H5mReader) -> List[np.ndarray]:
+    contents = reader.file["tstt/sets/contents"][...]
+    ends = reader.set_list[:, 0] + 1
+    starts = np.concatenate([[0], ends[:-1]])
+    return [
+        expand_contents(contents[start:end], int(flags))
+        for start, end, flags in zip(starts, ends, reader.set_list[:, 3])
+    ]
+
+
+def _copy_group(source, target, replaced: dict, group_attributes: dict):
+    """Copies a group of a h5py file, replacing the datasets whose paths are
+    in replaced with the new data and attributes, or leaving them out if the
+    replacement is None. The attributes of groups are updated from
+    group_attributes."""
+    for name, value in source.attrs.items():
+        target.attrs[name] = value
+    for name, value in group_attributes.get(source.name, {}).items():
+        target.attrs[name] = value
+    for name, item in source.items():
+        if item.name in replaced:
+            replacement = replaced[item.name]
+            if replacement is None:
+                continue
+            data, attributes = replacement
+            dataset = target.create_dataset(name, data=data)
+            for attribute, value in item.attrs.items():
+                dataset.attrs[attribute] = value
+            for attribute, value in attributes.items():
+                dataset.attrs[attribute] = value
+        elif hasattr(item, "items"):
+            _copy_group(item, target.create_group(name), replaced, group_attributes)
+        else:
+            source.copy(item, target, name=name)
+
+
+def stitch_surfaces(
+    base_filename: str,
+    replacements: Dict[str, List[int]],
+    output_filename: str,
+):
+    """Writes a h5m file with the surfaces of base_filename, except for the
+    surfaces listed in replacements which are taken from other h5m files
+    exported from the same session.
+
+    Args:
+        base_filename: the h5m file providing the entity sets and the facets of
+            the surfaces that are not replaced.
+        replacements: the filenames of other h5m files mapped to the surface
+            ids (the GLOBAL_ID of the surface sets) to take from that file.
+        output_filename: the filename of the combined h5m file.
+    """
+    with H5mReader(base_filename) as base:
+        h5py_file = base.file
+        tstt = h5py_file["tstt"]
+        surface_handles = _surface_handles(base)
+        set_contents = _read_sets(base)
+        coordinates = tstt["nodes/coordinates"][...]
+        connectivity = tstt["elements/Tri3/connectivity"][...]
+        node_end = base.node_start + base.node_count
+        tri_end = base.tri_start + base.tri_count
+
+        def is_node(handles):
+            return (handles >= base.node_start) & (handles < node_end)
+
+        def is_tri(handles):
+            return (handles >= base.tri_start) & (handles < tri_end)
+
+        # the facets of each replacement surface with its node handles
+        # numbered from zero
+        new_surfaces = {}
+        new_coordinates = []
+        new_connectivity = []
+        node_offset = 0
+        tri_offset = 0
+        for filename, surface_ids in replacements.items():
+            with H5mReader(filename) as source:
+                source_surfaces = _surface_handles(source)
+                source_contents = source.file["tstt/sets/contents"]
+                source_nodes = source.file["tstt/nodes/coordinates"]
+                source_tris = source.file["tstt/elements/Tri3/connectivity"]
+                for surface_id in surface_ids:
+                    if surface_id not in surface_handles:
+                        msg = f"surface {surface_id} was not found in {base_filename}"
+                        raise ValueError(msg)
+                    if surface_id not in source_surfaces:
+                        msg = f"surface {surface_id} was not found in {filename}"
+                        raise ValueError(msg)
+                    handle = source_surfaces[surface_id]
+                    index = handle - source.set_start
+                    start = 0 if index == 0 else int(source.set_list[index - 1, 0]) + 1
+                    handles = expand_contents(
+                        source_contents[start : int(source.set_list[index, 0]) + 1],
+                        int(source.set_list[index, 3]),
+                    )
+                    tris = handles[
+                        (handles >= source.tri_start)
+                        & (handles < source.tri_start + source.tri_count)
+                    ]
+                    triangles = source_tris[np.sort(tris - source.tri_start)]
+                    nodes = handles[
+                        (handles >= source.node_start)
+                        & (handles < source.node_start + source.node_count)
+                    ]
+                    nodes = np.union1d(nodes, triangles.ravel())
+                    new_coordinates.append(source_nodes[nodes - source.node_start])
+                    new_connectivity.append(
+                        np.searchsorted(nodes, triangles) + node_offset
+                    )
+                    new_surfaces[surface_handles[surface_id]] = (
+                        np.arange(len(nodes)) + node_offset,
+                        np.arange(len(triangles)) + tri_offset,
+                    )
+                    node_offset += len(nodes)
+                    tri_offset += len(triangles)
+
+        # the triangles of the replaced surfaces are removed along with the
+        # nodes that are no longer used by any element or set
+        keep_tris = np.ones(base.tri_count, dtype=bool)
+        for handle in new_surfaces:
+            contents = set_contents[handle - base.set_start]
+            keep_tris[contents[is_tri(contents)] - base.tri_start] = False
+            set_contents[handle - base.set_start] = contents[
+                ~is_tri(contents) & ~is_node(contents)
+            ]
+
+        used_nodes = np.zeros(base.node_count, dtype=bool)
+        used_nodes[connectivity[keep_tris].ravel() - base.node_start] = True
+        other_elements = {}
+        for name, group in tstt["elements"].items():
+            if name != "Tri3":
+                other_elements[name] = group["connectivity"][...]
+                used_nodes[other_elements[name].ravel() - base.node_start] = True
+        for contents in set_contents:
+            used_nodes[contents[is_node(contents)] - base.node_start] = True
+
+        # the nodes and triangles are numbered after all other entities
+        max_id = max(
+            [node_end - 1, tri_end - 1, base.set_start + len(base.set_list) - 1]
+            + [
+                int(group["connectivity"].attrs["start_id"])
+                + group["connectivity"].shape[0]
+                - 1
+                for group in tstt["elements"].values()
+            ]
+        )
+        new_node_start = max_id + 1
+        kept_node_count = int(used_nodes.sum())
+        new_tri_start = new_node_start + kept_node_count + node_offset
+        kept_tri_count = int(keep_tris.sum())
+        node_map = np.where(used_nodes, np.cumsum(used_nodes) - 1 + new_node_start, -1)
+        tri_map = np.where(keep_tris, np.cumsum(keep_tris) - 1 + new_tri_start, -1)
+
+        def remap(handles):
+            mapped = np.array(handles, dtype=np.int64)
+            nodes, tris = is_node(mapped), is_tri(mapped)
+            mapped[nodes] = node_map[mapped[nodes] - base.node_start]
+            mapped[tris] = tri_map[mapped[tris] - base.tri_start]
+            return mapped
+
+        appended_node_start = new_node_start + kept_node_count
+        appended_tri_start = new_tri_start + kept_tri_count
+
+        all_coordinates = np.concatenate(
+            [coordinates[used_nodes]] + new_coordinates
+        ).reshape(-1, 3)
+        all_connectivity = np.concatenate(
+            [remap(connectivity[keep_tris])]
+            + [
+                connectivity_ + appended_node_start
+                for connectivity_ in new_connectivity
+            ]
+        ).reshape(-1, 3)
+
+        contents_list = []
+        set_list = base.set_list.copy()
+        for index, contents in enumerate(set_contents):
+            contents = remap(contents)
+            contents = contents[contents >= 0]
+            handle = base.set_start + index
+            if handle in new_surfaces:
+                nodes, tris = new_surfaces[handle]
+                contents = np.concatenate(
+                    [contents, nodes + appended_node_start, tris + appended_tri_start]
+                )
+            encoded, set_list[index, 3] = encode_contents(
+                contents, int(set_list[index, 3])
+            )
+            contents_list.append(encoded)
+        set_list[:, 0] = np.cumsum([len(contents) for contents in contents_list]) - 1
+
+        group_attributes = {"/tstt": {"max_id": appended_tri_start + tri_offset - 1}}
+        replaced = {
+            "/tstt/nodes/coordinates": (all_coordinates, {"start_id": new_node_start}),
+            "/tstt/elements/Tri3/connectivity": (
+                all_connectivity,
+                {"start_id": new_tri_start},
+            ),
+            "/tstt/sets/list": (set_list, {}),
+            "/tstt/sets/contents": (
+                np.concatenate(contents_list).astype(np.int64),
+                {},
+            ),
+        }
+        for name, element_connectivity in other_elements.items():
+            replaced[f"/tstt/elements/{name}/connectivity"] = (
+                remap(element_connectivity),
+                {},
+            )
+        # adjacencies are recalculated by MOAB when they are missing
+        for name in ["nodes"] + [f"elements/{name}" for name in tstt["elements"]]:
+            if "adjacency" in tstt[name]:
+                replaced[f"/tstt/{name}/adjacency"] = None
+
+        # dense tags hold a value for each node or triangle, the values of the
+        # new facets are taken from the base file defaults
+        for table, keep, count in [
+            ("nodes", used_nodes, node_offset),
+            ("elements/Tri3", keep_tris, tri_offset),
+        ]:
+            if "tags" not in tstt[table]:
+                continue
+            for name, dataset in tstt[f"{table}/tags"].items():
+                values = dataset[...]
+                default = np.zeros((count,) + values.shape[1:], dtype=values.dtype)
+                replaced[dataset.name] = (
+                    np.concatenate([values[keep], default]),
+                    {},
+                )
+
+        # sparse tags are remapped, dropping the values of removed entities
+        for name, tag in tstt["tags"].items():
+            if "id_list" not in tag:
+                continue
+            id_list = remap(tag["id_list"][...])
+            kept = id_list >= 0
+            if kept.all():
+                replaced[tag["id_list"].name] = (id_list, {})
+                continue
+            if "var_indices" in tag:
+                ends = tag["var_indices"][...] + 1
+                starts = np.concatenate([[0], ends[:-1]])
+                values = tag["values"][...]
+                kept_values = [
+                    values[start:end]
+                    for start, end, keep in zip(starts, ends, kept)
+                    if keep
+                ]
+                replaced[tag["values"].name] = (
+                    np.concatenate(kept_values) if kept_values else values[:0],
+                    {},
+                )
+                replaced[tag["var_indices"].name] = (
+                    np.cumsum([len(value) for value in kept_values]) - 1,
+                    {},
+                )
+            else:
+                replaced[tag["values"].name] = (tag["values"][...][kept], {})
+            replaced[tag["id_list"].name] = (id_list[kept], {})
+
+        import h5py
+
+        with h5py.File(output_filename, "w") as output:
+            _copy_group(h5py_file, output, replaced, group_attributes)
+
+
+def find_make_watertight() -> str:
+    """Returns the path of the DAGMC make_watertight program. Surfaces exported
+    at different faceting tolerances have different facets on their shared
+    curves, so the combined file may leak unless it is resealed, and an error
+    is raised if the program is not on the PATH."""
+    make_watertight = shutil.which("make_watertight")
+    if make_watertight is None:
+        msg = (
+            "make_watertight was not found on the PATH, it is needed to make "
+            "surfaces exported at different faceting tolerances watertight. "
+            "Install DAGMC or set make_watertight=False"
+        )
+        raise FileNotFoundError(msg)
+    return make_watertight
+
+
+def seal(h5m_filename: str):
+    """Runs the DAGMC make_watertight program on the h5m file so that the
+    facets of neighbouring surfaces exported at different faceting tolerances
+    meet at their shared curves, see find_make_watertight.
+
+    Args:
+        h5m_filename: the h5m file to make watertight in place.
+    """
+    subprocess.run(
+        [find_make_watertight(), h5m_filename, "-o", h5m_filename],
+        check=True,
+        capture_output=True,
+    )
@@ -0,0 +1,413 @@
+"""Converts models made only of STL files into a DAGMC h5m file with NumPy and
+h5py, without Cubit. The triangles of an STL file are already the facets of
+the DAGMC surfaces so no import or faceting is needed.
+
+Each STL file becomes one volume. The vertices of all the files are welded
+together at the merge tolerance and triangles found in two volumes, which have
+the same three welded vertices, are kept once in a surface shared by both
+volumes, as imprinting and merging would do in Cubit. The h5m file is written
+in the MOAB HDF5 layout read by DAGMC, see inspect for a description.
+"""
+
+import itertools
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from .moab import (
+    DENSE_TAG,
+    ENTITY_TYPES,
+    SPARSE_TAG,
+    encode_contents,
+    import_h5py,
+    opaque,
+    write_tag,
+)
+
+# the layout of a facet of a binary STL file, after the 80 byte header and
+# the number of facets
+BINARY_FACET = np.dtype(
+    [("normal", "<f4", (3,)), ("vertices", "<f4", (3, 3)), ("attribute", "<u2")]
+)
+
+
+def _unique_rows(rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Returns the distinct rows of a 2D array in sorted order, the index of
+    the distinct row of each row and the number of times each distinct row is
+    found. The same as np.unique with axis=0, which sorts the rows as opaque
+    values and is many times slower.
+
+    Args:
+        rows: the 2D array.
+    """
+    order = np.lexsort(rows.T[::-1])
+    sorted_rows = rows[order]
+    first = np.ones(len(rows), dtype=bool)
+    first[1:] = (sorted_rows[1:] != sorted_rows[:-1]).any(axis=1)
+    inverse = np.empty(len(rows), dtype=np.int64)
+    inverse[order] = np.cumsum(first) - 1
+    starts = np.nonzero(first)[0]
+    return sorted_rows[starts], inverse, np.diff(np.append(starts, len(rows)))
+
+
+def read_stl(filename: str) -> np.ndarray:
+    """Returns the vertices of the triangles of a binary or ASCII STL file as
+    an array with a shape of (triangles, 3, 3). A file is read as binary when
+    its size matches the number of facets in its header, as some binary files
+    also start with "solid".
+
+    Args:
+        filename: the STL filename.
+    """
+    with open(filename, "rb") as infile:
+        data = infile.read()
+
+    if len(data) >= 84:
+        count = int(np.frombuffer(data, dtype="<u4", count=1, offset=80)[0])
+        if len(data) == 84 + BINARY_FACET.itemsize * count:
+            facets = np.frombuffer(data, dtype=BINARY_FACET, count=count, offset=84)
+            return facets["vertices"].astype(np.float64)
+
+    tokens = np.array(data.split())
+    vertex_tokens = np.nonzero(tokens == b"vertex")[0]
+    if (
+        len(vertex_tokens) == 0
+        or len(vertex_tokens) % 3 != 0
+        or vertex_tokens[-1] + 3 >= len(tokens)
+    ):
+        msg = f"The STL file {filename} is neither a binary nor an ASCII STL file"
+        raise ValueError(msg)
+    try:
+        coordinates = tokens[vertex_tokens[:, np.newaxis] + np.arange(1, 4)]
+        return coordinates.astype(np.float64).reshape(-1, 3, 3)
+    except ValueError as error:
+        msg = f"The STL file {filename} has vertices that are not numbers"
+        raise ValueError(msg) from error
+
+
+def weld_vertices(
+    points: np.ndarray, tolerance: float
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Merges vertices closer than about the tolerance. The vertices are
+    hashed into a grid of cells as wide as the tolerance, and into the seven
+    grids offset by half a cell along one or more axes, and the vertices that
+    share a cell in any of the grids are welded. Vertices less than half the
+    tolerance apart along each axis always share a cell in one of the grids.
+
+    Args:
+        points: the coordinates of the vertices with a shape of (vertices, 3).
+        tolerance: the width of the cells, the vertices are only merged when
+            they are identical if this is 0.
+
+    Returns:
+        The coordinates of the welded vertices and the index of the welded
+        vertex of each point
+    """
+    vertices, inverse, _ = _unique_rows(points)
+    if tolerance <= 0 or len(vertices) < 2:
+        return vertices, inverse
+
+    scaled = vertices / tolerance
+    cells_of_grids = []
+    for offset in itertools.product([0.0, 0.5], repeat=3):
+        cells = np.floor(scaled + np.array(offset)).astype(np.int64)
+        cells_of_grids.append(_unique_rows(cells)[1])
+
+    # each vertex is labelled with the lowest vertex it is connected to
+    labels = np.arange(len(vertices))
+    while True:
+        previous = labels
+        for cell_of_vertex in cells_of_grids:
+            lowest = np.full(cell_of_vertex.max() + 1, len(vertices))
+            np.minimum.at(lowest, cell_of_vertex, labels)
+            labels = lowest[cell_of_vertex]
+        labels = labels[labels]
+        if np.array_equal(labels, previous):
+            break
+
+    kept, welded = np.unique(labels, return_inverse=True)
+    return vertices[kept], welded.reshape(-1)[inverse]
+
+
+def share_facets(
+    triangles: np.ndarray, volume_of_triangle: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Groups the triangles into surfaces. A triangle that also belongs to
+    another volume is kept once, with the orientation it has in the volume
+    that comes first, and put in the surface shared by the two volumes. The
+    other triangles are put in a surface of their volume.
+
+    Args:
+        triangles: the vertex indices of the triangles.
+        volume_of_triangle: the index of the volume of each triangle.
+
+    Returns:
+        The indices of the triangles that are kept, the (forward volume,
+        reverse volume) of each kept triangle, with a reverse volume of -1
+        for triangles that are not shared
+    """
+    _, facet_of_triangle, counts = _unique_rows(np.sort(triangles, axis=1))
+    order = np.argsort(facet_of_triangle, kind="stable")
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+
+    pairs = np.nonzero(counts == 2)[0]
+    first = order[starts[pairs]]
+    second = order[starts[pairs] + 1]
+    shared = volume_of_triangle[first] != volume_of_triangle[second]
+    first, second = first[shared], second[shared]
+    # the triangle of the volume that comes first is kept
+    swap = volume_of_triangle[second] < volume_of_triangle[first]
+    first[swap], second[swap] = second[swap], first[swap]
+
+    reverse_volume = np.full(len(triangles), -1)
+    reverse_volume[first] = volume_of_triangle[second]
+    kept = np.ones(len(triangles), dtype=bool)
+    kept[second] = False
+    kept = np.nonzero(kept)[0]
+    return kept, np.stack([volume_of_triangle[kept], reverse_volume[kept]], axis=1)
+
+
+def write_dagmc_h5m(
+    h5m_filename: str,
+    vertices: np.ndarray,
+    triangles: np.ndarray,
+    surface_of_triangle: np.ndarray,
+    surface_volumes: np.ndarray,
+    volume_count: int,
+    groups: dict,
+):
+    """Writes triangles grouped into surfaces, volumes and material groups to
+    a h5m file in the MOAB HDF5 layout used by DAGMC. Handles are numbered
+    vertices first, then triangles, then the surface, volume and group sets.
+
+    Args:
+        h5m_filename: the h5m filename.
+        vertices: the coordinates of the vertices.
+        triangles: the vertex indices of the triangles, sorted by surface.
+        surface_of_triangle: the index of the surface of each triangle.
+        surface_volumes: the (forward volume, reverse volume) of each surface
+            as volume indices, with a reverse volume of -1 if the surface
+            only bounds one volume.
+        volume_count: the number of volumes.
+        groups: the group names mapped to the indices of their volumes.
+    """
+    h5py = import_h5py()
+
+    surface_count = len(surface_volumes)
+    triangle_start = len(vertices) + 1
+    surface_start = triangle_start + len(triangles)
+    volume_start = surface_start + surface_count
+    group_start = volume_start + volume_count
+    group_names = list(groups)
+
+    triangle_bounds = np.searchsorted(surface_of_triangle, np.arange(surface_count + 1))
+
+    contents, children, parents, flags = [], [], [], []
+    for index in range(surface_count):
+        start, stop = triangle_bounds[index], triangle_bounds[index + 1]
+        node_handles = np.unique(triangles[start:stop]) + 1
+        triangle_handles = np.arange(start, stop) + triangle_start
+        surface_contents, surface_flags = encode_contents(
+            np.concatenate([node_handles, triangle_handles]), 0
+        )
+        contents.append(surface_contents)
+        children.append([])
+        parents.append([volume_start + v for v in surface_volumes[index] if v >= 0])
+        flags.append(surface_flags)
+    for index in range(volume_count):
+        bounded = np.nonzero((surface_volumes == index).any(axis=1))[0]
+        contents.append([])
+        children.append((bounded + surface_start).tolist())
+        parents.append([])
+        flags.append(0)
+    for name in group_names:
+        contents.append(sorted(volume_start + index for index in groups[name]))
+        children.append([])
+        parents.append([])
+        flags.append(0)
+
+    set_list = np.zeros((len(contents), 4), dtype=np.int64)
+    for column, table in enumerate([contents, children, parents]):
+        set_list[:, column] = np.cumsum([len(values) for values in table]) - 1
+    set_list[:, 3] = flags
+
+    senses = np.zeros((surface_count, 2), dtype=np.int64)
+    senses[:, 0] = volume_start + surface_volumes[:, 0]
+    reverse = surface_volumes[:, 1] >= 0
+    senses[reverse, 1] = volume_start + surface_volumes[reverse, 1]
+
+    categories = ["Surface"] * surface_count + ["Volume"] * volume_count
+    categories += ["Group"] * len(group_names)
+    global_ids = np.concatenate(
+        [
+            np.arange(1, surface_count + 1),
+            np.arange(1, volume_count + 1),
+            np.arange(1, len(group_names) + 1),
+        ]
+    ).astype(np.int32)
+    dimensions = np.repeat(
+        np.array([2, 3, 4], dtype=np.int32),
+        [surface_count, volume_count, len(group_names)],
+    )
+
+    Path(h5m_filename).parents[0].mkdir(parents=True, exist_ok=True)
+    with h5py.File(h5m_filename, "w") as h5m_file:
+        tstt = h5m_file.create_group("tstt")
+        tstt.attrs["max_id"] = np.uint64(group_start + len(group_names) - 1)
+        tstt["elemtypes"] = h5py.enum_dtype(
+            {name: value for value, name in enumerate(ENTITY_TYPES)}, basetype="i4"
+        )
+        tstt.create_dataset("history", data=np.zeros(0, dtype=h5py.string_dtype()))
+
+        dataset = tstt.create_dataset("nodes/coordinates", data=vertices)
+        dataset.attrs["start_id"] = 1
+        elements = tstt.create_group("elements/Tri3")
+        elements.attrs.create(
+            "element_type", ENTITY_TYPES.index("Tri"), dtype=tstt["elemtypes"].dtype
+        )
+        dataset = elements.create_dataset(
+            "connectivity", data=triangles.astype(np.int64) + 1
+        )
+        dataset.attrs["start_id"] = triangle_start
+
+        dataset = tstt.create_dataset("sets/list", data=set_list)
+        dataset.attrs["start_id"] = surface_start
+        for name, table in [
+            ("contents", contents),
+            ("children", children),
+            ("parents", parents),
+        ]:
+            tstt.create_dataset(
+                f"sets/{name}",
+                data=np.array([value for row in table for value in row], np.int64),
+            )
+
+        for name, values in [("GLOBAL_ID", global_ids), ("GEOM_DIMENSION", dimensions)]:
+            write_tag(tstt, name, np.int32, DENSE_TAG)
+            tstt.create_dataset(f"sets/tags/{name}", data=values)
+        write_tag(
+            tstt,
+            "CATEGORY",
+            "V32",
+            SPARSE_TAG,
+            np.arange(surface_start, surface_start + len(categories)),
+            np.array([opaque(category) for category in categories], dtype="V32"),
+        )
+        write_tag(
+            tstt,
+            "NAME",
+            "V32",
+            SPARSE_TAG,
+            np.arange(group_start, group_start + len(group_names)),
+            np.array([opaque(name) for name in group_names], dtype="V32"),
+        )
+        write_tag(
+            tstt,
+            "GEOM_SENSE_2",
+            ("<i8", (2,)),
+            SPARSE_TAG,
+            np.arange(surface_start, volume_start),
+            senses,
+            is_handle=True,
+        )
+
+
+def stl_to_h5m(
+    files_with_tags: List[dict],
+    h5m_filename: str = "dagmc.h5m",
+    merge_tolerance: float = 1e-4,
+    implicit_complement_material_tag: Optional[str] = None,
+    verbose: bool = False,
+) -> List[dict]:
+    """Converts entries whose CAD files are all STL files into a DAGMC h5m
+    file without Cubit. Each STL file becomes a volume, numbered in the order
+    of the entries, and is added to the "mat:" group of its material tag. The
+    scale of an entry is applied to its vertices. The implicit complement is
+    given its material by adding the graveyard volume to a "mat:<tag>_comp"
+    group, as in the Cubit conversion.
+
+    Args:
+        files_with_tags: the entries with a .stl cad_filename.
+        h5m_filename: the h5m filename.
+        merge_tolerance: the distance within which vertices of the STL files
+            are welded, see weld_vertices.
+        implicit_complement_material_tag: Material tag to be assigned to the
+            implicit complement. Defaults to vacuum.
+        verbose: flag to control the printing of the vertices welded and
+            facets shared.
+
+    Returns:
+        The entries with the ids of their volumes in a "volumes" key
+    """
+    facets = []
+    for entry in files_with_tags:
+        if Path(entry["cad_filename"]).suffix.lower() != ".stl":
+            msg = (
+                "Only STL files can be converted without Cubit, "
+                f"{entry['cad_filename']} is not an STL file"
+            )
+            raise ValueError(msg)
+        triangles = read_stl(entry["cad_filename"])
+        facets.append(triangles * entry.get("scale", 1))
+
+    volume_of_triangle = np.repeat(
+        np.arange(len(facets)), [len(triangles) for triangles in facets]
+    )
+    points = np.concatenate(facets).reshape(-1, 3)
+    vertices, vertex_of_point = weld_vertices(points, merge_tolerance)
+    triangles = vertex_of_point.reshape(-1, 3)
+
+    # triangles welded onto a line or a point are dropped
+    valid = (
+        (triangles[:, 0] != triangles[:, 1])
+        & (triangles[:, 1] != triangles[:, 2])
+        & (triangles[:, 0] != triangles[:, 2])
+    )
+    triangles, volume_of_triangle = triangles[valid], volume_of_triangle[valid]
+
+    kept, triangle_volumes = share_facets(triangles, volume_of_triangle)
+    surface_volumes, surface_of_triangle, _ = _unique_rows(triangle_volumes)
+    order = np.argsort(surface_of_triangle, kind="stable")
+    triangles = triangles[kept][order]
+    surface_of_triangle = surface_of_triangle[order]
+
+    # the vertices are numbered in the order of the first surface they are on
+    # so the vertices of each surface are stored in few ranges
+    first_surface = np.full(len(vertices), len(surface_volumes))
+    np.minimum.at(first_surface, triangles.ravel(), np.repeat(surface_of_triangle, 3))
+    used = np.nonzero(first_surface < len(surface_volumes))[0]
+    used = used[np.argsort(first_surface[used], kind="stable")]
+    renumbered = np.zeros(len(vertices), dtype=np.int64)
+    renumbered[used] = np.arange(len(used))
+
+    geometry_details = []
+    groups = {}
+    for index, entry in enumerate(files_with_tags):
+        geometry_details.append(dict(entry, volumes=[str(index + 1)]))
+        groups.setdefault(f"mat:{entry['material_tag']}", []).append(index)
+    if implicit_complement_material_tag is not None:
+        for index, entry in enumerate(files_with_tags):
+            if entry["material_tag"].lower() == "graveyard":
+                name = f"mat:{implicit_complement_material_tag}_comp"
+                groups.setdefault(name, []).append(index)
+                break
+
+    write_dagmc_h5m(
+        h5m_filename,
+        vertices[used],
+        renumbered[triangles],
+        surface_of_triangle,
+        surface_volumes,
+        len(files_with_tags),
+        groups,
+    )
+
+    if verbose:
+        shared = np.count_nonzero(surface_volumes[:, 1] >= 0)
+        print(
+            f"welded {len(points)} STL vertices into {len(used)} vertices and "
+            f"shared {len(volume_of_triangle) - len(kept)} facets in {shared} "
+            f"surfaces between volumes"
+        )
+    return geometry_details
@@ -0,0 +1,103 @@
+from dataclasses import dataclass
+from typing import Dict, Iterable, Sequence
+
+import numpy as np
+
+
+@dataclass
+class SurfaceProperties:
+    """The properties of many surfaces held in arrays, one row per surface
+
+    Args:
+        ids: the surface ids.
+        planar: True for planar surfaces.
+        vertex_counts: the number of vertices of each surface.
+        normals: the unit normal of each surface.
+        centroids: the center point of each surface.
+    """
+
+    ids: np.ndarray
+    planar: np.ndarray
+    vertex_counts: np.ndarray
+    normals: np.ndarray
+    centroids: np.ndarray
+
+
+def gather_surface_properties(surface_ids: Iterable[int], cubit) -> SurfaceProperties:
+    """Collects the planarity, vertex count, normal and centroid of each surface
+    in a single pass using the Cubit API functions rather than a command parsed
+    query per surface.
+
+    Args:
+        surface_ids: the ids of the surfaces.
+        cubit: the cubit module.
+    """
+    ids = np.fromiter((int(surface_id) for surface_id in surface_ids), dtype=int)
+    planar = np.zeros(len(ids), dtype=bool)
+    vertex_counts = np.zeros(len(ids), dtype=int)
+    normals = np.zeros((len(ids), 3))
+    centroids = np.zeros((len(ids), 3))
+    for index, surface_id in enumerate(ids.tolist()):
+        planar[index] = cubit.surface(surface_id).is_planar()
+        vertex_counts[index] = len(cubit.get_relatives("surface", surface_id, "vertex"))
+        normals[index] = cubit.get_surface_normal(surface_id)
+        centroids[index] = cubit.get_center_point("surface", surface_id)
+
+    lengths = np.linalg.norm(normals, axis=1)
+    normals[lengths > 0] /= lengths[lengths > 0, np.newaxis]
+
+    return SurfaceProperties(ids, planar, vertex_counts, normals, centroids)
+
+
+def find_cut_plane_surfaces(
+    properties: SurfaceProperties,
+    symmetry_axis: Sequence[float] = (0, 0, 1),
+    axis_origin: Sequence[float] = (0, 0, 0),
+    tolerance: float = 1e-3,
+) -> np.ndarray:
+    """Returns a mask of the surfaces that lie on the cut planes of a wedge
+    (a sector of a model with rotational symmetry). Cut planes are planar and
+    contain the symmetry axis, so their normals are perpendicular to the axis
+    and the axis lies within the plane.
+
+    Args:
+        properties: the surface properties from gather_surface_properties.
+        symmetry_axis: the direction of the axis of rotational symmetry.
+        axis_origin: a point on the axis of rotational symmetry.
+        tolerance: the allowed misalignment, as the cosine of the angle between
+            the normal and the axis and as the distance of the axis from the
+            plane relative to the size of the geometry.
+    """
+    axis = np.asarray(symmetry_axis, dtype=float)
+    axis = axis / np.linalg.norm(axis)
+    offsets = properties.centroids - np.asarray(axis_origin, dtype=float)
+
+    # the size of the geometry scales the distance tolerance
+    size = max(np.abs(offsets).max(initial=0.0), 1.0)
+
+    perpendicular = np.abs(properties.normals @ axis) < tolerance
+    contains_axis = np.abs(np.sum(offsets * properties.normals, axis=1)) < (
+        tolerance * size
+    )
+    return (
+        properties.planar
+        & (properties.vertex_counts >= 3)
+        & perpendicular
+        & contains_axis
+    )
+
+
+def classify_surfaces(surface_ids: Iterable[int], cubit) -> Dict[int, dict]:
+    """Returns a dictionary of surface ids mapped to {"reflector": True} for
+    surfaces on the cut planes of a wedge and {"reflector": False} otherwise
+
+    Args:
+        surface_ids: the ids of the surfaces to classify.
+        cubit: the cubit module.
+    """
+    properties = gather_surface_properties(surface_ids, cubit)
+    reflectors = find_cut_plane_surfaces(properties)
+    return {
+        surface_id: {"reflector": bool(reflector)}
+        for surface_id, reflector in zip(properties.ids.tolist(), reflectors)
+    }
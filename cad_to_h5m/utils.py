@@ -0,0 +1,40 @@
+import sys
+
+
+def import_cubit(cubit_path: str):
+    """Imports the cubit module from the provided Cubit directory
+
+    Args:
+        cubit_path: the path to the Cubit directory used to import Cubit from.
+    """
+    sys.path.append(cubit_path)
+
+    try:
+        import cubit
+    except ImportError:
+        msg = (
+            "import cubit failed, cubit was not importable from the "
+            f"provided path {cubit_path}"
+        )
+        raise ImportError(msg)
+
+    return cubit
+
+
+def find_import_type(cad_filename: str) -> str:
+    """Returns the Cubit import type for a CAD file based on the file suffix
+
+    Args:
+        cad_filename: the filename of the CAD file to import.
+    """
+    if cad_filename.endswith(".stp") or cad_filename.endswith(".step"):
+        return "step"
+    elif cad_filename.endswith(".sat"):
+        return "acis"
+    elif cad_filename.endswith(".stl"):
+        return "stl"
+    msg = (
+        f"File format for {cad_filename} is not supported."
+        "Try step files or sat files"
+    )
+    raise ValueError(msg)
@@ -0,0 +1,48 @@
+"""Runs a single conversion in its own process for cad_to_h5m_async.
+
+The keyword arguments of cad_to_h5m are read as a pickle from stdin. One JSON
+line is written for each finished stage followed by a final line with either
+the h5m filename or the pickled exception raised by the conversion. Anything
+printed by Cubit is sent to stderr so that it can't be mixed up with these
+lines.
+"""
+
+import base64
+import json
+import os
+import pickle
+import sys
+from dataclasses import asdict
+
+
+def main():
+    # keeps the original stdout for the progress lines and points file
+    # descriptor 1, which Cubit writes to directly, at stderr
+    events = os.fdopen(os.dup(sys.stdout.fileno()), "w", buffering=1)
+    sys.stdout.flush()
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+
+    job = pickle.load(sys.stdin.buffer)
+
+    def send(event: dict):
+        events.write(json.dumps(event) + "\n")
+
+    try:
+        from cad_to_h5m import cad_to_h5m
+
+        h5m_filename = cad_to_h5m(
+            stage_callback=lambda record: send({"stage": asdict(record)}), **job
+        )
+    except Exception as error:
+        try:
+            pickled_error = pickle.dumps(error)
+        except Exception:
+            pickled_error = pickle.dumps(RuntimeError(repr(error)))
+        send({"error": base64.b64encode(pickled_error).decode("ascii")})
+    else:
+        send({"result": h5m_filename})
+    events.close()
+
+
+if __name__ == "__main__":
+    main()
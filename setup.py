@@ -13,6 +13,9 @@ setuptools.setup(
     long_description_content_type="text/markdown",
     url="https://github.com/fusion-energy/cad_to_h5m",
     packages=setuptools.find_packages(),
+    install_requires=["numpy"],
+    extras_require={"inspect": ["h5py"], "cli": ["pyyaml"]},
+    entry_points={"console_scripts": ["cad-to-h5m=cad_to_h5m.cli:main"]},
     classifiers=[
         "Natural Language :: English",
         "Topic :: Scientific/Engineering",
@@ -0,0 +1,80 @@
+import asyncio
+import tempfile
+import unittest
+from pathlib import Path
+
+from cad_to_h5m import cad_to_h5m_async
+from cad_to_h5m.inspect import material_tags
+from cad_to_h5m.mock_cubit import MOCK_CUBIT_PATH
+
+
+class TestAsync(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.tmp_path = Path(self.tmp_dir.name)
+        self.files_with_tags = [
+            {"cad_filename": "tests/steel.stp", "material_tag": "mat1"}
+        ]
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def convert(self, name, **kwargs):
+        return cad_to_h5m_async(
+            self.files_with_tags,
+            h5m_filename=str(self.tmp_path / f"{name}.h5m"),
+            cubit_path=MOCK_CUBIT_PATH,
+            verbose=False,
+            **kwargs,
+        )
+
+    def test_concurrent_conversions(self):
+        """Checks that conversions limited by a semaphore all finish and that
+        the stages of each conversion are streamed back"""
+
+        stages = []
+
+        async def convert_all():
+            semaphore = asyncio.Semaphore(2)
+            return await asyncio.gather(
+                *[
+                    self.convert(
+                        name, semaphore=semaphore, stage_callback=stages.append
+                    )
+                    for name in ["first", "second", "third"]
+                ]
+            )
+
+        h5m_filenames = asyncio.run(convert_all())
+
+        assert h5m_filenames == [
+            str(self.tmp_path / f"{name}.h5m") for name in ["first", "second", "third"]
+        ]
+        assert material_tags(h5m_filenames[0]) == ["mat:mat1"]
+        assert [stage.name for stage in stages].count("export") == 3
+
+    def test_error_is_raised(self):
+        """Checks that the error of a failed conversion is raised again"""
+
+        with self.assertRaises(ValueError):
+            asyncio.run(
+                self.convert(
+                    "dagmc", faceting_tolerances={"mat1": 1e-3}, triangle_budget=100
+                )
+            )
+
+    def test_timeout_and_cancellation(self):
+        """Checks that a conversion that takes too long or is cancelled is
+        stopped without writing the h5m file"""
+
+        async def cancel():
+            task = asyncio.ensure_future(self.convert("cancelled"))
+            await asyncio.sleep(0.01)
+            task.cancel()
+            await task
+
+        with self.assertRaises(asyncio.TimeoutError):
+            asyncio.run(self.convert("timed_out", timeout=0.01))
+        with self.assertRaises(asyncio.CancelledError):
+            asyncio.run(cancel())
+        assert list(self.tmp_path.iterdir()) == []
@@ -0,0 +1,106 @@
+import tempfile
+import unittest
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from unittest.mock import patch
+
+from cad_to_h5m import batch, cad_to_h5m_batch
+from cad_to_h5m.cache import ConversionCache, conversion_key
+
+
+class TestBatch(unittest.TestCase):
+    def test_failing_job_does_not_stop_the_batch(self):
+        """Checks that each job has a result and that a failing job is reported
+        with its error while the other jobs succeed. The successful job is
+        served from the conversion cache so Cubit is not needed"""
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            files_with_tags = [
+                {"cad_filename": "tests/steel.stp", "material_tag": "mat1"}
+            ]
+            cached_h5m = Path(tmp_dir) / "cached.h5m"
+            cached_h5m.write_bytes(b"h5m contents")
+            cache = ConversionCache(Path(tmp_dir) / "cache")
+            cache.store(
+                conversion_key(
+                    files_with_tags,
+                    merge_tolerance=1e-4,
+                    faceting_tolerance=1.0e-2,
+                    make_watertight=True,
+                    imprint=True,
+                    autoheal=False,
+                    surface_reflectivity_name="reflective",
+                    implicit_complement_material_tag=None,
+                ),
+                {"h5m": str(cached_h5m)},
+            )
+
+            jobs = [
+                {
+                    "files_with_tags": files_with_tags,
+                    "h5m_filename": str(Path(tmp_dir) / "dagmc.h5m"),
+                    "cache_dir": str(Path(tmp_dir) / "cache"),
+                },
+                {
+                    "files_with_tags": files_with_tags,
+                    "h5m_filename": "output_file_with.not_correct_suffix",
+                },
+            ]
+
+            results = sorted(
+                cad_to_h5m_batch(jobs, max_workers=2), key=lambda result: result.index
+            )
+
+            assert [result.index for result in results] == [0, 1]
+            assert results[0].succeeded
+            assert results[0].h5m_filename == str(Path(tmp_dir) / "dagmc.h5m")
+            assert Path(results[0].h5m_filename).is_file()
+            assert not results[1].succeeded
+            assert isinstance(results[1].error, ValueError)
+
+    def test_crash_only_isolates_running_jobs(self):
+        """Checks that when a worker process crashes only the jobs that had
+        started are rerun one at a time and that the jobs that had not started
+        are run in a new pool with all the workers"""
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            # importing this cubit module kills the worker process
+            crashing_cubit_path = Path(tmp_dir) / "crashing_cubit"
+            crashing_cubit_path.mkdir()
+            (crashing_cubit_path / "cubit.py").write_text("import os\nos._exit(1)\n")
+
+            jobs = [
+                {
+                    "files_with_tags": [
+                        {"cad_filename": "tests/steel.stp", "material_tag": "mat1"}
+                    ],
+                    "h5m_filename": str(Path(tmp_dir) / "crash.h5m"),
+                    "cubit_path": str(crashing_cubit_path),
+                }
+            ]
+            for index in range(8):
+                jobs.append(
+                    {
+                        "files_with_tags": [
+                            {"cad_filename": "tests/steel.stl", "material_tag": "mat1"}
+                        ],
+                        "h5m_filename": str(Path(tmp_dir) / f"dagmc_{index}.h5m"),
+                        "cubit_free": True,
+                        "verbose": False,
+                    }
+                )
+
+            with patch.object(batch, "_new_pool", wraps=batch._new_pool) as new_pool:
+                results = sorted(
+                    cad_to_h5m_batch(jobs, max_workers=2),
+                    key=lambda result: result.index,
+                )
+            pool_sizes = [call.args[0] for call in new_pool.call_args_list]
+
+            assert [result.index for result in results] == list(range(9))
+            assert isinstance(results[0].error, BrokenProcessPool)
+            assert all(result.succeeded for result in results[1:])
+            # the crashing job and at most the job running alongside it are
+            # isolated, the others are resubmitted to a pool of two workers
+            assert pool_sizes[:2] == [2, 2]
+            assert 1 <= pool_sizes.count(1) <= 2
@@ -0,0 +1,131 @@
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from cad_to_h5m import cad_to_h5m
+from cad_to_h5m.cache import ConversionCache, conversion_key, hash_file
+from cad_to_h5m.mock_cubit import use_mock_cubit
+
+
+class TestConversionCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.tmp_path = Path(self.tmp_dir.name)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_key_changes_with_file_contents_and_parameters(self):
+        """Checks that the key depends on the CAD file contents, the entries
+        and the parameters but not on the volumes added during conversion"""
+
+        cad_file = self.tmp_path / "part.stp"
+        cad_file.write_text("first version")
+        entries = [{"cad_filename": str(cad_file), "material_tag": "mat1"}]
+
+        key = conversion_key(entries, faceting_tolerance=1e-2)
+
+        assert key == conversion_key(entries, faceting_tolerance=1e-2)
+        assert key != conversion_key(entries, faceting_tolerance=1e-3)
+        assert key != conversion_key(
+            [{"cad_filename": str(cad_file), "material_tag": "mat2"}],
+            faceting_tolerance=1e-2,
+        )
+
+        entries[0]["volumes"] = ["1"]
+        assert key == conversion_key(entries, faceting_tolerance=1e-2)
+
+        cad_file.write_text("second version")
+        assert key != conversion_key(entries, faceting_tolerance=1e-2)
+
+    def test_same_entries_converted_twice(self):
+        """Checks that converting the same files_with_tags list twice is a
+        cache hit even though the first conversion added details to it"""
+
+        files_with_tags = [
+            {
+                "cad_filename": "tests/steel.stp",
+                "material_tag": "mat1",
+                "surface_reflectivity": True,
+            },
+            {"cad_filename": "tests/blanket.stp", "material_tag": "mat2"},
+        ]
+        cache_dir = self.tmp_path / "cache"
+        with use_mock_cubit() as cubit:
+            for _ in range(2):
+                cad_to_h5m(
+                    files_with_tags,
+                    h5m_filename=str(self.tmp_path / "dagmc.h5m"),
+                    cache_dir=str(cache_dir),
+                    verbose=False,
+                )
+                imports = [c for c in cubit.commands if c.startswith("import")]
+                cubit.commands.clear()
+
+        assert "volumes" in files_with_tags[0]
+        assert imports == []
+        assert len(list(cache_dir.iterdir())) == 1
+
+    def test_hash_of_missing_file(self):
+        """Checks that hashing a missing CAD file raises an error"""
+
+        def missing_file():
+            hash_file(str(self.tmp_path / "missing.stp"))
+
+        self.assertRaises(FileNotFoundError, missing_file)
+
+    def test_store_and_fetch(self):
+        """Checks that stored outputs are placed at the requested filenames and
+        that requesting an output that was not stored is a cache miss"""
+
+        cache = ConversionCache(self.tmp_path / "cache")
+        h5m_file = self.tmp_path / "dagmc.h5m"
+        h5m_file.write_bytes(b"h5m contents")
+
+        assert not cache.fetch("key", {"h5m": str(h5m_file)})
+        cache.store("key", {"h5m": str(h5m_file), "cub": None})
+
+        fetched_file = self.tmp_path / "subfolder" / "fetched.h5m"
+        assert cache.fetch("key", {"h5m": str(fetched_file), "cub": None})
+        assert fetched_file.read_bytes() == b"h5m contents"
+
+        assert not cache.fetch(
+            "key", {"h5m": str(fetched_file), "cub": str(self.tmp_path / "a.cub")}
+        )
+
+    def test_hardlinked_fetch(self):
+        """Checks that outputs can be hard-linked out of the cache"""
+
+        cache = ConversionCache(self.tmp_path / "cache", use_hardlinks=True)
+        h5m_file = self.tmp_path / "dagmc.h5m"
+        h5m_file.write_bytes(b"h5m contents")
+        cache.store("key", {"h5m": str(h5m_file)})
+
+        assert cache.fetch("key", {"h5m": str(h5m_file)})
+        assert h5m_file.read_bytes() == b"h5m contents"
+        assert os.stat(h5m_file).st_nlink == 2
+
+    def test_least_recently_used_eviction(self):
+        """Checks that the least recently used entries are removed once the
+        cache is larger than the maximum size"""
+
+        cache = ConversionCache(self.tmp_path / "cache", max_size=2500)
+        h5m_file = self.tmp_path / "dagmc.h5m"
+        h5m_file.write_bytes(b"0" * 1000)
+
+        cache.store("first", {"h5m": str(h5m_file)})
+        cache.store("second", {"h5m": str(h5m_file)})
+
+        # makes first the most recently used entry
+        manifest = self.tmp_path / "cache" / "second" / "manifest.json"
+        os.utime(manifest, (time.time() - 100, time.time() - 100))
+        assert cache.fetch("first", {"h5m": str(h5m_file)})
+
+        cache.store("third", {"h5m": str(h5m_file)})
+
+        assert cache.size() <= 2500
+        assert (self.tmp_path / "cache" / "first").is_dir()
+        assert not (self.tmp_path / "cache" / "second").exists()
+        assert (self.tmp_path / "cache" / "third").is_dir()
@@ -0,0 +1,82 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from cad_to_h5m import Converter, cad_to_h5m
+from cad_to_h5m.inspect import material_tags
+from cad_to_h5m.mock_cubit import use_mock_cubit
+
+
+class TestCheckpoint(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.tmp_path = Path(self.tmp_dir.name)
+        self.checkpoint_dir = str(self.tmp_path / "checkpoint")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def convert(self, **kwargs):
+        with use_mock_cubit() as cubit:
+            cad_to_h5m(
+                files_with_tags=[
+                    {"cad_filename": "tests/blanket.stp", "material_tag": "mat1"},
+                    {
+                        "cad_filename": "tests/steel.stp",
+                        "material_tag": "mat2",
+                        "tet_mesh": "size 0.5",
+                    },
+                ],
+                checkpoint_dir=self.checkpoint_dir,
+                verbose=False,
+                **kwargs,
+            )
+            return cubit.commands
+
+    def test_resume_after_export(self):
+        """Checks that a conversion that failed while meshing resumes after
+        the export without importing, merging or exporting again"""
+
+        h5m_filename = str(self.tmp_path / "first.h5m")
+        with patch.object(Converter, "mesh", side_effect=RuntimeError("crash")):
+            self.assertRaises(RuntimeError, self.convert, h5m_filename=h5m_filename)
+        with open(Path(self.checkpoint_dir) / "checkpoint.json") as infile:
+            assert json.load(infile)["stage"] == "export"
+
+        h5m_filename = str(self.tmp_path / "second.h5m")
+        commands = self.convert(h5m_filename=h5m_filename)
+
+        assert not any(command.startswith("import") for command in commands)
+        assert not any(command.startswith("merge") for command in commands)
+        assert not any(command.startswith("export dagmc") for command in commands)
+        assert "volume 3 size 0.5" in commands
+        assert material_tags(h5m_filename) == ["mat:mat1", "mat:mat2"]
+
+    def test_resume_after_merge(self):
+        """Checks that a conversion that failed while exporting resumes after
+        the merge without importing, tagging or imprinting again"""
+
+        with patch.object(Converter, "export", side_effect=RuntimeError("crash")):
+            self.assertRaises(RuntimeError, self.convert, cluster_imprint_merge=True)
+
+        commands = self.convert(
+            h5m_filename=str(self.tmp_path / "dagmc.h5m"), cluster_imprint_merge=True
+        )
+
+        assert not any(command.startswith("import") for command in commands)
+        assert not any(command.startswith("imprint") for command in commands)
+        assert 'group "mat:mat1" add volume 1 to 2' not in commands
+        assert any(command.startswith("export dagmc") for command in commands)
+
+    def test_changed_inputs_start_again(self):
+        """Checks that the checkpoint is not used by a conversion with
+        different inputs"""
+
+        self.convert(h5m_filename=str(self.tmp_path / "first.h5m"))
+        commands = self.convert(
+            h5m_filename=str(self.tmp_path / "second.h5m"), merge_tolerance=1e-3
+        )
+
+        assert any(command.startswith("import step") for command in commands)
@@ -0,0 +1,89 @@
+import io
+import json
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from contextlib import redirect_stdout
+from pathlib import Path
+
+from cad_to_h5m.cache import hash_file
+from cad_to_h5m.cli import file_hashes, load_manifest, main, wait_for_changes
+from cad_to_h5m.inspect import material_tags
+from cad_to_h5m.mock_cubit import use_mock_cubit
+
+
+class TestCli(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.tmp_path = Path(self.tmp_dir.name)
+        self.cad_filename = self.tmp_path / "steel.stp"
+        shutil.copyfile("tests/steel.stp", self.cad_filename)
+        self.manifest_filename = str(self.tmp_path / "manifest.yaml")
+        with open(self.manifest_filename, "w") as outfile:
+            outfile.write(
+                "files_with_tags:\n"
+                "  - cad_filename: steel.stp\n"
+                "    material_tag: mat1\n"
+                "h5m_filename: outputs/dagmc.h5m\n"
+                "faceting_tolerance: 0.001\n"
+            )
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_manifest_paths(self):
+        """Checks that the paths of YAML and JSON manifests are found relative
+        to the manifest"""
+
+        json_filename = str(self.tmp_path / "manifest.json")
+        with open(json_filename, "w") as outfile:
+            json.dump(load_manifest(self.manifest_filename), outfile)
+
+        for manifest_filename in [self.manifest_filename, json_filename]:
+            manifest = load_manifest(manifest_filename)
+            assert manifest["files_with_tags"][0]["cad_filename"] == str(
+                self.cad_filename
+            )
+            assert manifest["h5m_filename"] == str(self.tmp_path / "outputs/dagmc.h5m")
+            assert manifest["faceting_tolerance"] == 0.001
+
+    def test_build_and_dry_run(self):
+        """Checks that the manifest is converted and that a dry run prints the
+        commands with the options of the manifest"""
+
+        output = io.StringIO()
+        with redirect_stdout(output):
+            main([self.manifest_filename, "--dry-run"])
+        assert "faceting_tolerance 0.001" in output.getvalue()
+
+        h5m_filename = str(self.tmp_path / "built.h5m")
+        with use_mock_cubit(), redirect_stdout(io.StringIO()):
+            assert main([self.manifest_filename, "-o", h5m_filename]) == 0
+        assert material_tags(h5m_filename) == ["mat:mat1"]
+
+    def test_changes_are_debounced_and_hashed(self):
+        """Checks that saving a file without changing it is ignored and that a
+        burst of saves is waited out before the new hashes are returned"""
+
+        hashes = file_hashes([self.manifest_filename, str(self.cad_filename)])
+        contents = self.cad_filename.read_text()
+
+        def save_files():
+            time.sleep(0.1)
+            self.cad_filename.write_text(contents)
+            time.sleep(0.3)
+            for index in range(3):
+                self.cad_filename.write_text(contents + f"/* edit {index} */\n")
+                time.sleep(0.02)
+
+        thread = threading.Thread(target=save_files)
+        thread.start()
+        new_hashes = wait_for_changes(
+            self.manifest_filename, hashes, interval=0.01, debounce=0.2
+        )
+        thread.join()
+
+        assert new_hashes[str(self.cad_filename)] == hash_file(self.cad_filename)
+        assert new_hashes[self.manifest_filename] == hashes[self.manifest_filename]
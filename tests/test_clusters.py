@@ -0,0 +1,76 @@
+import itertools
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from cad_to_h5m import cad_to_h5m
+from cad_to_h5m.clusters import find_touching_pairs, find_volume_clusters
+from cad_to_h5m.mock_cubit import use_mock_cubit
+
+
+class TestClusters(unittest.TestCase):
+    def test_sweep_matches_all_pairs(self):
+        """Checks that the sweep finds the same overlapping pairs as comparing
+        every pair of boxes"""
+
+        rng = np.random.default_rng(1)
+        lower = rng.uniform(0, 10, size=(200, 3))
+        boxes = np.concatenate([lower, lower + rng.uniform(0.1, 1, (200, 3))], axis=1)
+
+        pairs = find_touching_pairs(boxes, tolerance=0.05)
+
+        expected = {
+            (first, second)
+            for first, second in itertools.combinations(range(200), 2)
+            if np.all(boxes[first, :3] - 0.05 <= boxes[second, 3:] + 0.05)
+            and np.all(boxes[second, :3] - 0.05 <= boxes[first, 3:] + 0.05)
+        }
+        assert {tuple(sorted(pair)) for pair in pairs.tolist()} == expected
+
+    def test_clusters_of_touching_volumes(self):
+        """Checks that volumes are grouped with the volumes they touch and that
+        pairs in different clusters are counted as pruned"""
+
+        with use_mock_cubit() as cubit:
+            cubit.init([])
+            # volumes 1 to 3 are side by side, volume 4 is moved away
+            cubit.cmd('import step "tests/blanket.stp"')
+            cubit.cmd('import step "tests/blanket.stp"')
+            cubit.cmd("volume 4 scale 10")
+
+            report = find_volume_clusters([1, 2, 3, 4], cubit, tolerance=1e-4)
+
+        assert report.clusters == [[1, 2, 3]]
+        assert report.isolated_volumes == 1
+        assert report.candidate_pairs == 6
+        assert report.touching_pairs == 2
+        assert report.pruned_pairs == 3
+
+    def test_conversion_imprints_and_merges_clusters(self):
+        """Checks that each cluster is imprinted and merged with its own
+        command and that the clusters are saved in the profile"""
+
+        with tempfile.TemporaryDirectory() as tmp_dir, use_mock_cubit() as cubit:
+            h5m_filename = str(Path(tmp_dir) / "dagmc.h5m")
+            cad_to_h5m(
+                files_with_tags=[
+                    {"cad_filename": "tests/blanket.stp", "material_tag": "mat1"},
+                    {"cad_filename": "tests/steel.stp", "material_tag": "mat2"},
+                ],
+                h5m_filename=h5m_filename,
+                cluster_imprint_merge=True,
+                profile=True,
+                verbose=False,
+            )
+
+            assert "imprint volume 1 to 3" in cubit.commands
+            assert "merge volume 1 to 3 group_results" in cubit.commands
+            assert "imprint body all" not in cubit.commands
+            with open(Path(tmp_dir) / "dagmc_profile.json") as infile:
+                profile = json.load(infile)
+
+        assert profile["details"]["clusters"]["clusters"] == [[1, 2, 3]]
+        assert "cluster" in [stage["name"] for stage in profile["stages"]]
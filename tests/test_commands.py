@@ -0,0 +1,75 @@
+import unittest
+
+from cad_to_h5m.commands import CommandBuffer, CountingCubit, format_ids
+from cad_to_h5m.core import create_tet_mesh, tag_geometry_with_mats
+
+
+class RecordingCubit:
+    """Stores the commands sent to it in place of the cubit module"""
+
+    def __init__(self):
+        self.commands = []
+
+    def cmd(self, command):
+        self.commands.append(command)
+
+
+class TestCommands(unittest.TestCase):
+    def test_format_ids(self):
+        """Checks that consecutive ids are written as Cubit ranges"""
+
+        assert format_ids([1, 2, 3, 4, 7]) == "1 to 4 7"
+        assert format_ids(["9", "3", "2", "3"]) == "2 to 3 9"
+        assert format_ids([5]) == "5"
+
+    def test_buffer_coalesces_commands_with_the_same_template(self):
+        """Checks that commands sharing a template are sent as one command in
+        the order the template was first added"""
+
+        cubit = RecordingCubit()
+        with CommandBuffer(cubit) as buffer:
+            buffer.cmd("reset")
+            buffer.add('group "mat:a" add volume {ids}', [1])
+            buffer.add('group "mat:b" add volume {ids}', [2])
+            buffer.add('group "mat:a" add volume {ids}', [3, 4])
+            assert cubit.commands == []
+
+        assert cubit.commands == [
+            "reset",
+            'group "mat:a" add volume 1 3 to 4',
+            'group "mat:b" add volume 2',
+        ]
+
+    def test_counting_cubit(self):
+        """Checks that commands are counted and passed through"""
+
+        cubit = RecordingCubit()
+        counting_cubit = CountingCubit(cubit, record=True)
+        counting_cubit.cmd("reset")
+        counting_cubit.cmd("reset")
+
+        assert counting_cubit.command_count == 2
+        assert counting_cubit.commands == ["reset", "reset"]
+        assert counting_cubit.commands is not cubit.commands
+        assert cubit.commands == ["reset", "reset"]
+
+    def test_command_count_does_not_grow_with_volumes(self):
+        """Checks that tagging and meshing use the same number of commands for
+        a few volumes and for many volumes"""
+
+        command_counts = []
+        for number_of_volumes in [10, 1000]:
+            geometry_details = [
+                {
+                    "material_tag": f"mat{index % 2}",
+                    "tet_mesh": "size 0.5",
+                    "volumes": [str(index + 1)],
+                }
+                for index in range(number_of_volumes)
+            ]
+            cubit = CountingCubit(RecordingCubit())
+            tag_geometry_with_mats(geometry_details, None, cubit)
+            create_tet_mesh(geometry_details, cubit)
+            command_counts.append(cubit.command_count)
+
+        assert command_counts[0] == command_counts[1]
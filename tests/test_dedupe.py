@@ -0,0 +1,143 @@
+import json
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from cad_to_h5m import cad_to_h5m
+from cad_to_h5m.dedupe import (
+    copy_into_place,
+    find_duplicate_volumes,
+    heal_unique_volumes,
+)
+from cad_to_h5m.inspect import inspect_h5m
+from cad_to_h5m.mock_cubit import use_mock_cubit
+
+
+class TestDedupe(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.tmp_path = Path(self.tmp_dir.name)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_duplicate_files_are_imported_once(self):
+        """Checks that an entry with the same CAD file contents as an earlier
+        entry copies its volumes instead of importing the file again"""
+
+        cad_filenames = []
+        for name in ["coil_1.stp", "coil_2.stp"]:
+            shutil.copyfile("tests/steel.stp", self.tmp_path / name)
+            cad_filenames.append(str(self.tmp_path / name))
+
+        h5m_filename = str(self.tmp_path / "dagmc.h5m")
+        with use_mock_cubit() as cubit:
+            cad_to_h5m(
+                files_with_tags=[
+                    {"cad_filename": cad_filenames[0], "material_tag": "coil"},
+                    {"cad_filename": cad_filenames[1], "material_tag": "coil"},
+                ],
+                h5m_filename=h5m_filename,
+                deduplicate=True,
+                verbose=False,
+            )
+            imports = [c for c in cubit.commands if c.startswith("import")]
+
+        assert len(imports) == 1
+        assert "volume 1 copy" in cubit.commands
+        assert 'group "coil_2.stp" add volume 2' in cubit.commands
+        assert inspect_h5m(h5m_filename).materials["mat:coil"].volume_ids == [1, 2]
+
+    def test_identical_volumes_are_healed_once(self):
+        """Checks that one of each set of identical volumes is healed, that the
+        others are replaced by moved copies and that only the scaled volume is
+        healed again after scaling"""
+
+        geometry_details_filename = str(self.tmp_path / "details.json")
+        with use_mock_cubit() as cubit:
+            cad_to_h5m(
+                files_with_tags=[
+                    {"cad_filename": "tests/blanket.stp", "material_tag": "mat1"},
+                    {"cad_filename": "tests/steel.stp", "material_tag": "mat2"},
+                    {
+                        "cad_filename": "tests/pf_coil_1.stp",
+                        "material_tag": "mat3",
+                        "scale": 10,
+                    },
+                ],
+                h5m_filename=str(self.tmp_path / "dagmc.h5m"),
+                geometry_details_filename=geometry_details_filename,
+                autoheal=True,
+                deduplicate=True,
+                profile=True,
+                verbose=False,
+            )
+            heals = [c for c in cubit.commands if c.startswith("healer")]
+
+        with open(geometry_details_filename) as infile:
+            geometry_details = json.load(infile)
+        with open(self.tmp_path / "details_profile.json") as infile:
+            profile = json.load(infile)
+
+        # the overlap of each copy with its duplicate takes a volume id
+        assert heals == ["healer autoheal vol 1", "healer autoheal vol 9"]
+        assert [entry["volumes"] for entry in geometry_details] == [
+            ["1", "5"],
+            ["7"],
+            ["9"],
+        ]
+        assert profile["details"]["deduplication"] == {
+            "copied_entries": 0,
+            "healed_volumes": 1,
+            "copied_volumes": 3,
+        }
+
+    def test_rotated_copy(self):
+        """Checks that a volume rotated about the z axis is found as a
+        duplicate and replaced by a rotated copy"""
+
+        with use_mock_cubit() as cubit:
+            cubit.init([])
+            cubit.cmd('import step "tests/steel.stp"')
+            cubit.cmd("volume 1 move x 10 y 0 z 0")
+            cubit.cmd("volume 1 copy rotate 90 about z")
+
+            assert find_duplicate_volumes([1, 2], cubit) == {1: [2]}
+            copy = copy_into_place(1, 2, cubit)
+
+            assert copy == 3
+            assert cubit.commands[-3:] == [
+                "volume 1 copy rotate 90 about z",
+                "intersect volume 3 2 keep",
+                "delete volume 4",
+            ]
+            assert cubit.get_bounding_box("volume", 3) == cubit.get_bounding_box(
+                "volume", 2
+            )
+
+    def test_mirror_image_is_not_replaced(self):
+        """Checks that a mirror image with the same fingerprint and bounding
+        box as the healed volume is healed instead of being replaced by a copy
+        that does not fill it"""
+
+        with use_mock_cubit() as cubit:
+            cubit.init([])
+            cubit.cmd('import step "tests/steel.stp"')
+            cubit.cmd("volume 1 copy")
+            cubit.cmd("volume 2 reflect x")
+            cubit.cmd("volume 2 move x 2 y 0 z 0")
+
+            assert find_duplicate_volumes([1, 2], cubit) == {1: [2]}
+            assert copy_into_place(1, 2, cubit) is None
+            assert sorted(cubit.volumes) == [1, 2]
+
+            geometry_details = [
+                {"cad_filename": "tests/steel.stp", "volumes": ["1"]},
+                {"cad_filename": "tests/steel.stp", "volumes": ["2"]},
+            ]
+            report = heal_unique_volumes(geometry_details, cubit)
+
+        assert [entry["volumes"] for entry in geometry_details] == [["1"], ["2"]]
+        assert report.healed_volumes == 2
+        assert report.copied_volumes == 0
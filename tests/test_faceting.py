@@ -0,0 +1,114 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from cad_to_h5m import Converter, cad_to_h5m
+from cad_to_h5m.faceting import faceting_filename, search_faceting_tolerance
+from cad_to_h5m.inspect import count_triangles
+from cad_to_h5m.mock_cubit import MOCK_CUBIT_PATH, use_mock_cubit
+
+
+class TestFaceting(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.tmp_path = Path(self.tmp_dir.name)
+        self.files_with_tags = [
+            {"cad_filename": "tests/blanket.stp", "material_tag": "mat1"},
+            {"cad_filename": "tests/steel.stp", "material_tag": "mat2"},
+        ]
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def search(self, **kwargs):
+        with use_mock_cubit() as cubit:
+            cubit.init([])
+            cubit.cmd('import step "tests/blanket.stp"')
+            cubit.cmd('group "mat:mat1" add volume 1 2')
+            return search_faceting_tolerance(
+                str(self.tmp_path / "dagmc.h5m"), cubit, verbose=False, **kwargs
+            )
+
+    def test_finest_tolerance_within_triangle_budget(self):
+        """Checks that the chosen tolerance fits the budget and that the trials
+        at smaller tolerances exceed it"""
+
+        search = self.search(triangle_budget=1000)
+
+        assert search.triangles <= 1000
+        assert count_triangles(str(self.tmp_path / "dagmc.h5m")) == search.triangles
+        assert search.faceting_tolerance < 1.0e-2
+        tolerances = [trial.faceting_tolerance for trial in search.trials]
+        assert tolerances == sorted(tolerances)
+        for trial in search.trials:
+            if trial.faceting_tolerance < search.faceting_tolerance:
+                assert trial.triangles > 1000
+
+    def test_parallel_search_matches_budget(self):
+        """Checks that searching in worker processes from a saved session gives
+        a tolerance within the budget"""
+
+        search = self.search(
+            triangle_budget=1000, workers=3, max_trials=8, cubit_path=MOCK_CUBIT_PATH
+        )
+
+        assert search.triangles <= 1000
+        assert len(search.trials) == 8
+
+    def test_max_chord_deviation_and_unreachable_budget(self):
+        """Checks that the max_chord_deviation is used as the tolerance and that
+        a budget that can't be met raises an error"""
+
+        search = self.search(max_chord_deviation=1.0e-3)
+        assert search.faceting_tolerance == 1.0e-3
+        assert len(search.trials) == 1
+
+        self.assertRaises(ValueError, self.search, triangle_budget=10)
+        self.assertRaises(ValueError, self.search)
+
+    def test_max_chord_deviation_with_triangle_budget(self):
+        """Checks that with a max_chord_deviation and a triangle_budget the
+        coarsest tolerance that meets the deviation is used when it fits the
+        budget and that an error is raised when it doesn't"""
+
+        search = self.search(max_chord_deviation=1.0e-2, triangle_budget=100000)
+        assert search.faceting_tolerance == 1.0e-2
+        assert [trial.faceting_tolerance for trial in search.trials] == [1.0e-2]
+        assert search.triangles <= 100000
+
+        with self.assertRaisesRegex(ValueError, "exceeds the triangle_budget"):
+            self.search(
+                max_chord_deviation=1.0e-2, triangle_budget=search.triangles - 1
+            )
+
+    def test_cad_to_h5m_saves_search(self):
+        """Checks that cad_to_h5m saves the trade off curve next to the h5m"""
+
+        h5m_filename = str(self.tmp_path / "dagmc.h5m")
+        with use_mock_cubit():
+            cad_to_h5m(
+                files_with_tags=self.files_with_tags,
+                h5m_filename=h5m_filename,
+                triangle_budget=500,
+                verbose=False,
+            )
+
+        with open(faceting_filename(h5m_filename)) as infile:
+            search = json.load(infile)
+        assert search["triangles"] == count_triangles(h5m_filename)
+        assert search["triangles"] <= 500
+        assert len(search["trials"]) > 2
+
+    def test_converter_reset_clears_search(self):
+        """Checks that a reused Converter doesn't keep the search of an earlier
+        conversion"""
+
+        with use_mock_cubit():
+            converter = Converter(verbose=False)
+            converter.import_files(self.files_with_tags)
+            converter.export(str(self.tmp_path / "dagmc.h5m"), triangle_budget=500)
+            assert converter.faceting_search is not None
+            converter.reset()
+
+        assert converter.faceting_search is None
@@ -0,0 +1,97 @@
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from cad_to_h5m import cad_to_h5m
+from cad_to_h5m.mock_cubit import use_mock_cubit
+
+
+class TestIncremental(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.tmp_path = Path(self.tmp_dir.name)
+        for filename in ["blanket.stp", "steel.stp", "pf_coil_1.stp"]:
+            shutil.copy(Path("tests") / filename, self.tmp_path / filename)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def convert(self, autoheal=False):
+        files_with_tags = [
+            {"cad_filename": str(self.tmp_path / "blanket.stp"), "material_tag": "m1"},
+            {"cad_filename": str(self.tmp_path / "steel.stp"), "material_tag": "m2"},
+            {
+                "cad_filename": str(self.tmp_path / "pf_coil_1.stp"),
+                "material_tag": "m3",
+            },
+        ]
+        with use_mock_cubit() as cubit:
+            cad_to_h5m(
+                files_with_tags=files_with_tags,
+                h5m_filename=str(self.tmp_path / "dagmc.h5m"),
+                incremental_dir=str(self.tmp_path / "incremental"),
+                autoheal=autoheal,
+                verbose=False,
+            )
+            imports = [command for command in cubit.commands if "import" in command]
+        return files_with_tags, imports, cubit.commands
+
+    def test_only_changed_files_are_imported(self):
+        """Checks that the first conversion imports every file, a conversion
+        with unchanged files imports none and a conversion after a file has
+        changed deletes and imports only that file"""
+
+        files_with_tags, imports, _ = self.convert()
+        assert len(imports) == 3
+        assert [entry["volumes"] for entry in files_with_tags] == [
+            ["1", "2"],
+            ["3"],
+            ["4"],
+        ]
+
+        files_with_tags, imports, commands = self.convert()
+        assert imports == []
+        assert "imprint body all" in commands
+        assert [entry["volumes"] for entry in files_with_tags] == [
+            ["1", "2"],
+            ["3"],
+            ["4"],
+        ]
+
+        with open(self.tmp_path / "steel.stp", "a") as outfile:
+            outfile.write("/* edited */\n")
+
+        files_with_tags, imports, commands = self.convert()
+        assert len(imports) == 1
+        assert "steel.stp" in imports[0]
+        assert "delete volume 3" in commands
+        assert [entry["volumes"] for entry in files_with_tags] == [
+            ["1", "2"],
+            ["5"],
+            ["4"],
+        ]
+
+    def test_only_changed_volumes_are_validated_and_healed(self):
+        """Checks that a conversion after one file has changed validates and
+        heals only the volumes imported from that file and not the volumes
+        restored from the session"""
+
+        self.convert(autoheal=True)
+        with open(self.tmp_path / "steel.stp", "a") as outfile:
+            outfile.write("/* edited */\n")
+
+        _, _, commands = self.convert(autoheal=True)
+        start = next(i for i, command in enumerate(commands) if "open" in command)
+        end = next(i for i, command in enumerate(commands) if "save as" in command)
+        assert commands[start + 1 : end] == [
+            "delete volume 3",
+            f'import step "{self.tmp_path / "steel.stp"}" separate_bodies '
+            "no_surfaces no_curves no_vertices ",
+            'group "steel.stp" add volume 5',
+            "separate body all",
+            "validate vol 5",
+            "healer autoheal vol 5",
+        ]
+        assert "validate vol all" not in commands
+        assert "healer autoheal vol all" not in commands
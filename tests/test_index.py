@@ -0,0 +1,68 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from cad_to_h5m import GeometryIndex, cad_to_h5m
+from cad_to_h5m.mock_cubit import use_mock_cubit
+
+
+class TestGeometryIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.tmp_path = Path(self.tmp_dir.name)
+        self.index_filename = str(self.tmp_path / "index.npz")
+        with use_mock_cubit():
+            cad_to_h5m(
+                files_with_tags=[
+                    {"cad_filename": "tests/blanket.stp", "material_tag": "mat1"},
+                    {
+                        "cad_filename": "tests/steel.stp",
+                        "material_tag": "mat2",
+                        "surface_reflectivity": True,
+                    },
+                ],
+                h5m_filename=str(self.tmp_path / "dagmc.h5m"),
+                geometry_index_filename=self.index_filename,
+                verbose=False,
+            )
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_lookups(self):
+        """Checks the lookups by material, file and point of a saved index"""
+
+        index = GeometryIndex.load(self.index_filename)
+
+        assert len(index) == 3
+        assert index.volumes_of_material("mat1").tolist() == [1, 2]
+        assert index.volumes_of_file("tests/steel.stp").tolist() == [3]
+        assert index.volumes_containing_point([1.5, 0.5, 0.5]).tolist() == [2]
+        assert index.volumes_containing_point([1.0, 0.5, 0.5]).tolist() == [1, 2]
+        assert index.volumes_containing_point([10, 10, 10]).tolist() == []
+        assert index.bounding_box_of_volume(3).tolist() == [2, 0, 0, 3, 1, 1]
+
+    def test_volume_properties(self):
+        """Checks the volume, surfaces, reflectors and triangles of volumes"""
+
+        index = GeometryIndex.load(self.index_filename)
+
+        assert index.volumes.tolist() == [1.0, 1.0, 1.0]
+        assert index.surfaces_of_volume(2).tolist() == [7, 8, 9, 10, 11, 12]
+        assert index.triangles.tolist() == [12, 12, 12]
+        # the y = 0 face of volume 3 contains the z axis so is a reflector
+        assert index.reflecting_surfaces().tolist() == [15]
+        self.assertRaises(ValueError, index.surfaces_of_volume, 4)
+
+    def test_wrong_suffix(self):
+        """Checks that an index filename without the .npz suffix is rejected"""
+
+        def incorrect_suffix():
+            cad_to_h5m(
+                files_with_tags=[
+                    {"cad_filename": "tests/steel.stp", "material_tag": "mat1"}
+                ],
+                geometry_index_filename="index.json",
+            )
+
+        self.assertRaises(ValueError, incorrect_suffix)
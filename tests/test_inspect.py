@@ -0,0 +1,138 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import h5py
+import numpy as np
+
+from cad_to_h5m.inspect import (
+    count_triangles,
+    count_volume_triangles,
+    inspect_h5m,
+    material_tags,
+)
+
+
+def opaque(text, size=32):
+    return np.void(text.encode("ascii").ljust(size, b"\x00"))
+
+
+def write_two_volume_h5m(filename):
+    """Writes a MOAB h5m file with two volumes that share a surface. Volume 1
+    is in the mat:steel group and volume 2 in the mat:water group."""
+
+    # nodes have handles 1 to 8 and triangles 9 to 14
+    coordinates = np.array(
+        [
+            [0, 0, 0],
+            [1, 0, 0],
+            [0, 1, 0],
+            [1, 1, 0],
+            [0, 0, 1],
+            [1, 0, 1],
+            [0, 0, 2],
+            [1, 0, 2],
+        ],
+        dtype=float,
+    )
+    connectivity = np.array(
+        [[1, 2, 3], [2, 4, 3], [1, 2, 5], [2, 6, 5], [5, 6, 7], [6, 8, 7]]
+    )
+
+    # sets have handles 15 to 21, surfaces 15 to 17, volumes 18 and 19 and
+    # groups 20 and 21. The first surface contents are ranged, the others are
+    # explicit handle lists.
+    contents = [
+        [1, 4, 9, 2],
+        [1, 2, 5, 6, 11, 12],
+        [5, 6, 7, 8, 13, 14],
+        [],
+        [],
+        [18],
+        [19],
+    ]
+    children = [[], [], [], [15, 16], [16, 17], [], []]
+    flags = [0x8, 0, 0, 0, 0, 0, 0]
+    set_list = np.zeros((7, 4), dtype=np.int64)
+    set_list[:, 0] = np.cumsum([len(c) for c in contents]) - 1
+    set_list[:, 1] = np.cumsum([len(c) for c in children]) - 1
+    set_list[:, 2] = -1
+    set_list[:, 3] = flags
+
+    with h5py.File(filename, "w") as h5m_file:
+        nodes = h5m_file.create_dataset("tstt/nodes/coordinates", data=coordinates)
+        nodes.attrs["start_id"] = 1
+        tris = h5m_file.create_dataset(
+            "tstt/elements/Tri3/connectivity", data=connectivity
+        )
+        tris.attrs["start_id"] = 9
+        sets = h5m_file.create_dataset("tstt/sets/list", data=set_list)
+        sets.attrs["start_id"] = 15
+        h5m_file.create_dataset(
+            "tstt/sets/contents", data=np.concatenate(contents).astype(np.int64)
+        )
+        h5m_file.create_dataset(
+            "tstt/sets/children", data=np.concatenate(children).astype(np.int64)
+        )
+        h5m_file.create_dataset("tstt/sets/parents", data=np.zeros(0, np.int64))
+        h5m_file.create_dataset("tstt/sets/tags/GLOBAL_ID", data=[1, 2, 3, 1, 2, 1, 2])
+
+        categories = ["Surface"] * 3 + ["Volume"] * 2 + ["Group"] * 2
+        h5m_file.create_dataset("tstt/tags/CATEGORY/id_list", data=np.arange(15, 22))
+        h5m_file.create_dataset(
+            "tstt/tags/CATEGORY/values",
+            data=np.array([opaque(c) for c in categories]),
+        )
+        h5m_file.create_dataset("tstt/tags/NAME/id_list", data=[20, 21])
+        h5m_file.create_dataset(
+            "tstt/tags/NAME/values",
+            data=np.array([opaque("mat:steel"), opaque("mat:water")]),
+        )
+
+
+class TestInspect(unittest.TestCase):
+    """Tests reading the volumes and materials of a h5m file with h5py"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.h5m_filename = str(Path(self.tmp_dir.name) / "dagmc.h5m")
+        write_two_volume_h5m(self.h5m_filename)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_volume_triangles_vertices_and_bounding_boxes(self):
+        """Checks the counts and bounding boxes of volumes that share a surface"""
+
+        summary = inspect_h5m(self.h5m_filename)
+
+        assert summary.triangles == 6
+        assert summary.vertices == 8
+        assert summary.volume_ids.tolist() == [1, 2]
+        assert summary.volume_triangles.tolist() == [4, 4]
+        assert summary.volume_vertices.tolist() == [6, 6]
+        assert summary.volume_bounding_boxes.tolist() == [
+            [0, 0, 0, 1, 1, 1],
+            [0, 0, 0, 1, 0, 2],
+        ]
+
+    def test_material_groups(self):
+        """Checks that the mat: groups are found with their volumes"""
+
+        summary = inspect_h5m(self.h5m_filename)
+
+        assert material_tags(self.h5m_filename) == ["mat:steel", "mat:water"]
+        assert summary.materials["mat:steel"].volume_ids == [1]
+        assert summary.materials["mat:water"].triangles == 4
+        assert summary.materials["mat:water"].bounding_box == [0, 0, 0, 1, 0, 2]
+        assert summary.to_dict()["volumes"][2]["vertices"] == 6
+
+    def test_count_triangles(self):
+        """Checks the triangle count is read from the connectivity table shape"""
+
+        assert count_triangles(self.h5m_filename) == 6
+
+    def test_count_volume_triangles(self):
+        """Checks that a shared surface is counted for both of its volumes"""
+
+        assert count_volume_triangles(self.h5m_filename) == {1: 4, 2: 4}
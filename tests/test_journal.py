@@ -0,0 +1,121 @@
+import io
+import json
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from pathlib import Path
+
+from cad_to_h5m import cad_to_h5m
+from cad_to_h5m.cli import main
+from cad_to_h5m.journal import journal_manifest_filename, replay_journal
+from cad_to_h5m.mock_cubit import MOCK_CUBIT_PATH, read_state, use_mock_cubit
+
+
+class TestJournal(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.tmp_path = Path(self.tmp_dir.name)
+        self.cad_filename = str(self.tmp_path / "steel.stp")
+        shutil.copyfile("tests/steel.stp", self.cad_filename)
+        self.h5m_filename = str(self.tmp_path / "dagmc.h5m")
+        self.exo_filename = str(self.tmp_path / "mesh.exo")
+        self.journal_filename = str(self.tmp_path / "dagmc.jou")
+        with use_mock_cubit() as cubit:
+            cad_to_h5m(
+                files_with_tags=[
+                    {"cad_filename": "tests/blanket.stp", "material_tag": "mat1"},
+                    {
+                        "cad_filename": self.cad_filename,
+                        "material_tag": "mat2",
+                        "tet_mesh": "size 0.5",
+                        "scale": 10,
+                    },
+                ],
+                h5m_filename=self.h5m_filename,
+                exo_filename=self.exo_filename,
+                journal_filename=self.journal_filename,
+                verbose=False,
+            )
+            self.commands = list(cubit.commands)
+        self.state = read_state(self.h5m_filename)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_journal_and_manifest(self):
+        """Checks that the journal holds the commands of the conversion and
+        that the manifest lists the volumes and outputs"""
+
+        with open(self.journal_filename) as infile:
+            lines = [line.rstrip("\n") for line in infile if not line.startswith("#")]
+        with open(journal_manifest_filename(self.journal_filename)) as infile:
+            manifest = json.load(infile)
+
+        assert lines == self.commands[:-1]
+        assert "volume 3  scale  10" in lines
+        assert manifest["geometry_details"][1]["volumes"] == ["3"]
+        assert manifest["outputs"] == {
+            "h5m": self.h5m_filename,
+            "exo": self.exo_filename,
+        }
+
+    def test_replay_matches_conversion(self):
+        """Checks that replaying the journal with the mock Cubit module sends
+        the same commands and writes the same h5m and exo files"""
+
+        Path(self.h5m_filename).unlink()
+        Path(self.exo_filename).unlink()
+        with use_mock_cubit() as cubit:
+            replay_journal(self.journal_filename, cubit_path=MOCK_CUBIT_PATH)
+            replayed = cubit.commands
+
+        assert replayed[0] == f'playback "{self.journal_filename}"'
+        assert replayed[1:] == self.commands
+        assert read_state(self.h5m_filename) == self.state
+        assert Path(self.exo_filename).is_file()
+
+    def test_replay_from_command_line(self):
+        """Checks that the command replays a journal given instead of a
+        manifest"""
+
+        Path(self.h5m_filename).unlink()
+        output = io.StringIO()
+        with use_mock_cubit(), redirect_stdout(output):
+            assert main([self.journal_filename]) == 0
+
+        assert self.h5m_filename in output.getvalue().split()
+        assert read_state(self.h5m_filename) == self.state
+
+    def test_changed_cad_file(self):
+        """Checks that a journal is not replayed once a CAD file has changed"""
+
+        with open(self.cad_filename, "a") as outfile:
+            outfile.write("/* changed */\n")
+
+        with use_mock_cubit():
+            self.assertRaises(ValueError, replay_journal, self.journal_filename)
+
+    def test_unsupported_options(self):
+        """Checks that options that can't be recorded in a journal are
+        rejected"""
+
+        def record_with_cache():
+            cad_to_h5m(
+                files_with_tags=[
+                    {"cad_filename": self.cad_filename, "material_tag": "mat1"}
+                ],
+                journal_filename=self.journal_filename,
+                cache_dir=str(self.tmp_path / "cache"),
+            )
+
+        def record_with_wrong_suffix():
+            cad_to_h5m(
+                files_with_tags=[
+                    {"cad_filename": self.cad_filename, "material_tag": "mat1"}
+                ],
+                journal_filename=str(self.tmp_path / "dagmc.txt"),
+            )
+
+        self.assertRaises(ValueError, record_with_cache)
+        self.assertRaises(ValueError, record_with_wrong_suffix)
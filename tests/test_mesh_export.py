@@ -0,0 +1,172 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+import h5py
+import numpy as np
+
+from cad_to_h5m import cad_to_h5m
+from cad_to_h5m.mesh_export import export_tet_mesh
+from cad_to_h5m.mock_cubit import use_mock_cubit
+
+
+def read_vtu(filename):
+    """Returns the arrays of a .vtu file with raw appended data by name"""
+    with open(filename, "rb") as infile:
+        contents = infile.read()
+    header, data = contents.split(b'<AppendedData encoding="raw">\n_', 1)
+    arrays = {}
+    for element in header.decode("ascii").split("<DataArray ")[1:]:
+        attributes = dict(
+            part.split('="') for part in element.split('"/>')[0].split('" ')
+        )
+        offset = int(attributes["offset"])
+        size = int(np.frombuffer(data, "<u8", count=1, offset=offset)[0])
+        dtype = {"Float64": "<f8", "Int64": "<i8", "Int32": "<i4", "UInt8": "u1"}
+        arrays[attributes["Name"]] = np.frombuffer(
+            data[offset + 8 : offset + 8 + size], dtype[attributes["type"]]
+        )
+    return arrays
+
+
+class TestMeshExport(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.tmp_path = Path(self.tmp_dir.name)
+        self.files_with_tags = [
+            {
+                "cad_filename": "tests/steel.stp",
+                "material_tag": "steel",
+                "tet_mesh": "size 0.5",
+            },
+            {
+                "cad_filename": "tests/blanket.stp",
+                "material_tag": "water",
+                "tet_mesh": "size 0.25",
+            },
+            {
+                "cad_filename": "tests/steel.stp",
+                "material_tag": "steel",
+                "tet_mesh": "size 0.5",
+            },
+            {"cad_filename": "tests/pf_coil_1.stp", "material_tag": "copper"},
+        ]
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_mesh_files_and_material_stats(self):
+        """Checks that the tet mesh is written to h5m and vtu files with the
+        volume and material of each tet and that the tets and their volumes
+        are counted for each entry and material"""
+
+        mesh_h5m_filename = str(self.tmp_path / "mesh.h5m")
+        mesh_vtu_filename = str(self.tmp_path / "mesh.vtu")
+        geometry_details_filename = str(self.tmp_path / "geometry_details.json")
+        with use_mock_cubit():
+            cad_to_h5m(
+                files_with_tags=self.files_with_tags,
+                h5m_filename=str(self.tmp_path / "dagmc.h5m"),
+                geometry_details_filename=geometry_details_filename,
+                mesh_h5m_filename=mesh_h5m_filename,
+                mesh_vtu_filename=mesh_vtu_filename,
+                profile=True,
+                verbose=False,
+            )
+
+        with open(geometry_details_filename) as infile:
+            geometry_details = json.load(infile)
+        with open(self.tmp_path / "geometry_details_profile.json") as infile:
+            stats = json.load(infile)["details"]["tet_mesh"]
+        assert list(stats) == ["steel", "water"]
+        assert stats["steel"]["volume_ids"] == [1, 4]
+        # the tets of the mock fill the unit cube volumes
+        assert abs(stats["steel"]["volume"] - 2.0) < 1e-9
+        assert abs(stats["water"]["volume"] - 2.0) < 1e-9
+        assert [entry.get("tets") for entry in geometry_details] == [66, 1092, 66, None]
+        assert stats["steel"]["tets"] == 132
+
+        with h5py.File(mesh_h5m_filename, "r") as h5m_file:
+            connectivity = h5m_file["tstt/elements/Tet4/connectivity"][...]
+            coordinates = h5m_file["tstt/nodes/coordinates"][...]
+            set_start = h5m_file["tstt/sets/list"].attrs["start_id"]
+            material_sets = h5m_file["tstt/tags/MATERIAL_SET/values"][...]
+            names = h5m_file["tstt/tags/NAME/values"][...]
+        assert connectivity.shape == (1224, 4)
+        assert connectivity.min() == 1
+        assert connectivity.max() == len(coordinates)
+        assert material_sets.tolist() == [1, 2, 3, 4]
+        assert [name.tobytes().rstrip(b"\x00") for name in names] == [
+            b"mat:steel",
+            b"mat:water",
+        ]
+        assert set_start == len(coordinates) + len(connectivity) + 1
+
+        arrays = read_vtu(mesh_vtu_filename)
+        assert np.array_equal(arrays["Points"].reshape(-1, 3), coordinates)
+        assert np.array_equal(arrays["connectivity"].reshape(-1, 4), connectivity - 1)
+        assert arrays["offsets"][-1] == 4 * 1224
+        assert set(arrays["types"].tolist()) == {10}
+        assert np.bincount(arrays["volume_id"]).tolist() == [0, 66, 546, 546, 66]
+        assert np.bincount(arrays["material_id"]).tolist() == [132, 1092]
+
+    def test_chunks_and_blocks_give_the_same_mesh(self):
+        """Checks that writing the mesh in small chunks, reading the tets from
+        blocks and writing only a vtu file give the same mesh"""
+
+        with use_mock_cubit() as cubit:
+            cubit.init([])
+            for _ in range(2):
+                cubit.cmd('import step "tests/steel.stp"')
+            cubit.cmd("volume 2 size 0.3")
+            cubit.cmd("mesh volume 1 2")
+            geometry_details = [
+                {"volumes": ["1"], "material_tag": "a", "tet_mesh": "size 0.2"},
+                {"volumes": ["2"], "material_tag": "b", "tet_mesh": "size 0.3"},
+            ]
+
+            vtu_files = []
+            for index, kwargs in enumerate(
+                [{}, {"chunk_size": 7}, {"chunk_size": 100, "from_blocks": True}]
+            ):
+                vtu_files.append(str(self.tmp_path / f"mesh_{index}.vtu"))
+                stats = export_tet_mesh(
+                    geometry_details, cubit, vtu_filename=vtu_files[-1], **kwargs
+                )
+                assert stats["b"].tets == 312
+
+        meshes = [read_vtu(filename) for filename in vtu_files]
+        for mesh in meshes[1:]:
+            for name, values in meshes[0].items():
+                assert np.array_equal(mesh[name], values)
+
+    def test_cached_mesh_conversion(self):
+        """Checks that converting the same entries twice with a mesh output is
+        a cache hit even though the tets were added to the entries"""
+
+        cache_dir = self.tmp_path / "cache"
+        with use_mock_cubit():
+            for _ in range(2):
+                cad_to_h5m(
+                    files_with_tags=self.files_with_tags,
+                    h5m_filename=str(self.tmp_path / "dagmc.h5m"),
+                    mesh_h5m_filename=str(self.tmp_path / "mesh.h5m"),
+                    cache_dir=str(cache_dir),
+                    verbose=False,
+                )
+
+        assert self.files_with_tags[0]["tets"] == 66
+        assert len(list(cache_dir.iterdir())) == 1
+
+    def test_mesh_filenames_are_checked(self):
+        """Checks that mesh filenames with the wrong suffix are rejected"""
+
+        with self.assertRaises(ValueError):
+            cad_to_h5m(self.files_with_tags, mesh_h5m_filename="mesh.vtu")
+        with self.assertRaises(ValueError):
+            cad_to_h5m(self.files_with_tags, mesh_vtu_filename="mesh.vtk")
+
+
+if __name__ == "__main__":
+    unittest.main()
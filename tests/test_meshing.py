@@ -0,0 +1,216 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from cad_to_h5m import cad_to_h5m
+from cad_to_h5m.meshing import (
+    BYTES_PER_TET,
+    create_tet_mesh,
+    estimate_element_size,
+    estimate_tet_count,
+    find_mesh_shards,
+)
+from cad_to_h5m.mock_cubit import MOCK_CUBIT_PATH, use_mock_cubit
+
+
+class TestMeshing(unittest.TestCase):
+    def setUp(self):
+        self.files_with_tags = [
+            {
+                "cad_filename": "tests/blanket.stp",
+                "material_tag": "mat1",
+                "tet_mesh": "size 0.5",
+            },
+            {
+                "cad_filename": "tests/steel.stp",
+                "material_tag": "mat2",
+                "tet_mesh": "size 0.25",
+            },
+            {"cad_filename": "tests/pf_coil_1.stp", "material_tag": "mat3"},
+        ]
+
+    def test_shards_are_balanced(self):
+        """Checks that only volumes with a tet_mesh key are sharded and that no
+        more shards than requested are made"""
+
+        geometry_details = [
+            {"volumes": ["1", "2"], "tet_mesh": "size 0.5"},
+            {"volumes": ["3"], "tet_mesh": "size 0.25"},
+            {"volumes": ["4"]},
+        ]
+        with use_mock_cubit() as cubit:
+            cubit.init([])
+            cubit.cmd('import step "tests/blanket.stp"')
+            cubit.cmd('import step "tests/blanket.stp"')
+            shards = find_mesh_shards(geometry_details, cubit, 2)
+
+        assert len(shards) == 2
+        assert sorted(len(shard) for shard in shards) == [1, 2]
+        tet_mesh_of_volume = {
+            volume: tet_mesh for shard in shards for volume, tet_mesh in shard.items()
+        }
+        assert tet_mesh_of_volume == {
+            "1": "size 0.5",
+            "2": "size 0.5",
+            "3": "size 0.25",
+        }
+
+    def test_parallel_mesh_matches_serial_mesh(self):
+        """Checks that meshing in worker processes produces the same exo file
+        as meshing in a single session"""
+
+        tets = []
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for mesh_workers in [1, 2]:
+                exo_filename = str(Path(tmp_dir) / f"mesh_{mesh_workers}.exo")
+                with use_mock_cubit():
+                    cad_to_h5m(
+                        files_with_tags=[dict(entry) for entry in self.files_with_tags],
+                        h5m_filename=str(Path(tmp_dir) / "dagmc.h5m"),
+                        exo_filename=exo_filename,
+                        cubit_path=MOCK_CUBIT_PATH,
+                        mesh_workers=mesh_workers,
+                        verbose=False,
+                    )
+                with open(exo_filename) as infile:
+                    tets.append(json.load(infile)["tets"])
+
+        assert sorted(tets[0]) == ["1", "2", "3"]
+        assert tets[0] == tets[1]
+
+    def test_sizes_are_fitted_to_targets(self):
+        """Checks that the sizes of entries with a target number of tets or a
+        memory budget are fitted so the meshes are within the tolerance of the
+        target, that the instructions of other entries are kept and that the
+        entries are not changed"""
+
+        geometry_details = [
+            {"volumes": ["1", "2"], "tet_mesh": {"tets": 10000}},
+            {
+                "volumes": ["3"],
+                "tet_mesh": {"memory": 1000 * BYTES_PER_TET, "tolerance": 0.02},
+            },
+            {"volumes": ["4"], "tet_mesh": "size 0.5"},
+        ]
+        original_details = json.loads(json.dumps(geometry_details))
+        with use_mock_cubit() as cubit:
+            cubit.init([])
+            cubit.cmd('import step "tests/blanket.stp"')
+            cubit.cmd('import step "tests/steel.stp"')
+            cubit.cmd('import step "tests/steel.stp"')
+            fits = create_tet_mesh(geometry_details, cubit)
+            tets = [
+                len(cubit.parse_cubit_list("tet", f"in volume {volumes}"))
+                for volumes in ["1 2", "3", "4"]
+            ]
+            trial_meshes = [c for c in cubit.commands if c.startswith("delete mesh")]
+
+        assert abs(tets[0] - 10000) <= 1000
+        assert abs(tets[1] - 1000) <= 20
+        assert tets[2] == 66
+        assert geometry_details == original_details
+        assert [fit.volume_ids for fit in fits] == [["1", "2"], ["3"]]
+        assert [fit.tets[-1] for fit in fits] == tets[:2]
+        assert fits[1].size == fits[1].sizes[-1]
+        assert len(trial_meshes) >= 2
+
+    def test_parallel_fit_matches_serial_fit(self):
+        """Checks that the sizes of targets are fitted with the same commands,
+        including the mesh settings, when meshing in worker processes as when
+        meshing in a single session"""
+
+        files_with_tags = [
+            dict(self.files_with_tags[1], tet_mesh={"tets": 2000}),
+            self.files_with_tags[2],
+        ]
+        fit_commands = []
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for mesh_workers in [1, 2]:
+                with use_mock_cubit() as cubit:
+                    cad_to_h5m(
+                        files_with_tags=[dict(entry) for entry in files_with_tags],
+                        h5m_filename=str(Path(tmp_dir) / "dagmc.h5m"),
+                        exo_filename=str(Path(tmp_dir) / "mesh.exo"),
+                        cubit_path=MOCK_CUBIT_PATH,
+                        mesh_workers=mesh_workers,
+                        verbose=False,
+                    )
+                start = cubit.commands.index("Trimesher volume gradation 1.3")
+                end = next(
+                    index
+                    for index, command in enumerate(cubit.commands)
+                    if command.startswith(("volume all scheme", "save as"))
+                )
+                fit_commands.append(cubit.commands[start:end])
+
+        assert "mesh volume 1" in fit_commands[0]
+        assert fit_commands[0] == fit_commands[1]
+
+    def test_failed_meshes_are_reported(self):
+        """Checks that a trial mesh or a remesh of an entry with a target that
+        makes no tets raises an error naming the volumes instead of failing
+        to fit the size"""
+
+        for tet_counts in [[0], [500, 0]]:
+            geometry_details = [{"volumes": ["1", "2"], "tet_mesh": {"tets": 10000}}]
+            with use_mock_cubit() as cubit:
+                cubit.init([])
+                cubit.cmd('import step "tests/blanket.stp"')
+                with patch(
+                    "cad_to_h5m.meshing.count_tets", side_effect=tet_counts
+                ), self.assertRaisesRegex(RuntimeError, "volumes 1 to 2 failed"):
+                    create_tet_mesh(geometry_details, cubit)
+
+    def test_targets_are_cached(self):
+        """Checks that converting entries with a target twice is a cache hit
+        and that the fitted sizes are saved in the profile"""
+
+        files_with_tags = [
+            dict(self.files_with_tags[1], tet_mesh={"tets": 2000}),
+            self.files_with_tags[2],
+        ]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache_dir = Path(tmp_dir) / "cache"
+            with use_mock_cubit():
+                for _ in range(2):
+                    cad_to_h5m(
+                        files_with_tags=files_with_tags,
+                        h5m_filename=str(Path(tmp_dir) / "dagmc.h5m"),
+                        exo_filename=str(Path(tmp_dir) / "mesh.exo"),
+                        cache_dir=str(cache_dir),
+                        profile=True,
+                        verbose=False,
+                    )
+            with open(Path(tmp_dir) / "dagmc_profile.json") as infile:
+                fits = json.load(infile)["details"]["tet_mesh_fits"]
+
+            assert len(list(cache_dir.iterdir())) == 1
+        assert fits[0]["volume_ids"] == ["1"]
+        assert abs(fits[0]["tets"][-1] - 2000) <= 200
+
+    def test_element_size_estimate(self):
+        """Checks that the estimated element size gives the target number of
+        tets and that a larger surface area gives a larger size"""
+
+        size = estimate_element_size(5000, volume=2.0, area=12.0)
+        assert abs(estimate_tet_count(size, 2.0, 12.0) - 5000) < 1e-6
+        assert estimate_element_size(5000, volume=2.0, area=24.0) > size
+
+    def test_invalid_targets_are_rejected(self):
+        """Checks that tet_mesh targets without a single target, with unknown
+        keys or with tolerances outside 0 to 1 are rejected"""
+
+        for tet_mesh in [
+            {},
+            {"tets": 1000, "memory": 1e9},
+            {"tets": 1000, "size": 0.5},
+            {"tets": -1},
+            {"memory": "1GB"},
+            {"tets": 1000, "tolerance": 1.5},
+            {"tets": True},
+        ]:
+            files_with_tags = [dict(self.files_with_tags[0], tet_mesh=tet_mesh)]
+            with self.assertRaises(ValueError):
+                cad_to_h5m(files_with_tags, dry_run=True)
@@ -0,0 +1,118 @@
+import json
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+from cad_to_h5m import Converter, cad_to_h5m
+from cad_to_h5m.core import find_new_volumes, find_number_of_volumes_in_each_step_file
+from cad_to_h5m.mock_cubit import read_state, use_mock_cubit
+
+sys.path.append(str(Path(__file__).parents[1] / "benchmarks"))
+from benchmark_orchestration import find_regressions, run_scenario
+
+
+class TestMockCubit(unittest.TestCase):
+    """Runs the conversion pipeline against the mock cubit module"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.tmp_path = Path(self.tmp_dir.name)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_conversion_groups_and_outputs(self):
+        """Checks that the volumes of each file are grouped by material and
+        that the requested output files are written"""
+
+        with use_mock_cubit() as cubit:
+            returned_filename = cad_to_h5m(
+                files_with_tags=[
+                    {"cad_filename": "tests/blanket.stp", "material_tag": "mat1"},
+                    {"cad_filename": "tests/steel.stp", "material_tag": "mat2"},
+                ],
+                h5m_filename=str(self.tmp_path / "dagmc.h5m"),
+                cubit_filename=str(self.tmp_path / "dagmc.cub"),
+                geometry_details_filename=str(self.tmp_path / "details.json"),
+                verbose=False,
+            )
+
+            assert returned_filename == str(self.tmp_path / "dagmc.h5m")
+            assert Path(returned_filename).is_file()
+            assert (self.tmp_path / "dagmc.cub").is_file()
+            assert "imprint body all" in cubit.commands
+            assert cubit.commands[-1] == "reset"
+            assert cubit.get_volume_count() == 0
+
+        state = read_state(returned_filename)
+        assert state["groups"]["mat:mat1"] == [["volume", 1], ["volume", 2]]
+        assert state["groups"]["mat:mat2"] == [["volume", 3]]
+
+        with open(self.tmp_path / "details.json") as infile:
+            geometry_details = json.load(infile)
+        assert geometry_details[0]["volumes"] == ["1", "2"]
+        assert geometry_details[1]["volumes"] == ["3"]
+
+    def test_workspace_reset_after_failure(self):
+        """Checks that the Converter resets the workspace when a stage fails"""
+
+        with use_mock_cubit() as cubit:
+            converter = Converter(verbose=False)
+
+            def too_long_material_tag():
+                converter.convert(
+                    files_with_tags=[
+                        {"cad_filename": "tests/steel.stp", "material_tag": "m" * 28}
+                    ],
+                    h5m_filename=str(self.tmp_path / "dagmc.h5m"),
+                )
+
+            self.assertRaises(ValueError, too_long_material_tag)
+            assert cubit.get_volume_count() == 0
+            assert converter.command_count == len(cubit.commands)
+
+    def test_benchmark_scenario_and_regressions(self):
+        """Checks that a benchmark scenario runs and that extra commands are
+        reported as a regression"""
+
+        result = run_scenario(10, 2, self.tmp_path)
+
+        assert result["number_of_volumes"] == 20
+        assert find_regressions([result], [result], time_factor=2.0) == []
+
+        baseline = dict(result, command_count=result["command_count"] - 1)
+        assert len(find_regressions([result], [baseline], time_factor=2.0)) == 1
+
+    def test_volume_ids_and_count_of_each_file(self):
+        """Checks that the new volumes of each import are found and that the
+        number of volumes, rather than the sum of their ids, is returned"""
+
+        with use_mock_cubit() as cubit:
+            cubit.init([])
+            files_with_tags, total_number_of_volumes = (
+                find_number_of_volumes_in_each_step_file(
+                    [
+                        {"cad_filename": "tests/blanket.stp", "material_tag": "m1"},
+                        {"cad_filename": "tests/steel.stp", "material_tag": "m2"},
+                        {"cad_filename": "tests/pf_coil_1.stp", "material_tag": "m3"},
+                    ],
+                    cubit,
+                    verbose=False,
+                    autoheal=False,
+                )
+            )
+            # deleting a volume leaves a gap in the ids of the next import
+            cubit.cmd("delete volume 4")
+            last_volume_id = cubit.get_last_id("volume")
+            cubit.cmd('import step "tests/blanket.stp"')
+
+            new_volumes = find_new_volumes(cubit, last_volume_id)
+
+        assert [entry["volumes"] for entry in files_with_tags] == [
+            ["1", "2"],
+            ["3"],
+            ["4"],
+        ]
+        assert total_number_of_volumes == 4
+        assert new_volumes == ["5", "6"]
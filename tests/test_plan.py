@@ -0,0 +1,164 @@
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from cad_to_h5m import cad_to_h5m, plan
+
+
+class TestPlan(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.tmp_path = Path(self.tmp_dir.name)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_commands_of_conversion(self):
+        """Checks that the planned commands include the imports, groups and
+        exports with the requested filenames, with a placeholder volume for
+        each file, and that nothing is written"""
+
+        h5m_filename = str(self.tmp_path / "dagmc.h5m")
+        exo_filename = str(self.tmp_path / "mesh.exo")
+        commands = plan(
+            files_with_tags=[
+                {"cad_filename": "tests/blanket.stp", "material_tag": "mat1"},
+                {
+                    "cad_filename": "tests/steel.stp",
+                    "material_tag": "mat2",
+                    "tet_mesh": "size 0.5",
+                },
+            ],
+            h5m_filename=h5m_filename,
+            exo_filename=exo_filename,
+        )
+
+        assert commands[0].startswith('import step "tests/blanket.stp"')
+        assert 'group "mat:mat1" add volume 1' in commands
+        assert 'group "mat:mat2" add volume 2' in commands
+        assert "imprint body all" in commands
+        assert (
+            f'export dagmc "{h5m_filename}" faceting_tolerance 0.01 make_watertight'
+            in commands
+        )
+        assert "volume 2 size 0.5" in commands
+        assert f'export mesh "{exo_filename}" overwrite' in commands
+        assert os.listdir(self.tmp_path) == []
+        assert "cubit" not in sys.modules
+
+    def test_plan_without_h5py(self):
+        """Checks that a conversion with several faceting tolerances and a
+        faceting search are planned without h5py and without writing the h5m
+        files"""
+
+        files_with_tags = [
+            {"cad_filename": "tests/blanket.stp", "material_tag": "mat1"},
+            {
+                "cad_filename": "tests/steel.stp",
+                "material_tag": "mat2",
+                "faceting_tolerance": 1e-3,
+            },
+        ]
+        h5m_filename = str(self.tmp_path / "dagmc.h5m")
+        h5py_module = sys.modules.get("h5py")
+        # a None entry in sys.modules makes import h5py raise an ImportError
+        sys.modules["h5py"] = None
+        try:
+            with patch("shutil.which", return_value="make_watertight"):
+                commands = plan(files_with_tags, h5m_filename=h5m_filename)
+            search_commands = plan(
+                files_with_tags[:1], h5m_filename=h5m_filename, triangle_budget=1000
+            )
+        finally:
+            if h5py_module is None:
+                sys.modules.pop("h5py")
+            else:
+                sys.modules["h5py"] = h5py_module
+
+        exports = [c for c in commands if c.startswith("export dagmc")]
+        assert [export.split()[-2] for export in exports] == ["0.001", "0.01"]
+        assert [c for c in search_commands if c.startswith("export")] == [
+            f'export dagmc "{h5m_filename}" faceting_tolerance 0.01 make_watertight'
+        ]
+        assert os.listdir(self.tmp_path) == []
+
+    def test_plan_leaves_files_unchanged(self):
+        """Checks that planning a conversion with output files in folders that
+        don't exist and several faceting tolerances makes no folders and no
+        temporary folders"""
+
+        files_with_tags = [
+            {"cad_filename": "tests/blanket.stp", "material_tag": "mat1"},
+            {
+                "cad_filename": "tests/steel.stp",
+                "material_tag": "mat2",
+                "faceting_tolerance": 1e-3,
+                "tet_mesh": "size 0.5",
+            },
+        ]
+        with patch("tempfile.TemporaryDirectory") as temporary_directory, patch(
+            "shutil.which", return_value="make_watertight"
+        ):
+            commands = plan(
+                files_with_tags,
+                h5m_filename=str(self.tmp_path / "out" / "a" / "dagmc.h5m"),
+                exo_filename=str(self.tmp_path / "exo" / "mesh.exo"),
+            )
+
+        assert len([c for c in commands if c.startswith("export dagmc")]) == 2
+        assert any(c.startswith("export mesh") for c in commands)
+        assert os.listdir(self.tmp_path) == []
+        temporary_directory.assert_not_called()
+
+    def test_plan_matches_verbose(self):
+        """Checks that the Cubit output is only turned off in the plan of a
+        conversion that is not verbose, as in the conversion"""
+
+        files_with_tags = [{"cad_filename": "tests/steel.stp", "material_tag": "mat1"}]
+
+        quiet_commands = plan(files_with_tags, verbose=False)
+        verbose_commands = plan(files_with_tags, verbose=True)
+
+        assert quiet_commands[:4] == [
+            "set echo off",
+            "set info off",
+            "set journal off",
+            "set warning off",
+        ]
+        assert "set echo off" not in verbose_commands
+        assert verbose_commands == quiet_commands[4:]
+
+    def test_dry_run_matches_plan(self):
+        """Checks that a dry run returns the same commands as plan"""
+
+        files_with_tags = [{"cad_filename": "tests/steel.stp", "material_tag": "mat1"}]
+
+        assert cad_to_h5m(files_with_tags, dry_run=True) == plan(files_with_tags)
+
+    def test_invalid_entries(self):
+        """Checks that invalid entries are rejected before Cubit is needed"""
+
+        invalid_entries = [
+            ({"cad_filename": "tests/steel.stp"}, ValueError),
+            ({"material_tag": "mat1"}, ValueError),
+            ({"cad_filename": "tests/steel.xyz", "material_tag": "mat1"}, ValueError),
+            (
+                {"cad_filename": "missing.stp", "material_tag": "mat1"},
+                FileNotFoundError,
+            ),
+            ({"cad_filename": "tests/steel.stp", "material_tag": "a" * 28}, ValueError),
+            (
+                {"cad_filename": "tests/steel.stp", "material_tag": "m", "scale": 0},
+                ValueError,
+            ),
+            (
+                {"cad_filename": "tests/steel.stp", "material_tag": "m", "tet_mesh": 1},
+                ValueError,
+            ),
+        ]
+        for entry, error in invalid_entries:
+            self.assertRaises(error, plan, [entry])
+        assert "cubit" not in sys.modules
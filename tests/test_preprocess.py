@@ -0,0 +1,73 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from cad_to_h5m import cad_to_h5m
+from cad_to_h5m.mock_cubit import MOCK_CUBIT_PATH, use_mock_cubit
+from cad_to_h5m.preprocess import preprocess_files, preprocessed_key
+
+
+class TestPreprocess(unittest.TestCase):
+    def test_key_depends_on_scale_and_autoheal(self):
+        """Checks that the preprocessed key changes with the scale and autoheal
+        settings"""
+
+        key = preprocessed_key("tests/steel.stp", None, False)
+
+        assert key == preprocessed_key("tests/steel.stp", None, False)
+        assert key != preprocessed_key("tests/steel.stp", 10, False)
+        assert key != preprocessed_key("tests/steel.stp", None, True)
+        assert key != preprocessed_key("tests/blanket.stp", None, False)
+
+    def test_cached_files_are_found_and_stl_files_skipped(self):
+        """Checks that files already in the cache are returned without
+        preprocessing and that stl files are not preprocessed"""
+
+        with tempfile.TemporaryDirectory() as cache_dir:
+            key = preprocessed_key("tests/steel.stp", 10, False)
+            sat_filename = Path(cache_dir) / f"{key}.sat"
+            sat_filename.write_text("preprocessed")
+
+            preprocessed_files = preprocess_files(
+                files_with_tags=[
+                    {
+                        "cad_filename": "tests/steel.stp",
+                        "material_tag": "mat1",
+                        "scale": 10,
+                    },
+                    {"cad_filename": "tests/steel.stl", "material_tag": "mat2"},
+                ],
+                cache_dir=cache_dir,
+                cubit_path="/opt/Coreform-Cubit-2021.5/bin/",
+                autoheal=False,
+            )
+
+        assert preprocessed_files == {("tests/steel.stp", 10): str(sat_filename)}
+
+    def test_same_file_at_two_scales(self):
+        """Checks that entries with the same CAD file at different scales each
+        import their own preprocessed file"""
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with use_mock_cubit() as cubit:
+                cad_to_h5m(
+                    files_with_tags=[
+                        {"cad_filename": "tests/steel.stp", "material_tag": "mat1"},
+                        {
+                            "cad_filename": "tests/steel.stp",
+                            "material_tag": "mat2",
+                            "scale": 10,
+                        },
+                    ],
+                    h5m_filename=str(Path(tmp_dir) / "dagmc.h5m"),
+                    preprocessed_cache_dir=str(Path(tmp_dir) / "preprocessed"),
+                    cubit_path=MOCK_CUBIT_PATH,
+                    verbose=False,
+                )
+                imports = [c for c in cubit.commands if c.startswith("import")]
+
+        unscaled = preprocessed_key("tests/steel.stp", None, False)
+        scaled = preprocessed_key("tests/steel.stp", 10, False)
+        assert len(imports) == 2
+        assert f"{unscaled}.sat" in imports[0]
+        assert f"{scaled}.sat" in imports[1]
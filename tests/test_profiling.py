@@ -0,0 +1,71 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from cad_to_h5m import ConversionReport
+from cad_to_h5m.commands import CountingCubit
+from cad_to_h5m.core import profile_filename
+
+
+class CountsCubit:
+    """Responds to commands and entity count queries in place of the cubit
+    module"""
+
+    def cmd(self, command):
+        pass
+
+    def get_volume_count(self):
+        return 3
+
+    def get_surface_count(self):
+        return 18
+
+    def get_tri_count(self):
+        return 0
+
+    def get_tet_count(self):
+        return 100
+
+
+class TestProfiling(unittest.TestCase):
+    def test_stage_records(self):
+        """Checks that each stage is recorded with its command and entity
+        counts and that the callback receives each record"""
+
+        cubit = CountingCubit(CountsCubit())
+        received = []
+        report = ConversionReport(callback=received.append)
+
+        with report.stage("import", cubit):
+            cubit.cmd("import step")
+            cubit.cmd("separate body all")
+        with report.stage("preprocess"):
+            pass
+
+        assert [record.name for record in report.stages] == ["import", "preprocess"]
+        assert received == report.stages
+        assert report.stages[0].command_count == 2
+        assert report.stages[0].volumes == 3
+        assert report.stages[0].surfaces == 18
+        assert report.stages[0].tets == 100
+        assert report.stages[0].wall_time >= 0
+        assert report.stages[1].command_count is None
+        assert report.stages[1].volumes is None
+
+    def test_report_written_to_json(self):
+        """Checks that the report is saved as a JSON file"""
+
+        report = ConversionReport()
+        with report.stage("import"):
+            pass
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = profile_filename(str(Path(tmp_dir) / "geometry_details.json"))
+            assert filename == str(Path(tmp_dir) / "geometry_details_profile.json")
+            report.write(filename)
+            with open(filename) as infile:
+                contents = json.load(infile)
+
+        assert contents["stages"][0]["name"] == "import"
+        assert contents["total_wall_time"] == report.total_wall_time
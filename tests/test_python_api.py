@@ -1,10 +1,11 @@
+import json
 import os
 import tarfile
 import unittest
 import urllib.request
 from pathlib import Path
 
-from cad_to_h5m import cad_to_h5m
+from cad_to_h5m import cad_to_h5m, Converter
 
 
 class TestApiUsage(unittest.TestCase):
@@ -297,3 +298,54 @@ class TestApiUsage(unittest.TestCase):
         assert Path(test_h5m_filename).is_file()
         assert Path(returned_filename).is_file()
         assert test_h5m_filename == returned_filename
+
+    def test_converter_reused_for_several_conversions(self):
+        """Checks that a single Converter session can convert several models
+        and that the workspace is reset between conversions"""
+
+        converter = Converter(verbose=False)
+
+        for material_tag, test_h5m_filename in [
+            ("mat1", "test_converter_1.h5m"),
+            ("mat2", "test_converter_2.h5m"),
+        ]:
+            os.system(f"rm {test_h5m_filename}")
+            files_with_tags = [
+                {
+                    "cad_filename": "tests/blanket.stp",
+                    "material_tag": material_tag,
+                }
+            ]
+            returned_filename = converter.convert(
+                files_with_tags=files_with_tags,
+                h5m_filename=test_h5m_filename,
+            )
+
+            assert Path(test_h5m_filename).is_file()
+            assert test_h5m_filename == returned_filename
+            assert converter.cubit.parse_cubit_list("volume", "all") == ()
+
+    def test_profile_report_creation(self):
+        """Checks that the profile report is saved next to the geometry details
+        file and contains each stage"""
+
+        os.system("rm geometry_details_profile.json")
+
+        cad_to_h5m(
+            files_with_tags=[
+                {
+                    "cad_filename": "tests/blanket.stp",
+                    "material_tag": "mat1",
+                }
+            ],
+            h5m_filename="dagmc.h5m",
+            geometry_details_filename="geometry_details.json",
+            profile=True,
+        )
+
+        assert Path("geometry_details_profile.json").is_file()
+        with open("geometry_details_profile.json") as infile:
+            report = json.load(infile)
+        stage_names = [stage["name"] for stage in report["stages"]]
+        assert stage_names[0] == "import"
+        assert "export" in stage_names
@@ -0,0 +1,143 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from cad_to_h5m import cad_to_h5m
+from cad_to_h5m.inspect import inspect_h5m
+from cad_to_h5m.mock_cubit import use_mock_cubit
+from cad_to_h5m.stitch import stitch_surfaces
+
+
+class TestStitch(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.tmp_path = Path(self.tmp_dir.name)
+        self.files_with_tags = [
+            {
+                "cad_filename": "tests/steel.stp",
+                "material_tag": "first_wall",
+                "faceting_tolerance": 1e-4,
+            },
+            {"cad_filename": "tests/pf_coil_1.stp", "material_tag": "coil"},
+            {"cad_filename": "tests/steel.stp", "material_tag": "shield"},
+        ]
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_replaced_surfaces_use_other_facets(self):
+        """Checks that the surfaces of the second volume are taken from the
+        coarse export while the rest of the file comes from the fine export"""
+
+        fine = str(self.tmp_path / "fine.h5m")
+        coarse = str(self.tmp_path / "coarse.h5m")
+        stitched = str(self.tmp_path / "stitched.h5m")
+        with use_mock_cubit() as cubit:
+            cubit.init([])
+            cubit.cmd('import step "tests/blanket.stp"')
+            cubit.cmd('group "mat:mat1" add volume 1')
+            cubit.cmd('group "mat:mat2" add volume 2')
+            cubit.cmd(f'export dagmc "{fine}" faceting_tolerance 1e-4')
+            cubit.cmd(f'export dagmc "{coarse}" faceting_tolerance 1e-2')
+            surfaces_of_volume_2 = list(cubit.get_relatives("volume", 2, "surface"))
+
+        stitch_surfaces(fine, {coarse: surfaces_of_volume_2}, stitched)
+
+        summary = inspect_h5m(stitched)
+        fine_summary = inspect_h5m(fine)
+        assert summary.volume_triangles.tolist() == [1200, 12]
+        assert summary.volume_vertices.tolist() == [726, 24]
+        assert summary.triangles == 1212
+        assert summary.vertices == 750
+        assert (
+            summary.volume_bounding_boxes == fine_summary.volume_bounding_boxes
+        ).all()
+        assert summary.material_tags == ["mat:mat1", "mat:mat2"]
+
+    def test_unknown_surface(self):
+        """Checks that replacing a surface that is not in the file fails"""
+
+        filename = str(self.tmp_path / "dagmc.h5m")
+        with use_mock_cubit() as cubit:
+            cubit.init([])
+            cubit.cmd('import step "tests/steel.stp"')
+            cubit.cmd(f'export dagmc "{filename}" faceting_tolerance 1e-2')
+
+        def replace_missing_surface():
+            stitch_surfaces(
+                filename, {filename: [7]}, str(self.tmp_path / "stitched.h5m")
+            )
+
+        self.assertRaises(ValueError, replace_missing_surface)
+
+    def test_tolerance_of_each_entry_and_material(self):
+        """Checks that entries are faceted at their own tolerance, the tolerance
+        of their material or the default tolerance and that the number of
+        triangles of each entry is saved in the geometry details and that the
+        combined file is sealed with make_watertight"""
+
+        h5m_filename = str(self.tmp_path / "dagmc.h5m")
+        details_filename = str(self.tmp_path / "details.json")
+        with use_mock_cubit(), patch(
+            "shutil.which", return_value="/opt/dagmc/bin/make_watertight"
+        ), patch("subprocess.run") as run:
+            cad_to_h5m(
+                files_with_tags=self.files_with_tags,
+                h5m_filename=h5m_filename,
+                geometry_details_filename=details_filename,
+                faceting_tolerances={"coil": 1e-3},
+                verbose=False,
+            )
+
+        run.assert_called_once_with(
+            ["/opt/dagmc/bin/make_watertight", h5m_filename, "-o", h5m_filename],
+            check=True,
+            capture_output=True,
+        )
+
+        with open(details_filename) as infile:
+            geometry_details = json.load(infile)
+        assert [entry["triangles"] for entry in geometry_details] == [1200, 192, 12]
+        assert inspect_h5m(h5m_filename).triangles == 1200 + 192 + 12
+
+    def test_tolerances_without_make_watertight(self):
+        """Checks that different faceting tolerances are rejected without
+        make_watertight as the stitched surfaces would not meet"""
+
+        with use_mock_cubit() as cubit:
+            with self.assertRaisesRegex(ValueError, "make_watertight"):
+                cad_to_h5m(
+                    files_with_tags=self.files_with_tags,
+                    h5m_filename=str(self.tmp_path / "dagmc.h5m"),
+                    faceting_tolerances={"coil": 1e-3},
+                    make_watertight=False,
+                    verbose=False,
+                )
+            exports = [c for c in cubit.commands if c.startswith("export")]
+
+        assert exports == []
+
+    def test_missing_make_watertight(self):
+        """Checks that asking for a watertight file with several faceting
+        tolerances fails before exporting when make_watertight is not
+        installed"""
+
+        with use_mock_cubit() as cubit, patch("shutil.which", return_value=None):
+            with self.assertRaises(FileNotFoundError):
+                cad_to_h5m(
+                    files_with_tags=self.files_with_tags,
+                    h5m_filename=str(self.tmp_path / "dagmc.h5m"),
+                    faceting_tolerances={"coil": 1e-3},
+                    verbose=False,
+                )
+            exports = [c for c in cubit.commands if c.startswith("export")]
+            with self.assertRaises(FileNotFoundError):
+                cad_to_h5m(
+                    files_with_tags=self.files_with_tags,
+                    faceting_tolerances={"coil": 1e-3},
+                    dry_run=True,
+                )
+
+        assert exports == []
@@ -0,0 +1,212 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+import h5py
+import numpy as np
+
+from cad_to_h5m import cad_to_h5m
+from cad_to_h5m.inspect import inspect_h5m
+from cad_to_h5m.stl import BINARY_FACET, read_stl, stl_to_h5m, weld_vertices
+
+
+def cube_triangles(offset=(0.0, 0.0, 0.0)):
+    """Returns the 12 outward facing triangles of a unit cube"""
+    corners = np.array(
+        [[x, y, z] for x in (0.0, 1.0) for y in (0.0, 1.0) for z in (0.0, 1.0)]
+    )
+    faces = [
+        [0, 1, 3, 2],
+        [4, 6, 7, 5],
+        [0, 4, 5, 1],
+        [2, 3, 7, 6],
+        [0, 2, 6, 4],
+        [1, 5, 7, 3],
+    ]
+    triangles = []
+    for a, b, c, d in faces:
+        triangles += [[a, b, c], [a, c, d]]
+    return corners[np.array(triangles)] + np.array(offset)
+
+
+def write_ascii_stl(filename, triangles):
+    with open(filename, "w") as outfile:
+        outfile.write("solid cube\n")
+        for triangle in triangles:
+            outfile.write(" facet normal 0 0 0\n  outer loop\n")
+            for vertex in triangle:
+                coordinates = " ".join(f"{value:.17g}" for value in vertex)
+                outfile.write(f"   vertex {coordinates}\n")
+            outfile.write("  endloop\n endfacet\n")
+        outfile.write("endsolid cube\n")
+
+
+def write_binary_stl(filename, triangles):
+    facets = np.zeros(len(triangles), dtype=BINARY_FACET)
+    facets["vertices"] = triangles
+    with open(filename, "wb") as outfile:
+        # binary files may also start with solid
+        outfile.write(b"solid binary".ljust(80, b" "))
+        outfile.write(np.uint32(len(triangles)).tobytes())
+        outfile.write(facets.tobytes())
+
+
+class TestStl(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.tmp_path = Path(self.tmp_dir.name)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_ascii_and_binary_files_are_read(self):
+        """Checks that the triangles of ASCII and binary STL files, including
+        a binary file with a header starting with solid, are read"""
+
+        write_ascii_stl(self.tmp_path / "ascii.stl", cube_triangles())
+        write_binary_stl(self.tmp_path / "binary.stl", cube_triangles())
+
+        ascii_triangles = read_stl(str(self.tmp_path / "ascii.stl"))
+        binary_triangles = read_stl(str(self.tmp_path / "binary.stl"))
+        assert ascii_triangles.shape == (12, 3, 3)
+        assert np.array_equal(ascii_triangles, cube_triangles())
+        assert np.array_equal(binary_triangles, cube_triangles())
+        assert read_stl("tests/steel.stl").shape == (12, 3, 3)
+
+        (self.tmp_path / "empty.stl").write_text("not an stl file")
+        with self.assertRaises(ValueError):
+            read_stl(str(self.tmp_path / "empty.stl"))
+
+    def test_vertices_are_welded_across_cells(self):
+        """Checks that vertices closer than the tolerance are welded even when
+        they are either side of the edge of a cell, and that vertices further
+        apart are not"""
+
+        points = np.array(
+            [
+                [1.0 - 1e-6, 0.0, 0.0],
+                [1.0 + 1e-6, 0.0, 0.0],
+                [1.0, 1.0, 1.0],
+                [1.0, 1.0, 1.0],
+                [2.0, 0.0, 0.0],
+            ]
+        )
+        vertices, inverse = weld_vertices(points, 1e-4)
+        assert len(vertices) == 3
+        assert inverse[0] == inverse[1]
+        assert inverse[2] == inverse[3]
+        assert len(set(inverse[[0, 2, 4]].tolist())) == 3
+
+        vertices, inverse = weld_vertices(points, 0)
+        assert len(vertices) == 4
+
+    def test_touching_volumes_share_facets(self):
+        """Checks that the facets of two touching cubes, one of which is
+        slightly out of place, are shared by the two volumes and that the
+        DAGMC sets link the shared surface to both volumes"""
+
+        write_ascii_stl(self.tmp_path / "first.stl", cube_triangles())
+        write_binary_stl(
+            self.tmp_path / "second.stl", cube_triangles(offset=(1.0, 0.0, 1e-6))
+        )
+        h5m_filename = str(self.tmp_path / "dagmc.h5m")
+
+        geometry_details = stl_to_h5m(
+            [
+                {"cad_filename": str(self.tmp_path / "first.stl"), "material_tag": "a"},
+                {
+                    "cad_filename": str(self.tmp_path / "second.stl"),
+                    "material_tag": "b",
+                },
+            ],
+            h5m_filename,
+            merge_tolerance=1e-4,
+        )
+
+        assert [entry["volumes"] for entry in geometry_details] == [["1"], ["2"]]
+        summary = inspect_h5m(h5m_filename)
+        # the two shared triangles are only written once
+        assert summary.triangles == 22
+        assert summary.vertices == 12
+        assert summary.volume_triangles.tolist() == [12, 12]
+        assert summary.material_tags == ["mat:a", "mat:b"]
+
+        with h5py.File(h5m_filename, "r") as h5m_file:
+            set_list = h5m_file["tstt/sets/list"][...]
+            set_start = h5m_file["tstt/sets/list"].attrs["start_id"]
+            senses = h5m_file["tstt/tags/GEOM_SENSE_2/values"][...]
+            dimensions = h5m_file["tstt/sets/tags/GEOM_DIMENSION"][...]
+        # a surface for each cube and one shared by both
+        assert dimensions.tolist() == [2, 2, 2, 3, 3, 4, 4]
+        volume_handles = [set_start + 3, set_start + 4]
+        assert senses.tolist() == [
+            [volume_handles[0], 0],
+            [volume_handles[0], volume_handles[1]],
+            [volume_handles[1], 0],
+        ]
+        assert set_list[:, 2].tolist() == [0, 2, 3, 3, 3, 3, 3]
+
+    def test_conversion_without_cubit(self):
+        """Checks that cad_to_h5m converts STL files without importing Cubit,
+        with the material groups, the implicit complement group and the
+        number of triangles of each entry"""
+
+        write_ascii_stl(self.tmp_path / "cube.stl", cube_triangles())
+        write_binary_stl(self.tmp_path / "world.stl", cube_triangles() * 10 - 4.5)
+        h5m_filename = str(self.tmp_path / "dagmc.h5m")
+        geometry_details_filename = str(self.tmp_path / "details.json")
+
+        returned_filename = cad_to_h5m(
+            files_with_tags=[
+                {
+                    "cad_filename": str(self.tmp_path / "cube.stl"),
+                    "material_tag": "steel",
+                    "scale": 2,
+                },
+                {
+                    "cad_filename": str(self.tmp_path / "world.stl"),
+                    "material_tag": "graveyard",
+                },
+            ],
+            h5m_filename=h5m_filename,
+            geometry_details_filename=geometry_details_filename,
+            implicit_complement_material_tag="air",
+            cubit_path="/no/cubit/here",
+            cubit_free=True,
+            verbose=False,
+        )
+
+        assert returned_filename == h5m_filename
+        summary = inspect_h5m(h5m_filename)
+        assert summary.material_tags == ["mat:steel", "mat:graveyard", "mat:air_comp"]
+        assert summary.materials["mat:air_comp"].volume_ids == [2]
+        assert summary.materials["mat:steel"].bounding_box == [0, 0, 0, 2, 2, 2]
+        with open(geometry_details_filename) as infile:
+            geometry_details = json.load(infile)
+        assert [entry["triangles"] for entry in geometry_details] == [12, 12]
+
+    def test_options_needing_cubit_are_rejected(self):
+        """Checks that options that need a Cubit session and CAD files that
+        are not STL files can't be converted without Cubit"""
+
+        write_ascii_stl(self.tmp_path / "cube.stl", cube_triangles())
+        entry = {"cad_filename": str(self.tmp_path / "cube.stl"), "material_tag": "a"}
+
+        for kwargs in [
+            {"cubit_filename": str(self.tmp_path / "dagmc.cub")},
+            {"checkpoint_dir": str(self.tmp_path / "checkpoint")},
+        ]:
+            with self.assertRaises(ValueError):
+                cad_to_h5m([entry], cubit_free=True, **kwargs)
+        with self.assertRaises(ValueError):
+            cad_to_h5m([dict(entry, tet_mesh="size 0.5")], cubit_free=True)
+        with self.assertRaises(ValueError):
+            cad_to_h5m(
+                [entry, {"cad_filename": "tests/steel.stp", "material_tag": "b"}],
+                cubit_free=True,
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from cad_to_h5m import cad_to_h5m
+from cad_to_h5m.mock_cubit import read_state, use_mock_cubit
+from cad_to_h5m.surfaces import SurfaceProperties, find_cut_plane_surfaces
+
+
+class TestSurfaces(unittest.TestCase):
+    def test_cut_planes_found_geometrically(self):
+        """Checks that only planar surfaces containing the symmetry axis are
+        found to be cut planes"""
+
+        properties = SurfaceProperties(
+            ids=np.array([1, 2, 3, 4, 5]),
+            planar=np.array([True, True, True, True, False]),
+            vertex_counts=np.array([4, 6, 4, 4, 4]),
+            normals=np.array(
+                [
+                    [0, -1, 0],  # cut plane at 0 degrees
+                    [-np.sqrt(0.5), np.sqrt(0.5), 0],  # cut plane at 45 degrees
+                    [0, 0, 1],  # top face
+                    [1, 0, 0],  # face parallel to the axis but offset from it
+                    [0, -1, 0],  # curved face
+                ]
+            ),
+            centroids=np.array(
+                [
+                    [500, 0, 10],
+                    [300, 300, -10],
+                    [400, 200, 50],
+                    [600, 100, 0],
+                    [0, 0, 0],
+                ]
+            ),
+        )
+
+        reflectors = find_cut_plane_surfaces(properties)
+
+        assert reflectors.tolist() == [True, True, False, False, False]
+
+    def test_reflective_group_created(self):
+        """Checks that the surfaces of a wedge that contain the z axis are added
+        to the reflective group. The mock volume is a unit cube with a corner
+        on the z axis"""
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            h5m_filename = str(Path(tmp_dir) / "dagmc.h5m")
+            with use_mock_cubit():
+                cad_to_h5m(
+                    files_with_tags=[
+                        {
+                            "cad_filename": "tests/steel.stp",
+                            "material_tag": "mat1",
+                            "surface_reflectivity": True,
+                        }
+                    ],
+                    h5m_filename=h5m_filename,
+                    verbose=False,
+                )
+            state = read_state(h5m_filename)
+
+        assert state["groups"]["reflective"] == [["surface", 1], ["surface", 3]]